@@ -0,0 +1 @@
+# Benchmark Module
\ No newline at end of file
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+from llm_layer.config import ASSET_CLASSES
+
+SECTORS = ['能源', '技术', '金融', '医疗', '贵金属', '基础金属', '汽车', '芯片', '银行', '房地产']
+EVENT_TYPES = ['政策', '业绩', '宏观', '供需关系', '地缘政治', '市场情绪']
+REGIONS = ['CN', 'US', 'EU', 'JP', 'Global']
+
+SUMMARY_TEXT = ("1. 核心趋势总结：窗口期内该资产类别整体震荡偏强，政策预期与资金面是主要驱动。"
+                "2. 关键驱动事件：主要经济体利率预期变化带动估值修复；供需数据好于预期支撑价格。"
+                "3. 市场情绪评价：整体偏多，但短期波动加大，建议关注后续宏观数据与政策信号。")
+
+class MockSettings:
+    """模拟服务的延迟分布、错误率等参数，均可通过环境变量或命令行设置"""
+    def __init__(self, latency_ms=800, latency_sigma=0.5, per_item_ms=50, error_rate=0.0,
+                 rate_limit_rate=0.0, malformed_rate=0.0, seed=None):
+        self.latency_ms = latency_ms  # 延迟中位数（毫秒），按对数正态分布采样
+        self.latency_sigma = latency_sigma  # 对数正态分布的 sigma，越大长尾越明显
+        self.per_item_ms = per_item_ms  # 批量请求中每多一条新闻增加的延迟（毫秒）
+        self.error_rate = error_rate  # 返回 500 的比例
+        self.rate_limit_rate = rate_limit_rate  # 返回 429 (Retry-After: 1) 的比例
+        self.malformed_rate = malformed_rate  # 返回无法解析的内容的比例
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency_ms=float(os.getenv("MOCK_LATENCY_MS", 800)),
+            latency_sigma=float(os.getenv("MOCK_LATENCY_SIGMA", 0.5)),
+            per_item_ms=float(os.getenv("MOCK_PER_ITEM_MS", 50)),
+            error_rate=float(os.getenv("MOCK_ERROR_RATE", 0)),
+            rate_limit_rate=float(os.getenv("MOCK_RATE_LIMIT_RATE", 0)),
+            malformed_rate=float(os.getenv("MOCK_MALFORMED_RATE", 0)),
+        )
+
+    def sample_latency(self, items=1):
+        base = self.latency_ms * self.random.lognormvariate(0, self.latency_sigma)
+        return (base + self.per_item_ms * max(0, items - 1)) / 1000.0
+
+def structured_output(content_hash):
+    """按 content_hash 确定性地生成一条结构化结果，同一条新闻每次返回相同内容"""
+    rnd = random.Random(int(hashlib.md5(content_hash.encode()).hexdigest()[:8], 16))
+    return {
+        "content_hash": content_hash,
+        "publish_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": "财联社",
+        "region": rnd.choice(REGIONS),
+        "subject": "基准测试标的",
+        "asset_class": rnd.choice(ASSET_CLASSES),
+        "sector": rnd.choice(SECTORS),
+        "sentiment_score": round(rnd.uniform(-1, 1), 2),
+        "impact_weight": rnd.randint(1, 5),
+        "trend_signal": rnd.choice([-1, 0, 1]),
+        "event_type": rnd.choice(EVENT_TYPES),
+        "driver_factor": "基准测试",
+        "key_metrics": f"+{rnd.randint(1, 20)}%",
+    }
+
+def classify_request(system_prompt):
+    """根据系统提示词判断请求类型"""
+    if "批量模式" in system_prompt:
+        return "news_batch"
+    if "金融数据量化分析师" in system_prompt:
+        return "news"
+    if "SQL 生成助手" in system_prompt:
+        return "sql"
+    return "summary"
+
+def canned_response(kind, user_input):
+    """返回 (回复内容, 本次请求包含的新闻条数)"""
+    hashes = re.findall(r"content_hash：(\w+)", user_input)
+    if kind == "news_batch":
+        return json.dumps([structured_output(h) for h in hashes], ensure_ascii=False), len(hashes)
+    if kind == "news":
+        return "```json\n" + json.dumps(structured_output(hashes[0] if hashes else "unknown"), ensure_ascii=False) + "\n```", 1
+    if kind == "sql":
+        return json.dumps({
+            "table": "all_news",
+            "sql": "SELECT title, asset_class, sentiment_score, impact_weight FROM all_news "
+                   "WHERE processed_at IS NOT NULL ORDER BY id DESC LIMIT 20"
+        }, ensure_ascii=False), 1
+    return SUMMARY_TEXT, 1
+
+def create_app(settings):
+    app = FastAPI(title="Mock OpenAI-compatible LLM Server")
+    stats = Counter()
+    lock = threading.Lock()
+
+    def count(key):
+        with lock:
+            stats[key] += 1
+
+    @app.get("/stats")
+    def get_stats():
+        return dict(stats)
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user_input = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        kind = classify_request(system_prompt)
+        count(kind)
+
+        roll = settings.random.random()
+        if roll < settings.rate_limit_rate:
+            count("429")
+            return JSONResponse(status_code=429, headers={"retry-after": "1"},
+                                content={"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}})
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            await asyncio.sleep(settings.sample_latency())
+            count("500")
+            return JSONResponse(status_code=500, content={"error": {"message": "Internal error (mock)", "type": "server_error"}})
+
+        content, items = canned_response(kind, user_input)
+        if settings.random.random() < settings.malformed_rate:
+            count("malformed")
+            content = "抱歉，我无法按要求输出。"
+        await asyncio.sleep(settings.sample_latency(items))
+
+        prompt_tokens = (len(system_prompt) + len(user_input)) // 2
+        completion_tokens = len(content) // 2
+        return {
+            "id": f"chatcmpl-mock-{stats[kind]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    return app
+
+def main():
+    defaults = MockSettings.from_env()
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的 chat-completions 模拟服务，可作为 ONLINE_BASE_URL 使用")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_PORT", 8900)))
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="对数正态分布 sigma")
+    parser.add_argument("--per-item-ms", type=float, default=defaults.per_item_ms, help="批量请求每条新闻的附加延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="返回 500 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="返回 429 的比例")
+    parser.add_argument("--malformed-rate", type=float, default=defaults.malformed_rate, help="返回无法解析内容的比例")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency_ms, args.latency_sigma, args.per_item_ms, args.error_rate,
+                            args.rate_limit_rate, args.malformed_rate, args.seed)
+    print(f"模拟 LLM 服务启动: http://{args.host}:{args.port} (设置 ONLINE_BASE_URL 指向该地址)")
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
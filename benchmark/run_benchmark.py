@@ -0,0 +1,292 @@
+"""
+端到端吞吐基准测试：写入 N 条合成新闻，依次运行 LLM 结构化处理、资产分类总结与交互问答，
+全部 LLM 请求发往本地模拟服务（或 --base-url 指定的服务），统计吞吐、延迟分位数以及数据库与 LLM 耗时。
+运行方式: python -m benchmark.run_benchmark --news 1000 --questions 20
+"""
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = ['黄金', '原油', '天然气', '铜', '沪深300', '标普500', '纳斯达克', '美元指数', '人民币', '比特币',
+            '美债收益率', '螺纹钢', '英伟达', '特斯拉', '宁德时代', '贵州茅台']
+EVENTS = ['价格大幅上涨', '价格显著回落', '创阶段新高', '跌至数月低点', '成交量明显放大', '波动率上升']
+DRIVERS = ['美联储议息会议前夕', '最新公布的非农数据超预期', '地缘局势出现新变化', '库存数据意外下降',
+           '央行公开市场操作加码', '主要机构上调全年预期']
+QUESTIONS = ['最近黄金有什么重要消息？', '总结一下最近的股市情况', '原油价格最近的驱动因素是什么？',
+             '最近有哪些利空的新闻？', '外汇市场近期的情绪怎么样？']
+
+class Recorder:
+    """按阶段累计数据库语句耗时与 LLM 调用耗时（多线程安全）"""
+    def __init__(self):
+        self.phase = None
+        self.lock = threading.Lock()
+        self.db_time = defaultdict(float)
+        self.db_count = defaultdict(int)
+        self.llm_latencies = defaultdict(list)
+
+    def add_db(self, seconds):
+        if self.phase:
+            with self.lock:
+                self.db_time[self.phase] += seconds
+                self.db_count[self.phase] += 1
+
+    def add_llm(self, seconds):
+        if self.phase:
+            with self.lock:
+                self.llm_latencies[self.phase].append(seconds)
+
+recorder = Recorder()
+
+def percentile(values, pct):
+    """最近秩法计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_mock_server(args, port):
+    """在后台线程中启动模拟 LLM 服务"""
+    import uvicorn
+    from benchmark.mock_llm_server import MockSettings, create_app
+
+    settings = MockSettings(args.latency_ms, args.latency_sigma, args.per_item_ms, args.error_rate,
+                            args.rate_limit_rate, args.malformed_rate, args.seed)
+    server = uvicorn.Server(uvicorn.Config(create_app(settings), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+def install_instrumentation():
+    """通过 SQLAlchemy 事件统计数据库耗时，并包装各 LLM 客户端的 chat 方法统计调用耗时"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from llm_layer.models.llm_client import OnlineLLMClient, AsyncOnlineLLMClient
+    from interactive_layer.llm_client import LLMClient
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("bench_started", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        recorder.add_db(time.perf_counter() - conn.info["bench_started"].pop())
+
+    def timed(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.add_llm(time.perf_counter() - started)
+        return wrapper
+
+    def timed_async(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                recorder.add_llm(time.perf_counter() - started)
+        return wrapper
+
+    OnlineLLMClient.chat = timed(OnlineLLMClient.chat)
+    AsyncOnlineLLMClient.chat = timed_async(AsyncOnlineLLMClient.chat)
+    LLMClient.chat = timed(LLMClient.chat)
+
+def prepare_database(db_url, reset):
+    from sqlalchemy import text
+    from common.db_pool import get_engine
+    from data_layer.db_init import build_metadata
+
+    engine = get_engine(db_url)
+    metadata = build_metadata()
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT COUNT(*) FROM all_news")).scalar()
+        if existing and not reset:
+            raise SystemExit(f"数据库中已有 {existing} 条新闻，请使用独立的测试库，或加 --reset 清空后再测。")
+        for table in reversed(metadata.sorted_tables):
+            conn.execute(table.delete())
+    return engine
+
+def seed_news(engine, count, seed):
+    """写入 count 条合成新闻，入库时间分布在最近 12 小时内"""
+    from sqlalchemy import text
+    rnd = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        subject, event_text, driver = rnd.choice(SUBJECTS), rnd.choice(EVENTS), rnd.choice(DRIVERS)
+        pct = round(rnd.uniform(0.1, 9.9), 2)
+        created = now - timedelta(seconds=rnd.randint(0, 12 * 3600))
+        title = f"【{subject}{event_text}，{driver}】"
+        content = (f"财联社{created.month}月{created.day}日电，{driver}，{subject}{event_text}，"
+                   f"日内变动 {pct}%，编号 {i}。市场人士认为短期仍需关注后续数据与政策动向。")
+        rows.append({
+            "content_hash": hashlib.md5(f"{seed}-{i}-{title}".encode()).hexdigest(),
+            "title": title, "content": content,
+            "publish_date": created.strftime("%Y-%m-%d"), "publish_time": created.strftime("%H:%M:%S"),
+            "create_time": created,
+        })
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO all_news (content_hash, title, content, publish_date, publish_time, create_time)
+            VALUES (:content_hash, :title, :content, :publish_date, :publish_time, :create_time)
+        """), rows)
+    return time.perf_counter() - started
+
+def run_phase(name, fn):
+    """运行一个阶段，返回 (阶段函数返回值, 墙钟耗时)"""
+    print(f"\n>>> 阶段 [{name}] 开始")
+    recorder.phase = name
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        recorder.phase = None
+    elapsed = time.perf_counter() - started
+    print(f">>> 阶段 [{name}] 完成，耗时 {elapsed:.2f} 秒")
+    return result, elapsed
+
+def phase_report(name, items, elapsed, item_latencies=None):
+    llm = recorder.llm_latencies[name]
+    report = {
+        "phase": name,
+        "items": items,
+        "elapsed_s": round(elapsed, 2),
+        "items_per_s": round(items / elapsed, 2) if elapsed else None,
+        "llm_calls": len(llm),
+        "llm_p50_ms": ms(percentile(llm, 50)),
+        "llm_p99_ms": ms(percentile(llm, 99)),
+        "llm_time_s": round(sum(llm), 2),
+        "db_statements": recorder.db_count[name],
+        "db_time_s": round(recorder.db_time[name], 2),
+    }
+    if item_latencies:
+        report["item_p50_ms"] = ms(percentile(item_latencies, 50))
+        report["item_p99_ms"] = ms(percentile(item_latencies, 99))
+    return report
+
+def print_reports(reports):
+    columns = [("phase", "阶段"), ("items", "条数"), ("elapsed_s", "耗时(s)"), ("items_per_s", "条/秒"),
+               ("llm_calls", "LLM调用"), ("llm_p50_ms", "LLM p50"), ("llm_p99_ms", "LLM p99"),
+               ("llm_time_s", "LLM总耗时"), ("db_statements", "DB语句"), ("db_time_s", "DB总耗时"),
+               ("item_p50_ms", "单条p50"), ("item_p99_ms", "单条p99")]
+    print("\n=== 基准测试结果（延迟单位 ms；LLM/DB 总耗时为各调用耗时之和，并发时可能大于墙钟耗时）===")
+    print(" | ".join(title for _, title in columns))
+    for report in reports:
+        print(" | ".join(str(report.get(key, "-")) for key, _ in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐基准测试")
+    parser.add_argument("--news", type=int, default=1000, help="写入的合成新闻条数")
+    parser.add_argument("--questions", type=int, default=20, help="交互问答的提问次数")
+    parser.add_argument("--db-url", default=None, help="测试库连接串，默认使用临时 SQLite 文件")
+    parser.add_argument("--reset", action="store_true", help="测试库非空时先清空")
+    parser.add_argument("--base-url", default=None, help="LLM 服务地址，默认在本进程内启动模拟服务")
+    parser.add_argument("--phases", default="llm,summary,interactive", help="要运行的阶段，逗号分隔")
+    parser.add_argument("--cache", action="store_true", help="保留 LLM 响应缓存（默认关闭以测量真实调用路径）")
+    parser.add_argument("--latency-ms", type=float, default=800, help="模拟服务延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="模拟服务延迟的对数正态 sigma")
+    parser.add_argument("--per-item-ms", type=float, default=50, help="模拟服务批量请求每条新闻的附加延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回 500 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="模拟服务返回 429 的比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="模拟服务返回无法解析内容的比例")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="将结果以 JSON 写入该文件")
+    args = parser.parse_args()
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+
+    # 各层配置在导入时读取环境变量，必须先设置环境再导入
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')}?timeout=30"
+    os.environ["DB_URL"] = db_url
+    if not args.cache:
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("LOCAL_CLASSIFIER_MODE", "off")
+    port = None if args.base_url else free_port()
+    base_url = args.base_url or f"http://127.0.0.1:{port}"
+    os.environ["ONLINE_BASE_URL"] = base_url
+    if port:
+        os.environ["ONLINE_API_KEY"] = "mock"
+        start_mock_server(args, port)
+    print(f"数据库: {db_url}\nLLM 服务: {base_url}")
+
+    from sqlalchemy import text
+    install_instrumentation()
+    engine = prepare_database(db_url, args.reset)
+    seed_time = seed_news(engine, args.news, args.seed)
+    print(f"写入 {args.news} 条合成新闻，耗时 {seed_time:.2f} 秒")
+
+    reports = []
+    if "llm" in phases:
+        from llm_layer import config as llm_config
+        from llm_layer.main import run_cycle
+        from llm_layer.models.llm_client import get_async_llm_client
+
+        async def process():
+            return await run_cycle(get_async_llm_client(llm_config))
+
+        stats, elapsed = run_phase("llm", lambda: asyncio.run(process()))
+        print(f"处理统计: {stats}")
+        reports.append(phase_report("llm", stats["written"], elapsed))
+
+    if "summary" in phases:
+        from llm_layer import config as llm_config
+        from llm_layer.models.llm_client import get_llm_client
+        from llm_layer.summary_main import run_summary_task
+
+        _, elapsed = run_phase("summary", lambda: run_summary_task(get_llm_client(llm_config)))
+        with engine.connect() as conn:
+            summaries = conn.execute(text("SELECT COUNT(*) FROM news_summary")).scalar()
+        reports.append(phase_report("summary", summaries, elapsed))
+
+    if "interactive" in phases:
+        from interactive_layer.service import InteractiveService
+
+        service = InteractiveService()
+        latencies = []
+
+        def ask_all():
+            for i in range(args.questions):
+                started = time.perf_counter()
+                service.ask(QUESTIONS[i % len(QUESTIONS)])
+                latencies.append(time.perf_counter() - started)
+
+        _, elapsed = run_phase("interactive", ask_all)
+        reports.append(phase_report("interactive", args.questions, elapsed, latencies))
+
+    print_reports(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"news": args.news, "db_url": db_url.split("@")[-1], "base_url": base_url, "phases": reports},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Shared Infrastructure Module
@@ -0,0 +1,15 @@
+import os
+
+# 各层共享的基础设施配置
+
+# 数据库连接池配置
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # 常驻连接数
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))  # 高峰期允许额外创建的连接数
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # 连接最大存活时间（秒），需小于 MySQL wait_timeout
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # 等待空闲连接的超时时间（秒）
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # 取出连接前先探活
+
+# LLM 响应缓存配置（本地 SQLite 文件）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100000))  # 超出后按最近访问时间淘汰
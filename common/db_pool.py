@@ -0,0 +1,66 @@
+import threading
+from sqlalchemy import create_engine, event
+from . import config
+
+# 进程级 Engine 注册表：同一数据库 URL 只创建一次 Engine，复用其连接池
+_engines = {}
+_lock = threading.Lock()
+
+# 连接统计：opened 为真实建立的 TCP + 认证握手次数，reused 为直接复用池内连接的次数
+_stats = {"opened": 0, "reused": 0, "checkouts": 0}
+_stats_lock = threading.Lock()
+
+def _incr(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+def _on_connect(dbapi_conn, conn_record):
+    _incr("opened")
+    conn_record.info["fresh"] = True
+
+def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+    _incr("checkouts")
+    # 新建连接的第一次取出不算复用
+    if not conn_record.info.pop("fresh", False):
+        _incr("reused")
+
+def get_engine(db_url):
+    """获取（或首次创建）指定数据库 URL 对应的共享连接池 Engine"""
+    engine = _engines.get(db_url)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            engine = create_engine(
+                db_url,
+                pool_size=config.DB_POOL_SIZE,
+                max_overflow=config.DB_MAX_OVERFLOW,
+                pool_recycle=config.DB_POOL_RECYCLE,
+                pool_timeout=config.DB_POOL_TIMEOUT,
+                pool_pre_ping=config.DB_POOL_PRE_PING,
+            )
+            event.listen(engine, "connect", _on_connect)
+            event.listen(engine, "checkout", _on_checkout)
+            _engines[db_url] = engine
+    return engine
+
+def get_pool_stats():
+    """返回连接建立与复用次数的快照"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["engines"] = len(_engines)
+    stats["reuse_ratio"] = round(stats["reused"] / stats["checkouts"], 4) if stats["checkouts"] else 0.0
+    return stats
+
+def format_pool_stats():
+    stats = get_pool_stats()
+    return f"新建连接 {stats['opened']} 次, 复用连接 {stats['reused']} 次, 复用率 {stats['reuse_ratio']:.2%}"
+
+def dispose_all():
+    """释放所有连接池（进程退出或 fork 之后调用）"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
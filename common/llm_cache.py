@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from . import config
+
+# 命中时更新的访问时间先记在内存中，积累到该数量或下次写入时一并提交
+TOUCH_FLUSH_THRESHOLD = 500
+
+# 单条 SELECT 中 IN 列表的最大长度，低于旧版 SQLite 999 个绑定参数的限制
+_MAX_KEYS_PER_QUERY = 500
+
+def text_digest(text):
+    return hashlib.sha256(str(text).encode('utf-8')).hexdigest()
+
+class LLMResponseCache:
+    """
+    持久化 LLM 响应缓存，键为 (命名空间, 提示词哈希, 模型, 内容键) 的哈希
+    提示词或模型变化后键随之变化，旧响应不会被误用，并按最近访问时间淘汰
+    读取不提交事务：命中的访问时间延迟批量写回，进程退出前未写回的部分丢失只影响淘汰顺序
+    """
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(namespace, system_prompt, model, content_key):
+        return text_digest(f"{namespace}|{text_digest(system_prompt)}|{model}|{content_key}")
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """批量查询，返回 {cache_key: 响应}，未命中的键不在结果中"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _MAX_KEYS_PER_QUERY):
+                chunk = keys[i : i + _MAX_KEYS_PER_QUERY]
+                rows = self._conn.execute(
+                    f"SELECT cache_key, response FROM llm_cache WHERE cache_key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            now = time.time()
+            for key in found:
+                self._touched[key] = now
+            if len(self._touched) >= TOUCH_FLUSH_THRESHOLD:
+                self._flush_touched()
+                self._conn.commit()
+        return found
+
+    def set(self, key, response):
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self.stores += 1
+            self._flush_touched()
+            # 每写入一定数量后检查一次容量，淘汰最久未访问的 10%
+            if self.stores % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """将内存中积累的访问时间写回（由调用方持锁并提交）"""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.executemany("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?",
+                               [(at, key) for key, at in touched.items()])
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE cache_key IN (SELECT cache_key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """返回进程内共享的缓存实例，未启用时返回 None"""
+    global _cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache(config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_ENTRIES)
+    return _cache
+
+def format_cache_stats():
+    cache = get_llm_cache()
+    if cache is None:
+        return "未启用"
+    stats = cache.stats()
+    return f"命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_ratio']:.2%}"
@@ -1,34 +1,94 @@
-import akshare as ak
 import pandas as pd
 import hashlib
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
+from .config import NEWS_SOURCES, FETCH_MAX_WORKERS
+from .sources import get_sources
+
+# 单个数据源的抓取结果
+SourceResult = namedtuple('SourceResult', ['name', 'df', 'latency', 'error'])
+
+# 常驻抓取线程池：超时的数据源线程不会阻塞本轮返回
+_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="news_source")
+# 仍在执行中的抓取任务，避免同一数据源超时后被重复提交
+_inflight = {}
 
 def generate_hash(row):
     """根据新闻标题和内容生成唯一哈希"""
     combined = str(row.get('title', '')) + str(row.get('content', ''))
     return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
-def fetch_news():
-    """通过财联社API获取新闻数据"""
-    print(f"[{datetime.now()}] 开始抓取财联社新闻...")
-    try:
-        news_df = ak.stock_info_global_cls(symbol="全部")
-        print(f"成功获取 {len(news_df)} 条新闻")
-        # 重命名列
-        news_df = news_df.rename(columns={
-            '标题': 'title',
-            '内容': 'content',
-            '发布日期': 'publish_date',
-            '发布时间': 'publish_time'
-        })
-
-        # 添加 hash 列
-        news_df['content_hash'] = news_df.apply(generate_hash, axis=1)
-
-        # 添加入库时间
-        news_df['create_time'] = datetime.now()
+def generate_hashes(df):
+    """批量生成哈希，结果与逐行调用 generate_hash 一致"""
+    titles = df['title'].astype(str) if 'title' in df else pd.Series('', index=df.index)
+    contents = df['content'].astype(str) if 'content' in df else pd.Series('', index=df.index)
+    md5 = hashlib.md5
+    return [md5(s.encode('utf-8')).hexdigest() for s in (titles + contents)]
+
+def _timed_fetch(source):
+    start = time.monotonic()
+    df = source.fetch()
+    return df, time.monotonic() - start
+
+def fetch_from_sources(sources):
+    """并发抓取所有数据源，每个数据源独立超时，返回 SourceResult 列表"""
+    start = time.monotonic()
+    submitted = []
+    results = []
+    for source in sources:
+        future = _inflight.get(source.name)
+        if future is not None and not future.done():
+            results.append(SourceResult(source.name, pd.DataFrame(), 0.0, "上一轮抓取仍未结束"))
+            continue
+        future = _executor.submit(_timed_fetch, source)
+        _inflight[source.name] = future
+        submitted.append((source, future))
+
+    for source, future in submitted:
+        # 所有数据源同时开始，各自的截止时间互不影响
+        remaining = max(0.0, source.timeout - (time.monotonic() - start))
+        try:
+            df, latency = future.result(timeout=remaining)
+            results.append(SourceResult(source.name, df, latency, None))
+        except FuturesTimeoutError:
+            results.append(SourceResult(source.name, pd.DataFrame(), float(source.timeout), f"超时 ({source.timeout}s)"))
+        except Exception as e:
+            results.append(SourceResult(source.name, pd.DataFrame(), time.monotonic() - start, str(e)))
+    return results
 
+def merge_results(results):
+    """合并各数据源结果，一次性计算 hash 并去重"""
+    frames = []
+    for res in results:
+        if res.error:
+            print(f"数据源 [{res.name}] 抓取失败: {res.error}")
+            continue
+        print(f"数据源 [{res.name}] 获取 {len(res.df)} 条新闻，耗时 {res.latency:.2f}s")
+        if not res.df.empty:
+            frames.append(res.df.assign(source_name=res.name))
+
+    if not frames:
+        return pd.DataFrame()
+
+    news_df = pd.concat(frames, ignore_index=True)
+    news_df['content_hash'] = generate_hashes(news_df)
+    news_df = news_df.drop_duplicates(subset='content_hash', keep='first').reset_index(drop=True)
+
+    # 添加入库时间
+    news_df['create_time'] = datetime.now()
+    return news_df
+
+def fetch_news(sources=None):
+    """并发抓取所有启用的数据源，返回合并去重后的新闻数据"""
+    if sources is None:
+        sources = get_sources(NEWS_SOURCES)
+    print(f"[{datetime.now()}] 开始抓取新闻，数据源: {[s.name for s in sources]}")
+    try:
+        news_df = merge_results(fetch_from_sources(sources))
+        print(f"合并去重后共 {len(news_df)} 条新闻")
         return news_df
     except Exception as e:
         print(f"抓取失败: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
@@ -7,10 +7,36 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "yourpassword")
 DB_NAME = os.getenv("DB_NAME", "news_analysis")
 TABLE_NAME = "all_news"
+OUTBOX_TABLE_NAME = "news_outbox"
+STATS_TABLE_NAME = "news_stats_hourly"
+
+# 新闻通知表保留时长（小时），过期记录定期清理
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", 24))
 
 # 新闻爬取间隔时间（秒）
 SPIDER_INTERVAL = int(os.getenv("SPIDER_INTERVAL", 60))
 
+# 自适应抓取调度：以 SPIDER_INTERVAL 为基准，行情活跃时加快、空闲或出错时退避
+SPIDER_ADAPTIVE = os.getenv("SPIDER_ADAPTIVE", "true").lower() == "true"
+SPIDER_MIN_INTERVAL = int(os.getenv("SPIDER_MIN_INTERVAL", 15))  # 最短间隔（秒）
+SPIDER_MAX_INTERVAL = int(os.getenv("SPIDER_MAX_INTERVAL", 600))  # 最长退避间隔（秒）
+SPIDER_BACKOFF_FACTOR = float(os.getenv("SPIDER_BACKOFF_FACTOR", 1.5))  # 无新增或出错时的退避倍数
+SPIDER_SPEEDUP_FACTOR = float(os.getenv("SPIDER_SPEEDUP_FACTOR", 0.5))  # 新增比例高时的间隔缩放倍数
+SPIDER_HIGH_NEW_RATIO = float(os.getenv("SPIDER_HIGH_NEW_RATIO", 0.3))  # 判定为“活跃”的新增比例阈值
+
+# 新闻数据源配置
+NEWS_SOURCES = [s.strip() for s in os.getenv("NEWS_SOURCES", "cls").split(",") if s.strip()]  # 启用的数据源，逗号分隔
+SOURCE_TIMEOUT = int(os.getenv("SOURCE_TIMEOUT", 30))  # 单个数据源的抓取超时（秒）
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 4))  # 并发抓取的线程数
+
+# 已入库 hash 的内存缓存，用于在查询数据库前过滤旧新闻
+SEEN_CACHE_SIZE = int(os.getenv("SEEN_CACHE_SIZE", 20000))  # 缓存最多保留的 hash 数
+SEEN_CACHE_WARM_SIZE = int(os.getenv("SEEN_CACHE_WARM_SIZE", 5000))  # 启动时从数据库预热的最新 hash 数
+
+# 入库模式：bulk 为多行 INSERT IGNORE 单语句写入（可多副本并行），append 为先查重再 to_sql 追加
+INGEST_MODE = os.getenv("INGEST_MODE", "bulk")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 500))  # bulk 模式下每条 INSERT 语句包含的行数
+
 # 数据库连接URL
 def get_db_url():
     return f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
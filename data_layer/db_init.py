@@ -1,5 +1,28 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Text, DateTime, Date, Time, text, Integer
-from .config import get_db_url, TABLE_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from sqlalchemy import create_engine, inspect, MetaData, Table, Column, Index, String, Text, DateTime, Date, Time, text, Integer, BigInteger, PrimaryKeyConstraint
+from common.db_pool import get_engine
+from .config import get_db_url, TABLE_NAME, OUTBOX_TABLE_NAME, STATS_TABLE_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+
+def ensure_columns(engine, table):
+    """为已存在的旧表补齐后续版本新增的列（create_all 不会修改已存在的表）"""
+    existing = {col['name'] for col in inspect(engine).get_columns(table.name)}
+    missing = [col for col in table.columns if col.name not in existing]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for col in missing:
+            col_type = col.type.compile(dialect=engine.dialect)
+            comment = f" COMMENT '{col.comment}'" if col.comment else ""
+            conn.execute(text(f"ALTER TABLE `{table.name}` ADD COLUMN `{col.name}` {col_type} NULL{comment}"))
+            print(f"数据表 {table.name} 新增列 {col.name}")
+
+def ensure_indexes(engine, table):
+    """为已存在的旧表补齐后续版本新增的索引"""
+    existing = {idx['name'] for idx in inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(bind=engine)
+            print(f"数据表 {table.name} 新增索引 {index.name}")
 
 def init_db():
     # 1. 连接MySQL服务，检查并创建数据库
@@ -8,11 +31,24 @@ def init_db():
     
     with server_engine.connect() as conn:
         conn.execute(text(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"))
+    # 建库连接只用一次，无需保留连接池
+    server_engine.dispose()
     
     print(f"数据库 {DB_NAME} 确保存在。")
 
     # 2. 连接到具体数据库，创建表结构
-    engine = create_engine(get_db_url())
+    engine = get_engine(get_db_url())
+    metadata = build_metadata()
+
+    # 创建所有表（如果不存在）
+    metadata.create_all(engine)
+    for table in metadata.sorted_tables:
+        ensure_columns(engine, table)
+        ensure_indexes(engine, table)
+    print(f"数据库表 {TABLE_NAME}、news_summary、news_summary_partial、{STATS_TABLE_NAME} 和 {OUTBOX_TABLE_NAME} 初始化完成。")
+
+def build_metadata():
+    """定义全部数据表结构，init_db 与基准测试等需要建表的场景共用"""
     metadata = MetaData()
 
     # 自动创建表结构，A表的名称为cls_news
@@ -41,7 +77,22 @@ def init_db():
         Column('event_type', String(100), comment='事件类型'),
         Column('driver_factor', Text, comment='驱动因素'),
         Column('key_metrics', Text, comment='核心指标'),
-        Column('processed_at', DateTime, comment='分析处理时间')
+        Column('processed_at', DateTime, comment='分析处理时间'),
+
+        # --- 处理状态列 ---
+        Column('duplicate_of', String(64), comment='近似重复新闻对应的原始新闻哈希'),
+        Column('label_source', String(20), comment='结构化结果来源 llm/local/near_dup'),
+        Column('attempt_count', Integer, comment='结构化处理失败次数'),
+        Column('last_error', String(255), comment='最近一次处理失败原因'),
+        Column('next_attempt_at', DateTime, comment='下次允许重试的时间'),
+        Column('dead_lettered_at', DateTime, comment='进入死信状态的时间'),
+        Column('lease_owner', String(100), comment='认领该新闻的 LLM 层实例'),
+        Column('lease_expires_at', DateTime, comment='认领租约到期时间'),
+
+        # 未处理新闻按 id 键集分页读取
+        Index(f'idx_{TABLE_NAME}_processed_at', 'processed_at'),
+        # 分类总结按入库时间窗口一次性读取
+        Index(f'idx_{TABLE_NAME}_create_time', 'create_time')
     )
     
     # 3. 创建分类总结表 news_summary
@@ -53,12 +104,59 @@ def init_db():
         Column('window_start', DateTime, comment='窗口开始时间'),
         Column('window_end', DateTime, comment='窗口结束时间'),
         Column('news_count', Integer, comment='新闻样本数量'),
+        Column('news_included', Integer, comment='写入总结提示词的新闻数量'),
         Column('created_at', DateTime, comment='生成时间')
     )
-    
-    # 创建所有表（如果不存在）
-    metadata.create_all(engine)
-    print(f"数据库表 {TABLE_NAME} 和 news_summary 初始化完成。")
+
+    # 分段总结缓存表 news_summary_partial，每个资产大类每个时间分段一行，窗口总结由分段总结汇总生成
+    partial_table = Table(
+        'news_summary_partial', metadata,
+        Column('partial_id', Integer, primary_key=True, autoincrement=True, comment='分段总结自增ID'),
+        Column('asset_class', String(50), comment='资产大类'),
+        Column('bucket_start', DateTime, comment='分段开始时间'),
+        Column('bucket_end', DateTime, comment='分段结束时间'),
+        Column('fingerprint', String(64), comment='分段内新闻集合的指纹，新闻增减或改分类时变化'),
+        Column('news_count', Integer, comment='分段内新闻数量'),
+        Column('news_included', Integer, comment='写入分段总结提示词的新闻数量'),
+        Column('summary_text', Text, comment='分段总结正文'),
+        Column('created_at', DateTime, comment='生成时间'),
+        Index('uq_news_summary_partial_bucket', 'asset_class', 'bucket_start', unique=True),
+        Index('idx_news_summary_partial_bucket_start', 'bucket_start')
+    )
+
+    # 小时级汇总表 news_stats_hourly，LLM 层写回结构化结果时在同一事务内增量累加
+    # 粒度为 小时 × 资产大类 × 行业板块 × 事件类型，缺失的维度记为空字符串
+    stats_table = Table(
+        STATS_TABLE_NAME, metadata,
+        Column('bucket_hour', DateTime, nullable=False, comment='所属小时（按发布时间，缺失时按入库时间）'),
+        Column('asset_class', String(50), nullable=False, comment='资产大类'),
+        Column('sector', String(100), nullable=False, comment='行业板块'),
+        Column('event_type', String(100), nullable=False, comment='事件类型'),
+        Column('news_count', Integer, nullable=False, comment='新闻数量'),
+        Column('sentiment_count', Integer, nullable=False, comment='有情绪评分的新闻数量'),
+        Column('sentiment_sum', Float(precision=53), nullable=False, comment='情绪评分之和'),
+        Column('sentiment_sumsq', Float(precision=53), nullable=False, comment='情绪评分平方和，用于计算标准差'),
+        Column('impact_count', Integer, nullable=False, comment='有影响权重的新闻数量'),
+        Column('impact_sum', Integer, nullable=False, comment='影响权重之和'),
+        Column('impact_sentiment_sum', Float(precision=53), nullable=False, comment='影响权重加权的情绪评分之和'),
+        Column('impact_sentiment_weight', Integer, nullable=False, comment='参与加权的影响权重之和'),
+        Column('trend_up', Integer, nullable=False, comment='看涨信号数量'),
+        Column('trend_down', Integer, nullable=False, comment='看跌信号数量'),
+        Column('trend_flat', Integer, nullable=False, comment='中性信号数量'),
+        Column('updated_at', DateTime, comment='最近更新时间'),
+        PrimaryKeyConstraint('bucket_hour', 'asset_class', 'sector', 'event_type')
+    )
+
+    # 4. 创建新闻通知表 news_outbox，数据层写入新新闻后追加记录，LLM 层据此及时唤醒
+    outbox_table = Table(
+        OUTBOX_TABLE_NAME, metadata,
+        Column('seq', BigInteger, primary_key=True, autoincrement=True, comment='单调递增序号'),
+        Column('news_id', Integer, comment='新闻ID'),
+        Column('content_hash', String(64), comment='内容哈希值'),
+        Column('created_at', DateTime, comment='通知时间'),
+        Index(f'idx_{OUTBOX_TABLE_NAME}_created_at', 'created_at')
+    )
+    return metadata
 
 if __name__ == "__main__":
     init_db()
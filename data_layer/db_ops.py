@@ -1,39 +1,128 @@
-from sqlalchemy import create_engine, text
-from .config import get_db_url, TABLE_NAME
+from sqlalchemy import text, table, column, insert
+from common.db_pool import get_engine as get_shared_engine
+from datetime import datetime, timedelta
+from .config import get_db_url, TABLE_NAME, OUTBOX_TABLE_NAME, OUTBOX_RETENTION_HOURS, SEEN_CACHE_SIZE, SEEN_CACHE_WARM_SIZE, INGEST_MODE, INGEST_CHUNK_SIZE
+from .hash_cache import SeenHashCache
 import pandas as pd
 
+# 数据层负责写入的原始新闻列
+NEWS_COLUMNS = ['content_hash', 'title', 'content', 'publish_date', 'publish_time', 'create_time']
+
+# 进程内已入库 hash 缓存
+seen_cache = SeenHashCache(SEEN_CACHE_SIZE)
+
 def get_engine():
-    return create_engine(get_db_url())
+    return get_shared_engine(get_db_url())
+
+def warm_seen_cache(limit=SEEN_CACHE_WARM_SIZE):
+    """启动时用最近入库的 hash 预热缓存"""
+    if limit <= 0:
+        return 0
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        query = text(f"SELECT content_hash FROM {TABLE_NAME} ORDER BY id DESC LIMIT :limit")
+        hashes = [row[0] for row in conn.execute(query, {"limit": limit}).fetchall()]
+
+    # 按从旧到新的顺序写入，使最新的 hash 处于 LRU 尾部
+    seen_cache.add_many(reversed(hashes))
+    print(f"已从数据库预热 {len(hashes)} 条 hash 到内存缓存")
+    return len(hashes)
 
-def filter_new_hashes(df):
-    """过滤掉已经存在的 hash"""
+def filter_new_hashes(df, check_db=True):
+    """
+    过滤掉已经存在的 hash
+    check_db=False 时只使用内存缓存过滤（bulk 模式由唯一索引兜底去重）
+    """
     if df is None or df.empty:
         return df
 
-    hashes = tuple(df['content_hash'].unique())
+    hashes = df['content_hash'].unique().tolist()
     if not hashes:
         return df
-        
-    engine = get_engine()
-    with engine.connect() as conn:
-        if len(hashes) == 1:
-            query = text(f"SELECT content_hash FROM {TABLE_NAME} WHERE content_hash = :h")
-            result = conn.execute(query, {"h": hashes[0]})
-        else:
-            query = text(f"SELECT content_hash FROM {TABLE_NAME} WHERE content_hash IN :hashes")
-            result = conn.execute(query, {"hashes": hashes})
-        existing_hashes = {row[0] for row in result.fetchall()}
+
+    # 先查内存缓存，只有未命中的 hash 才查询数据库
+    known_hashes, unknown_hashes = seen_cache.split(hashes)
+    existing_hashes = set(known_hashes)
+
+    if unknown_hashes and check_db:
+        engine = get_engine()
+        with engine.connect() as conn:
+            if len(unknown_hashes) == 1:
+                query = text(f"SELECT content_hash FROM {TABLE_NAME} WHERE content_hash = :h")
+                result = conn.execute(query, {"h": unknown_hashes[0]})
+            else:
+                query = text(f"SELECT content_hash FROM {TABLE_NAME} WHERE content_hash IN :hashes")
+                result = conn.execute(query, {"hashes": tuple(unknown_hashes)})
+            db_hashes = {row[0] for row in result.fetchall()}
+        seen_cache.add_many(db_hashes)
+        existing_hashes |= db_hashes
 
     # 筛选出未存在的 hash
     return df[~df['content_hash'].isin(existing_hashes)]
 
+def publish_new_news(conn, hashes):
+    """在同一事务中将新入库且未处理的新闻写入通知表，返回通知条数"""
+    if not hashes:
+        return 0
+    stmt = text(f"""
+        INSERT INTO {OUTBOX_TABLE_NAME} (news_id, content_hash, created_at)
+        SELECT id, content_hash, :now FROM {TABLE_NAME}
+        WHERE content_hash IN :hashes AND processed_at IS NULL
+    """)
+    return conn.execute(stmt, {"hashes": tuple(hashes), "now": datetime.now()}).rowcount
+
+def prune_outbox(retention_hours=OUTBOX_RETENTION_HOURS):
+    """清理过期的通知记录"""
+    engine = get_engine()
+    with engine.begin() as conn:
+        stmt = text(f"DELETE FROM {OUTBOX_TABLE_NAME} WHERE created_at < :cutoff")
+        return conn.execute(stmt, {"cutoff": datetime.now() - timedelta(hours=retention_hours)}).rowcount
+
+def bulk_insert_news(news_df, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    以多行 INSERT IGNORE 分块写入新闻，返回实际新增的行数。
+    content_hash 唯一索引冲突的行会被静默跳过，多个数据层副本并发写入也不会整批失败。
+    """
+    columns = [c for c in NEWS_COLUMNS if c in news_df.columns]
+    news_df = news_df[columns].drop_duplicates(subset='content_hash')
+    # NaN/NaT 统一转为 None，写入数据库为 NULL
+    records = news_df.astype(object).where(pd.notnull(news_df), None).to_dict('records')
+    news_table = table(TABLE_NAME, *[column(c) for c in columns])
+
+    engine = get_engine()
+    inserted = 0
+    for i in range(0, len(records), chunk_size):
+        chunk = records[i : i + chunk_size]
+        stmt = insert(news_table).values(chunk).prefix_with("IGNORE")
+        with engine.begin() as conn:
+            chunk_inserted = conn.execute(stmt).rowcount
+            if chunk_inserted:
+                publish_new_news(conn, [row['content_hash'] for row in chunk])
+        inserted += chunk_inserted
+        # 无论新增还是被忽略，这些 hash 此时都已存在于数据库中
+        seen_cache.add_many(row['content_hash'] for row in chunk)
+    return inserted
+
 def save_news_to_db(new_news_df):
-    """将新闻数据保存到数据库的A表中"""
+    """将新闻数据保存到数据库的A表中，返回实际新增的行数"""
     if new_news_df is None or len(new_news_df) == 0:
         print("没有新新闻需要写入数据库")
-        return
+        return 0
+
+    if INGEST_MODE == "bulk":
+        inserted = bulk_insert_news(new_news_df)
+        print(f"成功写入 {inserted} 条新新闻到数据库表 {TABLE_NAME} 中 (提交 {len(new_news_df)} 条，其余已存在)")
+        return inserted
     
     engine = get_engine()
+    # 只写入原始新闻列，抓取过程中的辅助列 (如 source_name) 不入库
+    new_news_df = new_news_df[[c for c in NEWS_COLUMNS if c in new_news_df.columns]]
     # 使用 to_sql 批量写入
     new_news_df.to_sql(name=TABLE_NAME, con=engine, if_exists='append', index=False)
+    with engine.begin() as conn:
+        publish_new_news(conn, new_news_df['content_hash'].tolist())
+    # 写入成功后再记入缓存，避免失败的批次被误判为已存在
+    seen_cache.add_many(new_news_df['content_hash'].tolist())
     print(f"成功写入 {len(new_news_df)} 条新新闻到数据库表 {TABLE_NAME} 中")
+    return len(new_news_df)
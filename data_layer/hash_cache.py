@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+class SeenHashCache:
+    """
+    有界 LRU 集合，记录已确认存在于数据库中的 content_hash。
+    命中即可判定为旧新闻，只有未命中的 hash 才需要查询数据库。
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def add_many(self, hashes):
+        with self._lock:
+            for h in hashes:
+                self._items[h] = None
+                self._items.move_to_end(h)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def split(self, hashes):
+        """将 hash 划分为 (已知, 未知) 两组，并更新命中统计"""
+        known, unknown = set(), []
+        with self._lock:
+            for h in hashes:
+                if h in self._items:
+                    self._items.move_to_end(h)
+                    known.add(h)
+                else:
+                    unknown.append(h)
+            self.hits += len(known)
+            self.misses += len(unknown)
+        return known, unknown
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,14 +1,16 @@
-import time
 import os
 import sys
 
 # 将当前项目的根目录添加到 sys.path 中，以便可以基于模块名层级导入
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_layer.config import SPIDER_INTERVAL
+from data_layer import config
 from data_layer.db_init import init_db
-from data_layer.api_client import fetch_news
-from data_layer.db_ops import filter_new_hashes, save_news_to_db
+from data_layer.api_client import fetch_from_sources, merge_results
+from data_layer.sources import get_sources
+from data_layer.scheduler import AdaptivePoller, SourceStats
+from data_layer.db_ops import filter_new_hashes, save_news_to_db, warm_seen_cache, seen_cache, prune_outbox
+from common.db_pool import format_pool_stats
 
 def run():
     print("=== 数据层(Data Layer)启动 ===")
@@ -16,28 +18,65 @@ def run():
     # 1. 自动创建表结构
     print("正在初始化数据库连接与表结构...")
     init_db()
+
+    # 预热已入库 hash 缓存，减少后续去重查询
+    try:
+        warm_seen_cache()
+    except Exception as e:
+        print(f"预热 hash 缓存失败，将直接查询数据库去重: {e}")
+
+    sources = get_sources(config.NEWS_SOURCES)
+    source_stats = {source.name: SourceStats(source.name) for source in sources}
+    poller = AdaptivePoller(
+        base_interval=config.SPIDER_INTERVAL,
+        min_interval=config.SPIDER_MIN_INTERVAL,
+        max_interval=config.SPIDER_MAX_INTERVAL,
+        backoff_factor=config.SPIDER_BACKOFF_FACTOR,
+        speedup_factor=config.SPIDER_SPEEDUP_FACTOR,
+        high_new_ratio=config.SPIDER_HIGH_NEW_RATIO,
+        adaptive=config.SPIDER_ADAPTIVE,
+    )
     
     # 2. 循环爬取
-    print(f"开始爬取财联社新闻，间隔时间为 {SPIDER_INTERVAL} 秒。")
+    print(f"开始爬取新闻，数据源: {config.NEWS_SOURCES}，基准间隔为 {config.SPIDER_INTERVAL} 秒 (自适应: {config.SPIDER_ADAPTIVE})。")
     while True:
+        fetched, inserted, failed = 0, 0, False
         try:
-            # 3. 通过财联社API获取新闻数据
-            news_df = fetch_news()
+            # 3. 并发抓取所有数据源的新闻数据
+            results = fetch_from_sources(sources)
+            news_df = merge_results(results)
+            new_by_source = {}
             
             if news_df is not None and not news_df.empty:
-                # 4. 过滤已存在的数据
-                new_news_df = filter_new_hashes(news_df)
+                # 4. 过滤已存在的数据 (bulk 模式只查内存缓存，由 INSERT IGNORE 兜底去重)
+                new_news_df = filter_new_hashes(news_df, check_db=(config.INGEST_MODE != "bulk"))
+                new_by_source = new_news_df['source_name'].value_counts().to_dict()
                 
                 # 5. 将新闻数据保存到数据库的A表中
-                save_news_to_db(new_news_df)
+                inserted = save_news_to_db(new_news_df)
+                fetched = len(news_df)
             else:
                 print("未获取到任何新闻数据。")
+
+            # 各数据源的新增数按去重后的候选新闻统计
+            for res in results:
+                source_stats[res.name].record(res.latency, len(res.df), new_by_source.get(res.name, 0), res.error)
+            failed = bool(results) and all(res.error for res in results)
+
+            # 清理过期的新闻通知记录
+            prune_outbox()
                 
         except Exception as e:
             print(f"运行过程中遇到错误: {e}")
-            
-        print(f"等待 {SPIDER_INTERVAL} 秒后再次抓取...\n")
-        time.sleep(SPIDER_INTERVAL)
+            failed = True
+
+        interval = poller.update(fetched, inserted, error=failed)
+        print(f"连接池统计: {format_pool_stats()}")
+        print(f"hash 缓存统计: {seen_cache.stats()}")
+        stats_summary = {name: stats.as_dict() for name, stats in source_stats.items()}
+        print(f"数据源统计: {stats_summary}")
+        print(f"等待 {interval:.0f} 秒后再次抓取...\n")
+        poller.wait()
 
 if __name__ == "__main__":
     run()
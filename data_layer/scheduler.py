@@ -0,0 +1,78 @@
+import time
+
+class SourceStats:
+    """单个数据源的抓取统计"""
+    def __init__(self, name, ewma_alpha=0.3):
+        self.name = name
+        self.ewma_alpha = ewma_alpha
+        self.polls = 0
+        self.errors = 0
+        self.total_fetched = 0
+        self.total_new = 0
+        self.last_new = 0
+        self.last_latency = 0.0
+        self.avg_latency = None
+
+    def record(self, latency, fetched, new, error=None):
+        self.polls += 1
+        self.last_latency = latency
+        self.avg_latency = latency if self.avg_latency is None else \
+            self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.avg_latency
+        if error:
+            self.errors += 1
+            self.last_new = 0
+            return
+        self.total_fetched += fetched
+        self.total_new += new
+        self.last_new = new
+
+    def as_dict(self):
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_new": self.last_new,
+            "avg_new_per_poll": round(self.total_new / self.polls, 2) if self.polls else 0.0,
+            "last_latency": round(self.last_latency, 3),
+            "avg_latency": round(self.avg_latency or 0.0, 3),
+        }
+
+class AdaptivePoller:
+    """
+    自适应抓取调度器
+    - 新增比例高时缩短间隔，无新增或出错时指数退避，其余情况回到基准间隔
+    - 基于单调时钟按截止时间调度，抓取耗时不会叠加到间隔上造成漂移
+    """
+    def __init__(self, base_interval, min_interval, max_interval,
+                 backoff_factor=1.5, speedup_factor=0.5, high_new_ratio=0.3, adaptive=True):
+        self.base_interval = base_interval
+        self.min_interval = float(min(min_interval, base_interval))
+        self.max_interval = float(max(max_interval, base_interval))
+        self.backoff_factor = backoff_factor
+        self.speedup_factor = speedup_factor
+        self.high_new_ratio = high_new_ratio
+        self.adaptive = adaptive
+        self.interval = float(base_interval)
+        self._deadline = time.monotonic()
+
+    def update(self, fetched, new, error=False):
+        """根据本轮结果计算下一轮间隔"""
+        if not self.adaptive:
+            return self.interval
+
+        if error or new == 0:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+        elif fetched and new / fetched >= self.high_new_ratio:
+            # 大部分都是新新闻，说明行情活跃甚至可能漏抓，加快节奏
+            self.interval = max(min(self.interval, self.base_interval) * self.speedup_factor, self.min_interval)
+        else:
+            self.interval = float(self.base_interval)
+        return self.interval
+
+    def wait(self):
+        """睡眠到下一次抓取的截止时间"""
+        self._deadline += self.interval
+        now = time.monotonic()
+        if self._deadline < now:
+            # 本轮耗时已超过间隔，不做补跑，从当前时间重新计时
+            self._deadline = now
+        time.sleep(self._deadline - now)
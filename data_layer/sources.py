@@ -0,0 +1,84 @@
+import time
+import pandas as pd
+from abc import ABC, abstractmethod
+from .config import SOURCE_TIMEOUT
+
+# 所有数据源统一输出的标准列（content_hash 由抓取框架合并后统一计算）
+NORMALIZED_COLUMNS = ['title', 'content', 'publish_date', 'publish_time']
+
+# 数据源注册表：名称 -> 数据源类
+SOURCE_REGISTRY = {}
+
+def register_source(source_cls):
+    """注册数据源类，可作为类装饰器使用"""
+    SOURCE_REGISTRY[source_cls.name] = source_cls
+    return source_cls
+
+class BaseNewsSource(ABC):
+    name = "base"
+    # 原始列名 -> 标准列名
+    column_map = {}
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout if timeout is not None else SOURCE_TIMEOUT
+
+    @abstractmethod
+    def fetch_raw(self):
+        """返回数据源原始 DataFrame"""
+        pass
+
+    def fetch(self):
+        """抓取并转换为标准列"""
+        df = self.fetch_raw()
+        if df is None or df.empty:
+            return pd.DataFrame(columns=NORMALIZED_COLUMNS)
+        df = df.rename(columns=self.column_map)
+        for col in NORMALIZED_COLUMNS:
+            if col not in df.columns:
+                df[col] = None
+        return df[NORMALIZED_COLUMNS]
+
+@register_source
+class ClsNewsSource(BaseNewsSource):
+    """财联社电报"""
+    name = "cls"
+    column_map = {
+        '标题': 'title',
+        '内容': 'content',
+        '发布日期': 'publish_date',
+        '发布时间': 'publish_time'
+    }
+
+    def fetch_raw(self):
+        import akshare as ak
+        return ak.stock_info_global_cls(symbol="全部")
+
+class StaticNewsSource(BaseNewsSource):
+    """
+    本地固定数据源，用于离线调试与测试，无需网络。
+    records: 已是标准列的字典列表；delay: 模拟抓取耗时（秒）；error: 模拟抓取异常
+    """
+    def __init__(self, name, records, delay=0, error=None, timeout=None):
+        super().__init__(timeout)
+        self.name = name
+        self.records = records
+        self.delay = delay
+        self.error = error
+
+    def fetch_raw(self):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return pd.DataFrame(self.records)
+
+def get_sources(names):
+    """按名称实例化已注册的数据源"""
+    sources = []
+    for name in names:
+        source_cls = SOURCE_REGISTRY.get(name)
+        if source_cls is None:
+            print(f"未知的数据源 {name}，已跳过。可用数据源: {list(SOURCE_REGISTRY)}")
+            continue
+        sources.append(source_cls())
+    return sources
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
@@ -12,6 +11,8 @@ import json
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from frontend_layer import config
+from common.db_pool import get_engine
+from sqlalchemy import text
 
 # 页面设置
 st.set_page_config(
@@ -85,11 +86,19 @@ st.markdown("""
 
 # --- 数据加载函数 ---
 @st.cache_data(ttl=60)
-def load_news_data():
+def load_news_data(start_dt, end_dt):
+    """读取时间范围内最新的新闻明细（最多 DETAIL_ROW_LIMIT 条），汇总指标与图表改由小时级汇总表计算"""
     try:
-        engine = create_engine(config.get_db_url())
-        query = f"SELECT * FROM {config.TABLE_NAME} ORDER BY create_time DESC"
-        df = pd.read_sql(query, con=engine)
+        engine = get_engine(config.get_db_url())
+        # 按入库时间走索引过滤，结束时间多放宽一天以覆盖补录的新闻，再按发布时间精确筛选
+        query = text(f"""
+            SELECT * FROM {config.TABLE_NAME}
+            WHERE create_time >= :start AND create_time < :end
+            ORDER BY create_time DESC LIMIT :limit
+        """)
+        df = pd.read_sql(query, con=engine, params={
+            "start": start_dt, "end": end_dt + timedelta(days=1), "limit": config.DETAIL_ROW_LIMIT
+        })
         if not df.empty:
             # 处理 MySQL Time 类型 (Read as Timedelta) 导致的报错
             # 我们将 publish_date 和 publish_time 合并
@@ -110,10 +119,51 @@ def load_news_data():
         st.code(traceback.format_exc()) # 方便调试
         return pd.DataFrame()
 
+@st.cache_data(ttl=60)
+def load_news_count(start_dt, end_dt):
+    """时间范围内的入库新闻总数"""
+    try:
+        engine = get_engine(config.get_db_url())
+        with engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT COUNT(*) FROM {config.TABLE_NAME} WHERE create_time >= :start AND create_time < :end"),
+                {"start": start_dt, "end": end_dt}
+            ).scalar()
+    except Exception as e:
+        return 0
+
+@st.cache_data(ttl=60)
+def load_stats_data(start_dt, end_dt):
+    """读取时间范围内的小时级汇总行，扫描量与汇总桶数成正比而与新闻条数无关"""
+    try:
+        engine = get_engine(config.get_db_url())
+        query = text(f"""
+            SELECT * FROM {config.STATS_TABLE}
+            WHERE bucket_hour >= :start AND bucket_hour < :end
+        """)
+        df = pd.read_sql(query, con=engine, params={"start": start_dt, "end": end_dt})
+        if not df.empty:
+            df['bucket_hour'] = pd.to_datetime(df['bucket_hour'])
+            for col in ['asset_class', 'sector', 'event_type']:
+                df[col] = df[col].replace('', '未分类')
+        return df
+    except Exception as e:
+        st.error(f"汇总数据加载失败: {e}")
+        return pd.DataFrame()
+
+def sentiment_stats(stats_df, by):
+    """由汇总行计算分组的情绪均值与标准差"""
+    grouped = stats_df.groupby(by, as_index=False)[['news_count', 'sentiment_count', 'sentiment_sum', 'sentiment_sumsq']].sum()
+    grouped = grouped[grouped['sentiment_count'] > 0]
+    grouped['sentiment_mean'] = grouped['sentiment_sum'] / grouped['sentiment_count']
+    variance = grouped['sentiment_sumsq'] / grouped['sentiment_count'] - grouped['sentiment_mean'] ** 2
+    grouped['sentiment_std'] = variance.clip(lower=0) ** 0.5
+    return grouped
+
 @st.cache_data(ttl=60)
 def load_summary_data():
     try:
-        engine = create_engine(config.get_db_url())
+        engine = get_engine(config.get_db_url())
         query = f"SELECT * FROM {config.SUMMARY_TABLE} ORDER BY created_at DESC"
         df = pd.read_sql(query, con=engine)
         return df
@@ -154,64 +204,75 @@ st.sidebar.divider()
 if menu == "📊 实时仪表板":
     st.title("🚀 全球金融新闻实时监控")
     
-    df = load_news_data()
-    if df.empty:
-        st.warning("暂无数据。请确保后端爬虫与处理模组已启动。")
+    # 应用时间筛选 (包含结束当天)，未选择完整区间时默认最近 7 天
+    if date_range and len(date_range) == 2:
+        start_date, end_date = date_range
     else:
-        # 应用时间筛选
-        if date_range and len(date_range) == 2:
-            start_date, end_date = date_range
-            # 转换为 datetime 以便比对 (包含结束当天)
-            start_dt = pd.to_datetime(start_date)
-            end_dt = pd.to_datetime(end_date) + timedelta(days=1)
-            
-            df = df[(df['full_publish_time'] >= start_dt) & (df['full_publish_time'] < end_dt)]
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=7)
+    start_dt = pd.to_datetime(start_date).to_pydatetime()
+    end_dt = (pd.to_datetime(end_date) + timedelta(days=1)).to_pydatetime()
 
-        if df.empty:
-            st.info(f"在 {date_range[0]} 至 {date_range[1]} 期间暂无新闻数据。")
-        else:
-            # 顶部指标
-            processed_df = df[df['processed_at'].notnull()]
-            
-            c1, c2, c3, c4 = st.columns(4)
-            with c1:
-                st.metric("入库新闻", len(df))
-            with c2:
-                st.metric("结构化分析", len(processed_df))
-            with c3:
-                avg_sentiment = processed_df['sentiment_score'].mean() if not processed_df.empty else 0
-                color = "normal" if abs(avg_sentiment) < 0.2 else "inverse"
-                st.metric("平均情绪", f"{avg_sentiment:.2f}", delta=f"{avg_sentiment:.2f}", delta_color=color)
-            with c4:
-                if not processed_df.empty:
-                    hot_asset = processed_df['asset_class'].mode()[0]
-                    st.metric("焦点资产", hot_asset)
-                else:
-                    st.metric("焦点资产", "N/A")
+    df = load_news_data(start_dt, end_dt)
+    stats_df = load_stats_data(start_dt, end_dt)
+    if not df.empty:
+        df = df[(df['full_publish_time'] >= start_dt) & (df['full_publish_time'] < end_dt)]
 
-            # 布局
-            t1, t2 = st.tabs(["📉 趋势与分布", "📄 数据明细记录"])
+    if df.empty and stats_df.empty:
+        st.info(f"在 {start_date} 至 {end_date} 期间暂无新闻数据。请确保后端爬虫与处理模组已启动。")
+    else:
+        # 顶部指标，结构化分析相关指标均由小时级汇总表计算
+        processed_count = int(stats_df['news_count'].sum()) if not stats_df.empty else 0
+        
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            st.metric("入库新闻", load_news_count(start_dt, end_dt))
+        with c2:
+            st.metric("结构化分析", processed_count)
+        with c3:
+            sentiment_count = stats_df['sentiment_count'].sum() if not stats_df.empty else 0
+            avg_sentiment = stats_df['sentiment_sum'].sum() / sentiment_count if sentiment_count else 0
+            color = "normal" if abs(avg_sentiment) < 0.2 else "inverse"
+            st.metric("平均情绪", f"{avg_sentiment:.2f}", delta=f"{avg_sentiment:.2f}", delta_color=color)
+        with c4:
+            if processed_count:
+                hot_asset = stats_df.groupby('asset_class')['news_count'].sum().idxmax()
+                st.metric("焦点资产", hot_asset)
+            else:
+                st.metric("焦点资产", "N/A")
+
+        # 布局
+        t1, t2 = st.tabs(["📉 趋势与分布", "📄 数据明细记录"])
+        
+        with t1:
+            col_l, col_r = st.columns([2, 1])
+            with col_l:
+                st.subheader("💡 行业情绪离散度")
+                if processed_count:
+                    # 均值 ± 标准差，由汇总表中的情绪评分和与平方和计算
+                    sector_df = sentiment_stats(stats_df, 'sector')
+                    fig = px.bar(sector_df, x="sector", y="sentiment_mean", error_y="sentiment_std", color="sector",
+                                 hover_data=["news_count"], template="plotly_dark")
+                    st.plotly_chart(fig, use_container_width=True)
+            with col_r:
+                st.subheader("🧭 资产类别分布")
+                if processed_count:
+                    impact_df = stats_df.groupby(['asset_class', 'event_type'], as_index=False)['impact_sum'].sum()
+                    fig_pie = px.sunburst(impact_df[impact_df['impact_sum'] > 0], path=['asset_class', 'event_type'],
+                                          values='impact_sum', template="plotly_dark")
+                    st.plotly_chart(fig_pie, use_container_width=True)
             
-            with t1:
-                col_l, col_r = st.columns([2, 1])
-                with col_l:
-                    st.subheader("💡 行业情绪离散度")
-                    if not processed_df.empty:
-                        fig = px.box(processed_df, x="sector", y="sentiment_score", color="sector", template="plotly_dark")
-                        st.plotly_chart(fig, use_container_width=True)
-                with col_r:
-                    st.subheader("🧭 资产类别分布")
-                    if not processed_df.empty:
-                        fig_pie = px.sunburst(processed_df, path=['asset_class', 'event_type'], values='impact_weight', template="plotly_dark")
-                        st.plotly_chart(fig_pie, use_container_width=True)
-                
-                if not processed_df.empty:
-                    st.subheader("📈 情绪波段演变 (Timeline)")
-                    fig_line = px.line(processed_df.sort_values('full_publish_time'), x='full_publish_time', y='sentiment_score', 
-                                       color='asset_class', markers=True, template="plotly_dark", line_shape='spline')
-                    st.plotly_chart(fig_line, use_container_width=True)
+            if processed_count:
+                st.subheader("📈 情绪波段演变 (Timeline)")
+                timeline_df = sentiment_stats(stats_df, ['bucket_hour', 'asset_class']).sort_values('bucket_hour')
+                fig_line = px.line(timeline_df, x='bucket_hour', y='sentiment_mean', hover_data=["news_count"],
+                                   color='asset_class', markers=True, template="plotly_dark", line_shape='spline')
+                st.plotly_chart(fig_line, use_container_width=True)
 
-            with t2:
+        with t2:
+            if df.empty:
+                st.info("该时间范围内暂无新闻明细。")
+            else:
                 st.dataframe(
                     df[['full_publish_time', 'title', 'asset_class', 'sector', 'sentiment_score', 'impact_weight']],
                     column_config={
@@ -11,6 +11,8 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "yourpassword")
 DB_NAME = os.getenv("DB_NAME", "news_analysis")
 TABLE_NAME = "all_news"
 SUMMARY_TABLE = "news_summary"
+STATS_TABLE = "news_stats_hourly"
+DETAIL_ROW_LIMIT = int(os.getenv("DASHBOARD_DETAIL_LIMIT", 1000))  # 数据明细最多展示的新闻条数
 
 # 交互层 API 配置
 INTERACTIVE_API_HOST = os.getenv("INTERACTIVE_API_HOST", "localhost")
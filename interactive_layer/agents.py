@@ -1,13 +1,42 @@
-from .llm_client import agent_template
+import json
+import re
+from .llm_client import agent_template, aagent_template
 
 from .config import DEFAULT_MODEL_NAME
 from .prompt import get_sql_prompt, get_summary_prompt
 
+def extract_json(text):
+    """从文本中提取 JSON"""
+    try:
+        match = re.search(r'(\{.*\})', text, re.DOTALL)
+        if match:
+            return json.loads(match.group(1))
+        return json.loads(text)
+    except:
+        return None
+
+def parse_sql_response(sql_response_raw):
+    """解析 SQL 智能体的输出，返回 (sql, 目标表)；无法解析时返回 None"""
+    sql_data = extract_json(sql_response_raw)
+    if not sql_data or "sql" not in sql_data:
+        return None
+    return sql_data.get("sql"), sql_data.get("table", "unknown")
+
+def _is_valid_sql_response(sql_response_raw):
+    # 只缓存能解析出 SQL 的回答，避免一次格式错误的输出在缓存有效期内被反复返回
+    return parse_sql_response(sql_response_raw) is not None
+
 def sql_agent(query, model_name=DEFAULT_MODEL_NAME):
     """
     SQL 生成智能体
     """
-    return agent_template(get_sql_prompt(), query, model_name)
+    return agent_template(get_sql_prompt(), query, model_name, validate=_is_valid_sql_response)
+
+async def asql_agent(query, model_name=DEFAULT_MODEL_NAME):
+    return await aagent_template(get_sql_prompt(), query, model_name, validate=_is_valid_sql_response)
+
+def _summary_input(query, data_context):
+    return f"用户问题: {query}\n\n数据库查询结果: {data_context}"
 
 def summary_agent(query, data_context, model_name=DEFAULT_MODEL_NAME):
     """
@@ -15,6 +44,8 @@ def summary_agent(query, data_context, model_name=DEFAULT_MODEL_NAME):
     query: 用户的原始问题
     data_context: 从数据库查询到的数据内容
     """
-    user_input = f"用户问题: {query}\n\n数据库查询结果: {data_context}"
-    return agent_template(get_summary_prompt(), user_input, model_name)
+    return agent_template(get_summary_prompt(), _summary_input(query, data_context), model_name)
+
+async def asummary_agent(query, data_context, model_name=DEFAULT_MODEL_NAME):
+    return await aagent_template(get_summary_prompt(), _summary_input(query, data_context), model_name)
 
@@ -1,3 +1,4 @@
+import json
 import os
 
 # 数据库配置
@@ -10,12 +11,21 @@ TABLE_NAME = "all_news"
 SUMMARY_TABLE_NAME = "news_summary"
 
 def get_db_url():
-    return f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # DB_URL 可直接指定完整连接串（如基准测试时使用 SQLite），优先于上面的各项配置
+    return os.getenv("DB_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # API 服务配置
 API_HOST = "0.0.0.0"
 API_PORT = 8001
 CHAT_PATH = "/chat"
+API_WORKERS = int(os.getenv("API_WORKERS", 1))  # uvicorn 工作进程数
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 32))  # 每个进程同时处理的问答数，超出的请求排队等待
+DB_QUERY_WORKERS = int(os.getenv("DB_QUERY_WORKERS", 8))  # 每个进程执行数据库查询的线程数
+
+# 问答各阶段超时（秒），总和应小于前端请求的 60 秒超时
+SQL_AGENT_TIMEOUT = float(os.getenv("SQL_AGENT_TIMEOUT", 20))
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", 10))
+SUMMARY_AGENT_TIMEOUT = float(os.getenv("SUMMARY_AGENT_TIMEOUT", 25))
 
 # LLM 模型配置映射
 LLM_CONFIGS = {
@@ -24,6 +34,15 @@ LLM_CONFIGS = {
         "base_url": os.getenv("ONLINE_BASE_URL", "https://api.deepseek.com"),
     }
 }
+# 额外的模型，JSON 格式：{"模型名": {"api_key": "...", "base_url": "..."}}，同名时覆盖上面的默认模型
+LLM_CONFIGS.update(json.loads(os.getenv("LLM_MODELS") or "{}"))
+
+# LLM HTTP 连接池（每个模型一个，服务启动时创建并在请求间复用）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))  # 每个模型的最大连接数，应不小于 2 × MAX_CONCURRENT_REQUESTS
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", 32))  # 每个模型保持的空闲长连接数
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))  # 空闲长连接保留秒数
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"  # 安装了 h2 时启用 HTTP/2
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 60))  # 单次 LLM 请求超时（秒）
 
 # 默认模型名称
 DEFAULT_MODEL_NAME = os.getenv("ONLINE_MODEL", "deepseek-chat")
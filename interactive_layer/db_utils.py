@@ -1,12 +1,21 @@
-from sqlalchemy import create_engine, text
-from .config import get_db_url
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from common.db_pool import get_engine
+from .config import get_db_url, DB_QUERY_WORKERS, DB_QUERY_TIMEOUT
+
+# 数据库查询专用线程池，线程数不应超过连接池的 DB_POOL_SIZE + DB_MAX_OVERFLOW
+_db_executor = ThreadPoolExecutor(max_workers=DB_QUERY_WORKERS, thread_name_prefix="db-query")
 
 def execute_sql(sql_query, table_name="unknown"):
     """执行 SQL 并返回列表字典格式的结果"""
     print(f"执行数据库查询, 目标表: {table_name}")
-    engine = create_engine(get_db_url())
+    engine = get_engine(get_db_url())
     try:
         with engine.connect() as conn:
+            if conn.dialect.name == 'mysql' and DB_QUERY_TIMEOUT > 0:
+                # 由 MySQL 在超时后中止 SELECT，避免超时请求的查询继续占用线程与连接
+                conn.execute(text("SET SESSION max_execution_time = :ms"), {"ms": int(DB_QUERY_TIMEOUT * 1000)})
             result = conn.execute(text(sql_query))
             # 将结果转换为字典列表
             if result.returns_rows:
@@ -16,3 +25,7 @@ def execute_sql(sql_query, table_name="unknown"):
         print(f"SQL Execution Error on table {table_name}: {e}")
         return []
 
+async def aexecute_sql(sql_query, table_name="unknown"):
+    """在数据库线程池中执行查询，等待期间不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, execute_sql, sql_query, table_name)
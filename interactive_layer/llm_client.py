@@ -1,16 +1,37 @@
-from openai import OpenAI
-from .config import LLM_CONFIGS, DEFAULT_MODEL_NAME
+import asyncio
+import importlib.util
+import threading
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from common.llm_cache import get_llm_cache, LLMResponseCache, text_digest
+from .config import (
+    LLM_CONFIGS, DEFAULT_MODEL_NAME, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY,
+    LLM_HTTP2, LLM_REQUEST_TIMEOUT,
+)
+
+def _model_config(model_name):
+    config = LLM_CONFIGS.get(model_name)
+    if not config:
+        raise ValueError(f"Model {model_name} not configured in config.py")
+    return config
+
+def http_options():
+    """LLM HTTP 连接池参数；HTTP/2 依赖 h2 包，未安装时退回 HTTP/1.1 长连接"""
+    return {
+        "limits": httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                               keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+        "http2": LLM_HTTP2 and importlib.util.find_spec("h2") is not None,
+    }
 
 class LLMClient:
-    def __init__(self, model_name=DEFAULT_MODEL_NAME):
-        config = LLM_CONFIGS.get(model_name)
-        if not config:
-            raise ValueError(f"Model {model_name} not configured in config.py")
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, http_client=None):
+        config = _model_config(model_name)
         
         self.model_name = model_name
         self.api_key = config["api_key"]
         self.base_url = config["base_url"]
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=LLM_REQUEST_TIMEOUT,
+                             http_client=http_client)
 
     def chat(self, system_prompt, user_query):
         """
@@ -30,10 +51,119 @@ class LLMClient:
             print(f"LLM Client Error ({self.model_name}): {e}")
             return f"Error: {str(e)}"
 
-def agent_template(system_prompt, user_query, model_name=DEFAULT_MODEL_NAME):
+class AsyncLLMClient:
+    """异步对话客户端，等待 LLM 响应期间不阻塞事件循环，可被同一事件循环中的并发请求共享"""
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, http_client=None):
+        config = _model_config(model_name)
+
+        self.model_name = model_name
+        self.client = AsyncOpenAI(api_key=config["api_key"], base_url=config["base_url"], timeout=LLM_REQUEST_TIMEOUT,
+                                  http_client=http_client)
+
+    async def chat(self, system_prompt, user_query):
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_query},
+                ],
+                stream=False
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            print(f"LLM Client Error ({self.model_name}): {e}")
+            return f"Error: {str(e)}"
+
+class ClientRegistry:
+    """
+    按模型保存的同步与异步客户端，每个客户端持有独立的长连接池，问答的两次 LLM 调用及后续请求都复用已建立的连接
+    异步客户端的连接绑定在首次使用它的事件循环上，只应在 API 服务的事件循环中使用
+    """
+    def __init__(self, configs=None):
+        options = http_options()
+        self.http2 = options["http2"]
+        self.models = list(configs or LLM_CONFIGS)
+        self.clients = {name: LLMClient(name, http_client=DefaultHttpxClient(**options)) for name in self.models}
+        self.async_clients = {name: AsyncLLMClient(name, http_client=DefaultAsyncHttpxClient(**options))
+                              for name in self.models}
+
+    def get(self, model_name=DEFAULT_MODEL_NAME):
+        client = self.clients.get(model_name)
+        if client is None:
+            raise ValueError(f"Model {model_name} not configured in config.py")
+        return client
+
+    def get_async(self, model_name=DEFAULT_MODEL_NAME):
+        client = self.async_clients.get(model_name)
+        if client is None:
+            raise ValueError(f"Model {model_name} not configured in config.py")
+        return client
+
+    async def aclose(self):
+        for client in self.clients.values():
+            client.client.close()
+        for client in self.async_clients.values():
+            await client.client.close()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry():
+    """返回进程内共享的客户端注册表，首次调用时创建"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+                print(f"LLM 客户端已创建: {', '.join(_registry.models)} "
+                      f"(HTTP/2: {'开启' if _registry.http2 else '关闭'}, 最大连接数: {LLM_MAX_CONNECTIONS})")
+    return _registry
+
+async def close_client_registry():
+    """关闭全部客户端的连接池，API 服务退出时调用"""
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        await registry.aclose()
+
+def _cache_key(system_prompt, user_query, model_name):
+    return LLMResponseCache.make_key("agent", system_prompt, model_name, text_digest(user_query))
+
+def _cacheable(response, validate):
+    """调用失败时返回的是错误信息，不写入缓存；提供 validate 时只缓存通过校验的回答"""
+    if not response or response.startswith("Error:"):
+        return False
+    return validate is None or bool(validate(response))
+
+def agent_template(system_prompt, user_query, model_name=DEFAULT_MODEL_NAME, validate=None):
     """
     智能体模板函数
     输入：提示词 (system_prompt)、用户输入 (user_query)、LLM名称 (model_name)
+    validate：校验回答能否被调用方使用的函数，无法使用的回答不写入缓存，也不从缓存返回
     """
-    client = LLMClient(model_name=model_name)
-    return client.chat(system_prompt, user_query)
+    # 相同的提示词、问题与模型直接复用缓存的回答
+    cache = get_llm_cache()
+    cache_key = _cache_key(system_prompt, user_query, model_name)
+    cached = cache.get(cache_key) if cache else None
+    if cached and _cacheable(cached, validate):
+        return cached
+
+    response = get_client_registry().get(model_name).chat(system_prompt, user_query)
+    if cache and _cacheable(response, validate):
+        cache.set(cache_key, response)
+    return response
+
+async def aagent_template(system_prompt, user_query, model_name=DEFAULT_MODEL_NAME, validate=None):
+    """agent_template 的异步版本，缓存逻辑相同；本地 SQLite 缓存的读写在线程中执行，不阻塞事件循环"""
+    cache = get_llm_cache()
+    cache_key = _cache_key(system_prompt, user_query, model_name)
+    cached = await asyncio.to_thread(cache.get, cache_key) if cache else None
+    if cached and _cacheable(cached, validate):
+        return cached
+
+    response = await get_client_registry().get_async(model_name).chat(system_prompt, user_query)
+    if cache and _cacheable(response, validate):
+        await asyncio.to_thread(cache.set, cache_key, response)
+    return response
@@ -0,0 +1,115 @@
+"""
+交互层 /chat 接口压测：依次以不同并发用户数持续提问，统计吞吐与延迟分位数，检验吞吐是否随并发用户数增长。
+--self-host 模式在本进程内启动模拟 LLM 服务、临时 SQLite 测试库（写入合成新闻）与交互层服务后再压测。
+运行方式:
+    python -m interactive_layer.load_test --self-host
+    python -m interactive_layer.load_test --url http://localhost:8001 --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmark.run_benchmark import QUESTIONS, free_port, percentile, start_mock_server
+
+def start_self_hosted(args):
+    """启动模拟 LLM 服务与交互层服务，返回交互层地址；各层配置在导入时读取环境变量，必须先设置环境再导入"""
+    import uvicorn
+
+    db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.sqlite3')}?timeout=30"
+    os.environ["DB_URL"] = db_url
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    mock_port = free_port()
+    os.environ["ONLINE_BASE_URL"] = f"http://127.0.0.1:{mock_port}"
+    os.environ["ONLINE_API_KEY"] = "mock"
+    start_mock_server(args, mock_port)
+
+    from benchmark.run_benchmark import prepare_database, seed_news
+    seed_news(prepare_database(db_url, reset=False), args.news, args.seed)
+
+    from interactive_layer.main import app
+    api_port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=api_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    print(f"数据库: {db_url}\nLLM 服务: {os.environ['ONLINE_BASE_URL']}（中位延迟 {args.latency_ms} 毫秒）")
+    return f"http://127.0.0.1:{api_port}"
+
+async def run_level(url, users, requests_per_user, timeout):
+    """users 个并发用户各自连续提问 requests_per_user 次"""
+    latencies, errors = [], 0
+
+    async def user(client, offset):
+        nonlocal errors
+        for i in range(requests_per_user):
+            question = QUESTIONS[(offset + i) % len(QUESTIONS)]
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/chat", json={"user_input": question})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client, offset) for offset in range(users)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "users": users,
+        "requests": users * requests_per_user,
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+def print_results(results):
+    base = results[0]["throughput"] if results and results[0]["throughput"] else None
+    print(f"{'并发用户':>8} {'请求数':>6} {'失败':>4} {'耗时(秒)':>9} {'吞吐(次/秒)':>11} {'p50(毫秒)':>10} {'p99(毫秒)':>10} {'加速比':>6}")
+    for r in results:
+        p50 = f"{r['p50'] * 1000:.0f}" if r["p50"] is not None else "-"
+        p99 = f"{r['p99'] * 1000:.0f}" if r["p99"] is not None else "-"
+        speedup = f"{r['throughput'] / base:.1f}x" if base else "-"
+        print(f"{r['users']:>8} {r['requests']:>6} {r['errors']:>4} {r['elapsed']:>9.2f} {r['throughput']:>11.2f} "
+              f"{p50:>10} {p99:>10} {speedup:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description="交互层 /chat 接口并发压测")
+    parser.add_argument("--url", default="http://localhost:8001", help="交互层服务地址（--self-host 时忽略）")
+    parser.add_argument("--self-host", action="store_true", help="在本进程内启动模拟 LLM 服务、测试库与交互层服务")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="依次测试的并发用户数，逗号分隔")
+    parser.add_argument("--requests-per-user", type=int, default=4, help="每个用户连续提问的次数")
+    parser.add_argument("--timeout", type=float, default=60, help="单次请求超时（秒），与前端一致")
+    parser.add_argument("--news", type=int, default=300, help="--self-host 时写入的合成新闻条数")
+    parser.add_argument("--latency-ms", type=float, default=800, help="模拟服务延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="模拟服务延迟的对数正态 sigma")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    # 模拟服务的其余参数：交互层压测只关心并发能力，不注入故障
+    args.per_item_ms, args.error_rate, args.rate_limit_rate, args.malformed_rate = 0.0, 0.0, 0.0, 0.0
+
+    url = start_self_hosted(args) if args.self_host else args.url.rstrip("/")
+    levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+    results = []
+    for users in levels:
+        print(f"压测 {users} 个并发用户...")
+        results.append(asyncio.run(run_level(url, users, args.requests_per_user, args.timeout)))
+    print_results(results)
+
+if __name__ == "__main__":
+    main()
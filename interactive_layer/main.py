@@ -1,11 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from .service import InteractiveService
-from .config import API_HOST, API_PORT, CHAT_PATH
+from .service import InteractiveService, StageTimeout
+from .llm_client import get_client_registry, close_client_registry
+from .config import API_HOST, API_PORT, CHAT_PATH, API_WORKERS, MAX_CONCURRENT_REQUESTS
+from common.db_pool import get_pool_stats
+from common.llm_cache import get_llm_cache
 import uvicorn
 
-app = FastAPI(title="News Intelligence Interaction Layer")
+@asynccontextmanager
+async def lifespan(app):
+    # 启动时为每个配置的模型创建客户端与连接池，避免首个请求承担创建开销
+    get_client_registry()
+    yield
+    await close_client_registry()
+
+app = FastAPI(title="News Intelligence Interaction Layer", lifespan=lifespan)
 service = InteractiveService()
+# 限制单个进程同时处理的问答数，避免突发请求压垮 LLM 接口与数据库连接池
+request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
 class QuestionRequest(BaseModel):
     user_input: str
@@ -14,6 +28,14 @@ class QuestionRequest(BaseModel):
 def read_root():
     return {"status": "success", "message": "Interaction Layer API is running"}
 
+@app.get("/stats")
+def read_stats():
+    """
+    运行状态统计（数据库连接池等）
+    """
+    cache = get_llm_cache()
+    return {"db_pool": get_pool_stats(), "llm_cache": cache.stats() if cache else None}
+
 @app.post(CHAT_PATH)
 async def chat(request: QuestionRequest):
     """
@@ -23,15 +45,22 @@ async def chat(request: QuestionRequest):
         raise HTTPException(status_code=400, detail="user_input cannot be empty")
     
     try:
-        answer = service.ask(request.user_input)
+        async with request_slots:
+            answer = await service.aask(request.user_input)
         return {"answer": answer}
+    except StageTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Chat API Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 def run():
-    print(f"正在启动交互层服务器: http://{API_HOST}:{API_PORT}")
-    uvicorn.run(app, host=API_HOST, port=API_PORT)
+    print(f"正在启动交互层服务器: http://{API_HOST}:{API_PORT} (工作进程: {API_WORKERS})")
+    if API_WORKERS > 1:
+        # 多进程模式需要以导入字符串的形式传入应用
+        uvicorn.run("interactive_layer.main:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host=API_HOST, port=API_PORT)
 
 if __name__ == "__main__":
     run()
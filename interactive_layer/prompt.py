@@ -23,17 +23,31 @@ def get_sql_prompt(current_time=None):
 
 2. 表 `all_news` (新闻细节表):
    - 适用于：查询具体事实、具体公司/标的（如：黄金、英伟达、特斯拉）、具体行业板块（如：芯片、医药）的消息。
-   - 字段：id, title, content, publish_date, publish_time, source, region, subject, asset_class, sector, sentiment_score, impact_weight, trend_signal, event_type, driver_factor, key_metrics, create_time
+   - 字段：id, title, content, publish_date, publish_time, source, region, subject, asset_class, sector, sentiment_score, impact_weight, trend_signal, event_type, driver_factor, key_metrics, create_time, label_source
+   - label_source 为 'local' 的新闻由本地分类器标注，只有 asset_class, sector, event_type, trend_signal，sentiment_score、impact_weight 等其余字段为 NULL；按情绪或影响力筛选、排序时加上 sentiment_score IS NOT NULL 或 impact_weight IS NOT NULL。
+
+3. 表 `news_stats_hourly` (小时级统计汇总表):
+   - 适用于：按资产大类、行业板块、事件类型或时间统计新闻数量、平均情绪、情绪波动、看涨看跌占比等聚合问题。
+   - 粒度：每小时 × asset_class × sector × event_type 一行，缺失的维度为空字符串。
+   - 字段：
+     - bucket_hour: 所属小时 (如 2026-02-25 09:00:00)
+     - asset_class, sector, event_type: 维度，取值同 all_news
+     - news_count: 新闻数量（含本地分类器标注、没有情绪分与影响权重的新闻）
+     - sentiment_count, sentiment_sum, sentiment_sumsq: 有情绪评分的新闻数、情绪评分之和、平方和
+     - impact_count, impact_sum: 有影响权重的新闻数、影响权重之和
+     - impact_sentiment_sum, impact_sentiment_weight: 影响权重加权的情绪评分之和及其权重之和
+     - trend_up, trend_down, trend_flat: 看涨、看跌、中性信号数量
 
 # 查询策略：
 - 如果用户问题涉及“资产大类”（如：商品类综述、今天股市大盘总结），优先查询 `news_summary`。
 - 如果用户问题涉及“具体标的/事实”（如：最近关于黄金的消息、英伟达有什么新闻），查询 `all_news`。
+- 如果用户问题是统计类（如：本周各板块平均情绪、今天哪个资产类别新闻最多、看涨信号占比），查询 `news_stats_hourly`，不要在 `all_news` 上做聚合。
 - 如果不确定，优先查询 `all_news`。
 
 # 输出格式要求：
 你必须直接输出一个标准的 JSON 对象，不要包含 Markdown 格式。格式必须为：
 {{
-  "table": "选择的表名 (all_news 或 news_summary)",
+  "table": "选择的表名 (all_news、news_summary 或 news_stats_hourly)",
   "sql": "生成的 SQL 语句"
 }}
 
@@ -42,6 +56,7 @@ def get_sql_prompt(current_time=None):
    - 如果选择 `all_news` 表，必须查询以下所有关键要素字段以供后续分析：
      `title, content, publish_date, publish_time, source, region, subject, asset_class, sector, sentiment_score, impact_weight, trend_signal, event_type, driver_factor, key_metrics`
    - 如果选择 `news_summary` 表，必须包含 `summary_text, asset_class, window_start, window_end`。
+   - 如果选择 `news_stats_hourly` 表，按需 `GROUP BY` 维度并用 `SUM` 聚合：数量为 `SUM(news_count)`，平均情绪为 `SUM(sentiment_sum) / NULLIF(SUM(sentiment_count), 0)`，影响加权情绪为 `SUM(impact_sentiment_sum) / NULLIF(SUM(impact_sentiment_weight), 0)`。
 2. **过滤策略**: 灵活使用 `LIKE` (例如 `content LIKE '%黄金%'`),在all_news表的过滤条件中，最少要包含content，在news_summary表的过滤条件中，最少要包含asset_class。
 3. **日期**: 当前日期为 {current_time}。
 4. **模糊时间的规则**: 以当前日期为基准，今日则表示当前日期，近日、最近则表示最近三天，当用户询问某个时间范围，则转化成对应的时间范围，例如：
@@ -49,7 +64,7 @@ def get_sql_prompt(current_time=None):
    - 最近三天：where publish_date between '2026-02-23' and '2026-02-25'
    - 最近一周：where publish_date between '2026-02-19' and '2026-02-25'
    - 最近一月：where publish_date between '2026-01-26' and '2026-02-25'
-5. **日期的格式**: 如果是all_news表，publish_date的格式为YYYY-MM-DD。如果是news_summary表，window_start的格式为YYYY-MM-DD hh-mm-ss,例如2026-02-26 00-00-00。
+5. **日期的格式**: 如果是all_news表，publish_date的格式为YYYY-MM-DD。如果是news_summary表，window_start的格式为YYYY-MM-DD hh-mm-ss,例如2026-02-26 00-00-00。如果是news_stats_hourly表，按 bucket_hour 过滤，例如最近三天：where bucket_hour >= '2026-02-23 00:00:00'。
 """
 
 def get_summary_prompt():
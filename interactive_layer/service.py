@@ -1,18 +1,34 @@
+import asyncio
 import json
-import re
-from .agents import sql_agent, summary_agent
-from .db_utils import execute_sql
-from .config import DEFAULT_MODEL_NAME
+from .agents import sql_agent, summary_agent, asql_agent, asummary_agent, parse_sql_response
+from .db_utils import execute_sql, aexecute_sql
+from .config import DEFAULT_MODEL_NAME, SQL_AGENT_TIMEOUT, DB_QUERY_TIMEOUT, SUMMARY_AGENT_TIMEOUT
 
-def extract_json(text):
-    """从文本中提取 JSON"""
+UNPARSABLE_ANSWER = "对不起，我暂时无法理解您的查询需求。请换个方式提问。"
+
+class StageTimeout(Exception):
+    """问答的某个阶段（SQL 生成、数据库查询、结果总结）超时"""
+    def __init__(self, stage, timeout):
+        self.stage = stage
+        self.timeout = timeout
+        super().__init__(f"{stage} 阶段超过 {timeout} 秒未完成，请稍后重试")
+
+def serialize_rows(db_results):
+    """处理 db_results 中的 datetime, date, timedelta 对象，使其可序列化"""
+    for row in db_results:
+        for key, value in row.items():
+            if hasattr(value, 'isoformat'):
+                row[key] = value.isoformat()
+            elif hasattr(value, 'total_seconds'): # 处理 timedelta
+                row[key] = str(value)
+    return json.dumps(db_results, ensure_ascii=False)
+
+async def _with_timeout(stage, timeout, awaitable):
     try:
-        match = re.search(r'(\{.*\})', text, re.DOTALL)
-        if match:
-            return json.loads(match.group(1))
-        return json.loads(text)
-    except:
-        return None
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"{stage} 阶段超时 ({timeout} 秒)")
+        raise StageTimeout(stage, timeout)
 
 class InteractiveService:
     def __init__(self, model_name=DEFAULT_MODEL_NAME):
@@ -23,36 +39,56 @@ class InteractiveService:
         
         # 1. 第一个智能体：拆解问题生成 SQL
         sql_response_raw = sql_agent(user_question, model_name=self.model_name)
-        sql_data = extract_json(sql_response_raw)
-        
-        if not sql_data or "sql" not in sql_data:
+        parsed = parse_sql_response(sql_response_raw)
+        if parsed is None:
             print(f"SQL Agent response raw: {sql_response_raw}")
-            return "对不起，我暂时无法理解您的查询需求。请换个方式提问。"
+            return UNPARSABLE_ANSWER
         
-        sql_query = sql_data.get("sql")
-        target_table = sql_data.get("table", "unknown")
+        sql_query, target_table = parsed
         print(f"智能体 1 生成针对 [{target_table}] 的 SQL: {sql_query}")
         
         # 2. 从数据库执行查询
         try:
             db_results = execute_sql(sql_query, table_name=target_table)
             print(f"数据库返回 {len(db_results)} 条结果。")
-
-            # 处理 db_results 中的 datetime, date, timedelta 对象，使其可序列化
-            for row in db_results:
-                for key, value in row.items():
-                    if hasattr(value, 'isoformat'):
-                        row[key] = value.isoformat()
-                    elif hasattr(value, 'total_seconds'): # 处理 timedelta
-                        row[key] = str(value)
+            data_context = serialize_rows(db_results)
         except Exception as e:
 
             print(f"Database Error: {e}")
             return f"在执行数据查询时出错: {str(e)}"
 
         # 3. 第二个智能体：整合结果生成总结
-        data_context = json.dumps(db_results, ensure_ascii=False)
         final_answer = summary_agent(user_question, data_context, model_name=self.model_name)
         
         return final_answer
 
+    async def aask(self, user_question):
+        """
+        ask 的异步版本，供 API 服务使用：LLM 调用为异步 I/O，数据库查询在线程池中执行，
+        等待期间事件循环可以处理其他请求；任一阶段超时抛出 StageTimeout
+        """
+        print(f"用户提问: {user_question} (Model: {self.model_name})")
+
+        sql_response_raw = await _with_timeout(
+            "SQL 生成", SQL_AGENT_TIMEOUT, asql_agent(user_question, model_name=self.model_name))
+        parsed = parse_sql_response(sql_response_raw)
+        if parsed is None:
+            print(f"SQL Agent response raw: {sql_response_raw}")
+            return UNPARSABLE_ANSWER
+
+        sql_query, target_table = parsed
+        print(f"智能体 1 生成针对 [{target_table}] 的 SQL: {sql_query}")
+
+        # 超时后查询线程仍会执行到结束（MySQL 下由 max_execution_time 中止），但不再阻塞本请求
+        db_results = await _with_timeout(
+            "数据库查询", DB_QUERY_TIMEOUT, aexecute_sql(sql_query, table_name=target_table))
+        print(f"数据库返回 {len(db_results)} 条结果。")
+        try:
+            data_context = serialize_rows(db_results)
+        except Exception as e:
+            print(f"Database Error: {e}")
+            return f"在执行数据查询时出错: {str(e)}"
+
+        return await _with_timeout(
+            "结果总结", SUMMARY_AGENT_TIMEOUT, asummary_agent(user_question, data_context, model_name=self.model_name))
+
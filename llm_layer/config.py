@@ -9,6 +9,10 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "yourpassword")
 DB_NAME = os.getenv("DB_NAME", "news_analysis")
 TABLE_NAME = "all_news"
+OUTBOX_TABLE_NAME = "news_outbox"
+STATS_TABLE_NAME = "news_stats_hourly"
+# 写回结构化结果时在同一事务内增量更新小时级汇总表
+STATS_ROLLUP_ENABLED = os.getenv("STATS_ROLLUP_ENABLED", "true").lower() == "true"
 
 # 在线 LLM 配置
 ONLINE_API_KEY = os.getenv("ONLINE_API_KEY", "your_api_key")
@@ -17,18 +21,97 @@ ONLINE_MODEL = os.getenv("ONLINE_MODEL", "deepseek-chat")
 
 # 处理参数
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", 10))
-CONCURRENCY = int(os.getenv("CONCURRENCY", 2))
+READ_PAGE_SIZE = int(os.getenv("READ_PAGE_SIZE", 500))  # 流式读取未处理新闻时每页的行数
+CONCURRENCY = int(os.getenv("CONCURRENCY", 2))  # 同时在途的 LLM 请求数（启用 AIMD 时为初始值）
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 20))  # 结果攒满多少条写回一次数据库
+WRITE_FLUSH_SECONDS = float(os.getenv("WRITE_FLUSH_SECONDS", 2))  # 结果空闲多久后强制写回（秒）
 PROCESS_INTERVAL = int(os.getenv("PROCESS_INTERVAL", 600))
 
+# 批量抽取：一次请求打包多条新闻，共享同一份系统提示词
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() == "true"
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", 10))  # 单次请求最多打包的新闻条数
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 8000))  # 单次请求 提示词+输入+预估输出 的 token 上限
+LLM_OUTPUT_TOKENS_PER_ITEM = int(os.getenv("LLM_OUTPUT_TOKENS_PER_ITEM", 200))  # 每条新闻预估的输出 token 数
+
+# 限流与重试：客户端令牌桶限流，429/超时/5xx 按 Retry-After 或带抖动的指数退避重试
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", 0))  # 每分钟请求数上限，0 表示不限制
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", 0))  # 每分钟 token 数上限（按估算值），0 表示不限制
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))  # 单次请求最多重试次数
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 1))  # 指数退避基准延迟（秒）
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 30))  # 指数退避最大延迟（秒）
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 60))  # 单次请求超时（秒）
+
+# AIMD 自适应并发：延迟与错误正常时逐步加并发，遇到限流、超时或服务端错误时减半
+AIMD_ENABLED = os.getenv("AIMD_ENABLED", "true").lower() == "true"
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", 1))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+AIMD_LATENCY_TARGET = float(os.getenv("AIMD_LATENCY_TARGET", 20))  # 延迟超过该值（秒）时不再增加并发
+
+# 失败重试与死信：处理失败的新闻按指数退避延后重试，失败 MAX_ATTEMPTS 次后进入死信状态，不再自动处理
+MAX_ATTEMPTS = int(os.getenv("MAX_ATTEMPTS", 5))
+RETRY_BACKOFF_SECONDS = int(os.getenv("RETRY_BACKOFF_SECONDS", 60))  # 第一次失败后的等待时间，之后逐次翻倍
+RETRY_BACKOFF_MAX_SECONDS = int(os.getenv("RETRY_BACKOFF_MAX_SECONDS", 21600))  # 退避等待时间上限
+# 网络、限流、服务端错误等暂时性失败不计入失败次数，管道暂停派发该秒数后再继续，新闻留待后续重试
+LLM_OUTAGE_PAUSE_SECONDS = float(os.getenv("LLM_OUTAGE_PAUSE_SECONDS", 30))
+
+# 本地分类器：基于 LLM 历史标注训练的 CPU 分类器，预测 asset_class/sector/event_type/trend_signal
+# off 关闭；shadow 仅预测并统计与 LLM 结果的一致率；active 高置信度新闻直接采用本地结果，不再调用 LLM
+LOCAL_CLASSIFIER_MODE = os.getenv("LOCAL_CLASSIFIER_MODE", "off")
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", "cache/local_classifier.joblib")
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", 0.9))  # 各字段预测概率的默认阈值
+LOCAL_CLASSIFIER_THRESHOLDS = os.getenv("LOCAL_CLASSIFIER_THRESHOLDS", "")  # 按字段覆盖阈值，如 "sector=0.8,event_type=0.85"
+LOCAL_CLASSIFIER_TRAIN_LIMIT = int(os.getenv("LOCAL_CLASSIFIER_TRAIN_LIMIT", 200000))  # 训练时最多使用的样本数
+
+# 多实例处理：按租约认领待处理新闻，多个 LLM 层实例可同时运行而不会重复处理
+LEASE_ENABLED = os.getenv("LEASE_ENABLED", "true").lower() == "true"
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", 600))  # 租约时长，实例崩溃后其认领的新闻在到期后重新可被认领
+CLAIM_BATCH_SIZE = int(os.getenv("CLAIM_BATCH_SIZE", 50))  # 每次认领的新闻条数，需能在租约时长内处理完
+WORKER_ID = os.getenv("WORKER_ID", "")  # 实例标识，留空时由主机名、进程号与随机串生成
+
+# 优先级调度：fresh 通道 (LIFO) 持续拉取最新新闻并预留部分并发，backlog 通道 (FIFO) 消化积压
+FRESH_LANE_ENABLED = os.getenv("FRESH_LANE_ENABLED", "true").lower() == "true"
+FRESH_LANE_SHARE = float(os.getenv("FRESH_LANE_SHARE", 0.3))  # 为 fresh 通道预留的并发比例
+FRESH_LANE_SIZE = int(os.getenv("FRESH_LANE_SIZE", 20))  # fresh 通道每次拉取的最新新闻条数
+FRESH_POLL_INTERVAL = float(os.getenv("FRESH_POLL_INTERVAL", 5))  # 处理积压期间拉取最新新闻的间隔（秒）
+SCHEDULER_READ_AHEAD = int(os.getenv("SCHEDULER_READ_AHEAD", 100))  # backlog 通道预读的工作单元数，关键词加成在该范围内生效
+SCHEDULER_METRICS_INTERVAL = int(os.getenv("SCHEDULER_METRICS_INTERVAL", 60))  # 打印调度队列指标的间隔（秒）
+# 命中这些高影响力关键词的新闻在所在通道内优先处理，命中越多越靠前
+PRIORITY_KEYWORDS = [k.strip() for k in os.getenv(
+    "PRIORITY_KEYWORDS", "突发,紧急,美联储,央行,加息,降息,非农,CPI,GDP,战争,制裁,违约,暴跌,暴涨,熔断,关税"
+).split(",") if k.strip()]
+
+# 新闻通知：监听数据层写入的通知表，有新新闻时立即处理；PROCESS_INTERVAL 作为兜底轮询间隔
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "true").lower() == "true"
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", 2))  # 检查通知表的间隔（秒）
+
+# 近似重复检测：与近期已处理新闻高度相似的新闻直接复用其结构化结果，不再调用 LLM
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", 0.8))  # 字符 3-gram Jaccard 相似度阈值
+NEAR_DUP_WINDOW_HOURS = int(os.getenv("NEAR_DUP_WINDOW_HOURS", 24))  # 参与比对的近期新闻时间窗口
+NEAR_DUP_MAX_ITEMS = int(os.getenv("NEAR_DUP_MAX_ITEMS", 50000))  # 索引最多保留的新闻条数
+
+# LLM 写回的结构化字段
+STRUCTURED_FIELDS = ['source', 'region', 'subject', 'asset_class', 'sector', 'sentiment_score',
+                     'impact_weight', 'trend_signal', 'event_type', 'driver_factor', 'key_metrics']
+
 # --- 分类总结配置 ---
 SUMMARY_TRIGGER_MODE = os.getenv("SUMMARY_TRIGGER_MODE", "fixed")  # 控制触发模式 fixed | interval
 SUMMARY_FIXED_TIME = os.getenv("SUMMARY_FIXED_TIME", "00:01")  # 定点执行时间
 SUMMARY_INTERVAL = int(os.getenv("SUMMARY_INTERVAL", 3600))  # 间隔执行时间
 SUMMARY_DEFAULT_WINDOW_HOURS = int(os.getenv("SUMMARY_DEFAULT_WINDOW_HOURS", 24))  # 默认窗口时间
-SUMMARY_CUSTOM_WINDOW = None 
+# 自定义窗口，格式 "YYYY-MM-DD HH:MM:SS,YYYY-MM-DD HH:MM:SS"，为空时使用最近 SUMMARY_DEFAULT_WINDOW_HOURS 小时
+SUMMARY_CUSTOM_WINDOW = tuple(os.getenv("SUMMARY_CUSTOM_WINDOW").split(",", 1)) if os.getenv("SUMMARY_CUSTOM_WINDOW") else None
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 9))  # 同时进行的总结 LLM 调用数，默认覆盖全部大类
+SUMMARY_ROLLUP_ENABLED = os.getenv("SUMMARY_ROLLUP_ENABLED", "true").lower() == "true"  # 按分段缓存总结后再汇总
+SUMMARY_BUCKET_MINUTES = int(os.getenv("SUMMARY_BUCKET_MINUTES", 60))  # 分段总结的时间粒度（分钟）
+SUMMARY_PARTIAL_TABLE = "news_summary_partial"
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", 6000))  # 单次总结提示词中新闻部分的 token 上限
+SUMMARY_RECENCY_HALF_LIFE_HOURS = float(os.getenv("SUMMARY_RECENCY_HALF_LIFE_HOURS", 6))  # 新闻时效得分的半衰期（小时）
+SUMMARY_SUBJECT_DECAY = float(os.getenv("SUMMARY_SUBJECT_DECAY", 0.5))  # 同一主体每多入选一条，其余同主体新闻的得分衰减系数
 
 # 资产大类列表 (固定)
 ASSET_CLASSES = ['商品', '股票', '债券', '利率', '外汇', '数字货币', '房地产', '衍生品', '其他']
 
 def get_db_url():
-    return f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # DB_URL 可直接指定完整连接串（如测试时使用 SQLite），优先于上面的各项配置
+    return os.getenv("DB_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
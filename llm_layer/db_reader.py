@@ -1,13 +1,111 @@
-import pandas as pd
-from sqlalchemy import create_engine, text
-from .config import get_db_url, TABLE_NAME
-
-def read_unprocessed_news(last_hash=None):
-    """读取尚未进行结构化分析的新闻数据"""
-    engine = create_engine(get_db_url())
-    
-    # 策略：直接读取 processed_at 为空的数据
-    query = f"SELECT * FROM {TABLE_NAME} WHERE processed_at IS NULL ORDER BY create_time ASC"
-    df = pd.read_sql(query, con=engine)
-    
-    return df
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+from common.db_pool import get_engine
+from .config import get_db_url, TABLE_NAME, STRUCTURED_FIELDS, READ_PAGE_SIZE
+
+# 待处理新闻记录：id 用作分页游标，create_time 用于统计等待时间，其余为 LLM 处理所需的字段
+NewsRecord = namedtuple('NewsRecord', ['id', 'content_hash', 'title', 'content', 'publish_date', 'publish_time', 'create_time'])
+
+def iter_unprocessed_news(page_size=READ_PAGE_SIZE, after_id=0):
+    """
+    按 id 键集分页流式读取尚未进行结构化分析的新闻
+    每页单独取用、归还连接，内存占用只与 page_size 有关，与积压规模无关
+    处于退避等待期或死信状态的新闻不会被读出
+    """
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT {', '.join(NewsRecord._fields)} FROM {TABLE_NAME}
+        WHERE processed_at IS NULL AND dead_lettered_at IS NULL
+          AND (next_attempt_at IS NULL OR next_attempt_at <= :now)
+          AND id > :after_id
+        ORDER BY id ASC LIMIT :limit
+    """)
+
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(query, {"now": datetime.now(), "after_id": after_id, "limit": page_size}).fetchall()
+        for row in rows:
+            yield NewsRecord(*row)
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1].id
+
+def read_newest_unprocessed(limit, after_id=0):
+    """读取 id 大于 after_id 的最新待处理新闻（按 id 降序取前 limit 条），供 fresh 通道使用"""
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT {', '.join(NewsRecord._fields)} FROM {TABLE_NAME}
+        WHERE processed_at IS NULL AND dead_lettered_at IS NULL
+          AND (next_attempt_at IS NULL OR next_attempt_at <= :now)
+          AND id > :after_id
+        ORDER BY id DESC LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"now": datetime.now(), "after_id": after_id, "limit": limit}).fetchall()
+    return [NewsRecord(*row) for row in rows]
+
+def read_recent_canonical_news(hours, limit):
+    """读取近期已处理且本身不是近似重复、也不是本地分类器标注的新闻，用于预热近似去重索引"""
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT content_hash, title, content, processed_at FROM {TABLE_NAME}
+        WHERE processed_at >= :since AND duplicate_of IS NULL AND (label_source IS NULL OR label_source <> 'local')
+        ORDER BY processed_at DESC LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"since": datetime.now() - timedelta(hours=hours), "limit": limit}).fetchall()
+    # SQLite 的文本查询返回字符串，MySQL 返回 datetime
+    return [(row.content_hash, row.title, row.content,
+             datetime.fromisoformat(row.processed_at) if isinstance(row.processed_at, str) else row.processed_at)
+            for row in rows]
+
+def read_structured_fields(hashes):
+    """按 content_hash 读取已处理新闻的结构化字段，返回 {content_hash: 字段字典}"""
+    if not hashes:
+        return {}
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT content_hash, {', '.join(STRUCTURED_FIELDS)} FROM {TABLE_NAME}
+        WHERE content_hash IN :hashes AND processed_at IS NOT NULL
+    """).bindparams(bindparam('hashes', expanding=True))
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"hashes": list(hashes)}).fetchall()
+    return {row.content_hash: {field: getattr(row, field) for field in STRUCTURED_FIELDS} for row in rows}
+
+def read_dead_letters(limit=50):
+    """读取死信新闻，按进入死信的时间倒序"""
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT id, content_hash, title, attempt_count, last_error, dead_lettered_at FROM {TABLE_NAME}
+        WHERE processed_at IS NULL AND dead_lettered_at IS NOT NULL
+        ORDER BY dead_lettered_at DESC LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        return conn.execute(query, {"limit": limit}).fetchall()
+
+def count_failure_states():
+    """统计处于退避等待期与死信状态的新闻条数"""
+    engine = get_engine(get_db_url())
+    query = text(f"""
+        SELECT
+            SUM(CASE WHEN dead_lettered_at IS NULL AND next_attempt_at > :now THEN 1 ELSE 0 END) AS backoff,
+            SUM(CASE WHEN dead_lettered_at IS NOT NULL THEN 1 ELSE 0 END) AS dead
+        FROM {TABLE_NAME} WHERE processed_at IS NULL
+    """)
+    with engine.connect() as conn:
+        row = conn.execute(query, {"now": datetime.now()}).fetchone()
+    return {"backoff": int(row.backoff or 0), "dead": int(row.dead or 0)}
+
+def read_training_samples(fields, limit):
+    """读取由 LLM 标注（非近似重复复用、非本地分类器）的最近已处理新闻，用于训练本地分类器"""
+    engine = get_engine(get_db_url())
+    conditions = " AND ".join(f"{field} IS NOT NULL" for field in fields)
+    query = text(f"""
+        SELECT title, content, {', '.join(fields)} FROM {TABLE_NAME}
+        WHERE processed_at IS NOT NULL AND duplicate_of IS NULL
+          AND (label_source IS NULL OR label_source = 'llm') AND {conditions}
+        ORDER BY id DESC LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        return conn.execute(query, {"limit": limit}).fetchall()
@@ -1,51 +1,224 @@
-from sqlalchemy import create_engine, text
-from .config import get_db_url, TABLE_NAME
-from datetime import datetime
+import json
+import math
+from sqlalchemy import text, bindparam
+from common.db_pool import get_engine
+from .config import (get_db_url, TABLE_NAME, STRUCTURED_FIELDS, ASSET_CLASSES, MAX_ATTEMPTS,
+                     RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS, STATS_ROLLUP_ENABLED)
+from .stats_rollup import lock_unprocessed, apply_written
+from datetime import datetime, timedelta
+
+# 结构化字符串字段在 all_news 中的最大长度，超长部分截断；未列出的为 Text 列
+FIELD_MAX_LENGTHS = {
+    'source': 100,
+    'region': 50,
+    'subject': 100,
+    'asset_class': 50,
+    'sector': 100,
+    'event_type': 100,
+}
+
+# 写回的全部列：结构化字段 + 近似重复标记 + 结果来源
+WRITE_FIELDS = STRUCTURED_FIELDS + ['duplicate_of', 'label_source']
+
+# 暂存表，每次写回在同一连接内重建
+STAGING_TABLE = "tmp_structured_writeback"
 
 def init_table_b():
     # 现在表结构由 data_layer 统一初始化，这里只需要确保主表存在即可
     # 实际上由于 main.py 调用了它，我们可以留个空或做个简单检查
     print(f"数据表 {TABLE_NAME} 已由数据层统一管理。")
 
-def get_last_processed_hash():
-    engine = create_engine(get_db_url())
-    with engine.connect() as conn:
-        # 获取最新的已处理记录的 hash
-        query = text(f"SELECT content_hash FROM {TABLE_NAME} WHERE processed_at IS NOT NULL ORDER BY processed_at DESC LIMIT 1")
-        result = conn.execute(query).fetchone()
-        return result[0] if result else None
+def _to_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or math.isinf(value) else value
+
+def _to_text(value, max_length=None):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value)
+    elif isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False)
+    value = str(value).strip()
+    if max_length:
+        value = value[:max_length]
+    return value or None
+
+def coerce_structured_record(data):
+    """
+    将 LLM 输出规整为符合表结构的取值
+    - sentiment_score 截断到 [-1, 1]，impact_weight 截断到 1-5，trend_signal 取符号 (-1/0/1)
+    - asset_class 不在资产大类列表中时归为 "其他"
+    - 列表/字典转为字符串，字符串按列长度截断，缺失字段补 None
+    """
+    record = {'content_hash': data.get('content_hash')}
+    for field in WRITE_FIELDS:
+        record[field] = _to_text(data.get(field), FIELD_MAX_LENGTHS.get(field))
+
+    score = _to_float(data.get('sentiment_score'))
+    record['sentiment_score'] = None if score is None else max(-1.0, min(1.0, score))
+
+    weight = _to_float(data.get('impact_weight'))
+    record['impact_weight'] = None if weight is None else max(1, min(5, int(round(weight))))
+
+    signal = _to_float(data.get('trend_signal'))
+    record['trend_signal'] = None if signal is None else (signal > 0) - (signal < 0)
+
+    if record['asset_class'] not in ASSET_CLASSES:
+        record['asset_class'] = '其他'
+    record['label_source'] = record['label_source'] or 'llm'
+    return record
+
+def _write_via_staging(conn, records):
+    """MySQL：批量写入临时暂存表，再以一条 UPDATE ... JOIN 完成回写"""
+    conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}"))
+    conn.execute(text(f"""
+        CREATE TEMPORARY TABLE {STAGING_TABLE} (
+            content_hash VARCHAR(64) PRIMARY KEY,
+            source VARCHAR(100), region VARCHAR(50), subject VARCHAR(100),
+            asset_class VARCHAR(50), sector VARCHAR(100), sentiment_score FLOAT,
+            impact_weight INT, trend_signal INT, event_type VARCHAR(100),
+            driver_factor TEXT, key_metrics TEXT, duplicate_of VARCHAR(64), label_source VARCHAR(20)
+        )
+    """))
+    columns = ['content_hash'] + WRITE_FIELDS
+    # pymysql 会将 INSERT ... VALUES 的 executemany 改写为多行插入
+    conn.execute(text(f"""
+        INSERT IGNORE INTO {STAGING_TABLE} ({', '.join(columns)})
+        VALUES ({', '.join(':' + col for col in columns)})
+    """), records)
+
+    matched = conn.execute(text(f"""
+        SELECT COUNT(*) FROM {TABLE_NAME} a JOIN {STAGING_TABLE} t ON a.content_hash = t.content_hash
+    """)).scalar()
+    assignments = ",\n            ".join(f"a.{col} = t.{col}" for col in WRITE_FIELDS)
+    result = conn.execute(text(f"""
+        UPDATE {TABLE_NAME} a JOIN {STAGING_TABLE} t ON a.content_hash = t.content_hash
+        SET {assignments},
+            a.processed_at = :processed_at,
+            a.lease_owner = NULL, a.lease_expires_at = NULL
+        WHERE a.processed_at IS NULL
+    """), {"processed_at": datetime.now()})
+    conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}"))
+    return matched, result.rowcount
+
+def _write_via_executemany(conn, records):
+    """其他数据库：以 executemany 一次提交整批 UPDATE"""
+    hashes = [r['content_hash'] for r in records]
+    matched = conn.execute(
+        text(f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE content_hash IN :hashes").bindparams(
+            bindparam('hashes', expanding=True)),
+        {"hashes": hashes}
+    ).scalar()
+    processed_at = datetime.now()
+    assignments = ", ".join(f"{col} = :{col}" for col in WRITE_FIELDS)
+    result = conn.execute(text(f"""
+        UPDATE {TABLE_NAME}
+        SET {assignments}, processed_at = :processed_at, lease_owner = NULL, lease_expires_at = NULL
+        WHERE content_hash = :content_hash AND processed_at IS NULL
+    """), [dict(r, processed_at=processed_at) for r in records])
+    return matched, result.rowcount
 
 def save_structured_data(data_list):
+    """
+    批量写回结构化结果，整批（包括小时级汇总表的增量更新）在一个事务内完成
+    仅更新尚未处理的新闻，返回 {"matched": 命中的新闻行数, "written": 实际写入的行数}
+    """
     if not data_list:
-        return
-    
-    engine = create_engine(get_db_url())
-    
-    with engine.connect() as conn:
-        for data in data_list:
-            # 执行更新操作
-            update_stmt = text(f"""
-                UPDATE {TABLE_NAME} 
-                SET source = :source,
-                    region = :region,
-                    subject = :subject,
-                    asset_class = :asset_class,
-                    sector = :sector,
-                    sentiment_score = :sentiment_score,
-                    impact_weight = :impact_weight,
-                    trend_signal = :trend_signal,
-                    event_type = :event_type,
-                    driver_factor = :driver_factor,
-                    key_metrics = :key_metrics,
-                    processed_at = :processed_at
-                WHERE content_hash = :content_hash
-            """)
-            
-            # 补充处理时间
-            data['processed_at'] = datetime.now()
-            
-            conn.execute(update_stmt, data)
-        
-        conn.commit()
-    
-    print(f"成功更新 {len(data_list)} 条结构化分析数据到 {TABLE_NAME}")
+        return {"matched": 0, "written": 0}
+
+    # 同一批中重复的哈希只保留最后一条
+    records = {}
+    for data in data_list:
+        record = coerce_structured_record(data)
+        if record['content_hash']:
+            records[record['content_hash']] = record
+    records = list(records.values())
+    if not records:
+        return {"matched": 0, "written": 0}
+
+    engine = get_engine(get_db_url())
+    with engine.begin() as conn:
+        # 汇总表与结构化结果在同一事务内更新，两者始终一致
+        locked = lock_unprocessed(conn, [r['content_hash'] for r in records]) if STATS_ROLLUP_ENABLED else None
+        if conn.dialect.name == 'mysql':
+            matched, written = _write_via_staging(conn, records)
+        else:
+            matched, written = _write_via_executemany(conn, records)
+        if locked:
+            apply_written(conn, locked, records)
+
+    print(f"结构化数据写回 {TABLE_NAME}: 提交 {len(records)} 条，匹配 {matched} 条，写入 {written} 条")
+    return {"matched": matched, "written": written}
+
+def retry_delay(attempts):
+    """第 attempts 次失败后的退避等待时间（秒）"""
+    return min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * (2 ** max(0, attempts - 1)))
+
+def record_failures(failures):
+    """
+    记录处理失败的新闻，failures 为 [(content_hash, 失败原因)]
+    失败次数加一并按指数退避设置下次重试时间，达到 MAX_ATTEMPTS 次后进入死信状态
+    返回本次进入死信状态的条数
+    """
+    if not failures:
+        return 0
+
+    reasons = {}
+    for content_hash, reason in failures:
+        reasons[content_hash] = str(reason)[:255]
+
+    engine = get_engine(get_db_url())
+    now = datetime.now()
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(f"SELECT content_hash, attempt_count FROM {TABLE_NAME} WHERE content_hash IN :hashes AND processed_at IS NULL")
+            .bindparams(bindparam('hashes', expanding=True)),
+            {"hashes": list(reasons)}
+        ).fetchall()
+        if not rows:
+            return 0
+
+        params = []
+        for row in rows:
+            attempts = (row.attempt_count or 0) + 1
+            dead = attempts >= MAX_ATTEMPTS
+            params.append({
+                "content_hash": row.content_hash,
+                "attempt_count": attempts,
+                "last_error": reasons[row.content_hash],
+                "next_attempt_at": None if dead else now + timedelta(seconds=retry_delay(attempts)),
+                "dead_lettered_at": now if dead else None,
+            })
+        conn.execute(text(f"""
+            UPDATE {TABLE_NAME}
+            SET attempt_count = :attempt_count, last_error = :last_error,
+                next_attempt_at = :next_attempt_at, dead_lettered_at = :dead_lettered_at,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE content_hash = :content_hash AND processed_at IS NULL
+        """), params)
+
+    dead_count = sum(1 for p in params if p["dead_lettered_at"])
+    print(f"记录 {len(params)} 条处理失败的新闻，其中 {dead_count} 条进入死信状态")
+    return dead_count
+
+def requeue_dead_letters(hashes=None):
+    """将死信新闻重新放回待处理队列（清零失败次数），hashes 为空时重新放回全部死信"""
+    engine = get_engine(get_db_url())
+    query = f"""
+        UPDATE {TABLE_NAME}
+        SET attempt_count = 0, next_attempt_at = NULL, dead_lettered_at = NULL
+        WHERE processed_at IS NULL AND dead_lettered_at IS NOT NULL
+    """
+    with engine.begin() as conn:
+        if hashes:
+            result = conn.execute(
+                text(query + " AND content_hash IN :hashes").bindparams(bindparam('hashes', expanding=True)),
+                {"hashes": list(hashes)}
+            )
+        else:
+            result = conn.execute(text(query))
+    return result.rowcount
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_layer.db_reader import read_dead_letters, count_failure_states
+from llm_layer.db_writer import requeue_dead_letters
+
+def cmd_list(args):
+    counts = count_failure_states()
+    print(f"退避等待中: {counts['backoff']} 条，死信: {counts['dead']} 条")
+    for row in read_dead_letters(args.limit):
+        print(f"[{row.dead_lettered_at}] id={row.id} hash={row.content_hash} 失败 {row.attempt_count} 次")
+        print(f"    标题: {row.title}")
+        print(f"    原因: {row.last_error}")
+
+def cmd_requeue(args):
+    if not args.hashes and not args.all:
+        print("请指定要重新处理的 content_hash，或使用 --all 重新放回全部死信。")
+        return
+    count = requeue_dead_letters(None if args.all else args.hashes)
+    print(f"已将 {count} 条死信新闻放回待处理队列。")
+
+def main():
+    parser = argparse.ArgumentParser(description="查看或重新处理多次结构化失败的死信新闻")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="列出死信新闻")
+    list_parser.add_argument("--limit", type=int, default=50, help="最多显示的条数")
+    list_parser.set_defaults(func=cmd_list)
+
+    requeue_parser = subparsers.add_parser("requeue", help="将死信新闻放回待处理队列")
+    requeue_parser.add_argument("hashes", nargs="*", help="要重新处理的 content_hash")
+    requeue_parser.add_argument("--all", action="store_true", help="重新放回全部死信")
+    requeue_parser.set_defaults(func=cmd_requeue)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
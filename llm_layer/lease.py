@@ -0,0 +1,114 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+from common.db_pool import get_engine
+from .config import get_db_url, TABLE_NAME, WORKER_ID, LEASE_SECONDS, CLAIM_BATCH_SIZE, FRESH_LANE_SIZE
+from .db_reader import NewsRecord
+
+# 单条续租语句中 IN 列表的最大长度
+_MAX_KEYS_PER_QUERY = 500
+
+# 当前进程的实例标识
+_worker_id = None
+
+def get_worker_id():
+    global _worker_id
+    if _worker_id is None:
+        _worker_id = WORKER_ID or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    return _worker_id
+
+def claim_news(worker_id, limit, lease_seconds, after_id=0, newest_first=False):
+    """
+    认领一批待处理新闻，返回 (成功认领的 NewsRecord 列表, 本批最后一个候选 id)，没有候选时 id 为 None
+    newest_first 为 True 时从 id 大于 after_id 的新闻中认领最新的 limit 条
+    先选出候选 id，再以带条件的 UPDATE 写入租约：只有未被认领或租约已过期的行会被更新，
+    多个实例同时认领同一行时只有一个能成功。该方式不依赖 SKIP LOCKED，MySQL 5.7 与 SQLite 均可使用
+    """
+    engine = get_engine(get_db_url())
+    now = datetime.now()
+    # MySQL DATETIME 默认不保存微秒，取整秒以便第三步按到期时间精确匹配
+    expires_at = (now + timedelta(seconds=lease_seconds)).replace(microsecond=0)
+    available = """
+        processed_at IS NULL AND dead_lettered_at IS NULL
+        AND (next_attempt_at IS NULL OR next_attempt_at <= :now)
+        AND (lease_expires_at IS NULL OR lease_expires_at < :now)
+    """
+
+    with engine.connect() as conn:
+        ids = [row.id for row in conn.execute(text(f"""
+            SELECT id FROM {TABLE_NAME}
+            WHERE {available} AND id > :after_id
+            ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT :limit
+        """), {"now": now, "after_id": after_id, "limit": limit})]
+    if not ids:
+        return [], None
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            UPDATE {TABLE_NAME} SET lease_owner = :worker_id, lease_expires_at = :expires_at
+            WHERE id IN :ids AND {available}
+        """).bindparams(bindparam('ids', expanding=True)),
+            {"worker_id": worker_id, "expires_at": expires_at, "now": now, "ids": ids})
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT {', '.join(NewsRecord._fields)} FROM {TABLE_NAME}
+            WHERE id IN :ids AND lease_owner = :worker_id AND lease_expires_at = :expires_at
+            ORDER BY id {'DESC' if newest_first else 'ASC'}
+        """).bindparams(bindparam('ids', expanding=True)),
+            {"worker_id": worker_id, "expires_at": expires_at, "ids": ids}).fetchall()
+    return [NewsRecord(*row) for row in rows], ids[-1]
+
+def iter_claimed_news(worker_id=None, page_size=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    按 id 键集分页认领并流式返回待处理新闻
+    处理管道按需拉取，每页在被消费时才认领，租约时间主要覆盖实际处理耗时
+    """
+    worker_id = worker_id or get_worker_id()
+    after_id = 0
+    while True:
+        records, last_id = claim_news(worker_id, page_size, lease_seconds, after_id)
+        if last_id is None:
+            return
+        # 候选行可能已被其他实例抢先认领，本页认领结果为空时继续向后认领
+        yield from records
+        after_id = last_id
+
+def renew_leases(content_hashes, worker_id=None, lease_seconds=LEASE_SECONDS):
+    """
+    为本实例已读入处理管道（排队或在途）的新闻续租，返回续租的条数
+    只更新仍由本实例持有且未处理完的行：租约已过期并被其他实例认领的新闻不会被抢回
+    """
+    worker_id = worker_id or get_worker_id()
+    content_hashes = list(content_hashes)
+    expires_at = (datetime.now() + timedelta(seconds=lease_seconds)).replace(microsecond=0)
+    renewed = 0
+    engine = get_engine(get_db_url())
+    with engine.begin() as conn:
+        for start in range(0, len(content_hashes), _MAX_KEYS_PER_QUERY):
+            result = conn.execute(text(f"""
+                UPDATE {TABLE_NAME} SET lease_expires_at = :expires_at
+                WHERE content_hash IN :hashes AND lease_owner = :worker_id AND processed_at IS NULL
+            """).bindparams(bindparam('hashes', expanding=True)),
+                {"expires_at": expires_at, "worker_id": worker_id,
+                 "hashes": content_hashes[start:start + _MAX_KEYS_PER_QUERY]})
+            renewed += result.rowcount
+    return renewed
+
+def release_leases(worker_id=None):
+    """释放本实例仍持有但未处理完的租约，返回释放的条数"""
+    worker_id = worker_id or get_worker_id()
+    engine = get_engine(get_db_url())
+    with engine.begin() as conn:
+        result = conn.execute(text(f"""
+            UPDATE {TABLE_NAME} SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner = :worker_id AND processed_at IS NULL
+        """), {"worker_id": worker_id})
+    return result.rowcount
+
+def claim_newest_news(after_id, worker_id=None, limit=FRESH_LANE_SIZE, lease_seconds=LEASE_SECONDS):
+    """认领 id 大于 after_id 的最新待处理新闻，供 fresh 通道使用"""
+    records, _ = claim_news(worker_id or get_worker_id(), limit, lease_seconds, after_id, newest_first=True)
+    return records
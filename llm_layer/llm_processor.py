@@ -1,6 +1,9 @@
+import asyncio
 import json
 import re
-from .models.llm_client import BaseLLMClient
+from common.llm_cache import get_llm_cache, LLMResponseCache
+from .models.llm_client import BaseAsyncLLMClient
+from .models.rate_limiter import estimate_tokens
 
 SYSTEM_PROMPT = """
 # 角色 
@@ -67,6 +70,39 @@ Output:
 }
 """
 
+# 批量模式：在单条提示词基础上追加多条输入、JSON 数组输出的约定
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+# 批量模式 (优先级高于上述输出格式要求)
+本次输入包含多条新闻，每行一条，均以 content_hash 开头。
+请逐条独立解析，输出一个 JSON 数组，数组中每个元素都是上述数据结构的 JSON 对象，且必须原样包含该条新闻的 content_hash。
+数组元素顺序与输入一致，不得遗漏、合并或新增条目。仅输出 JSON 数组，不要包含任何额外的解释文字。
+"""
+
+class ExtractionError(Exception):
+    """单条新闻结构化失败，异常信息为失败原因，会记录到新闻的 last_error 列"""
+
+def format_news_input(row):
+    """构造单条新闻的输入字符串，row 为 db_reader.NewsRecord"""
+    return f"content_hash：{row.content_hash}，title：{row.title}，content：{row.content}，publish_date：{row.publish_date}，publish_time：{row.publish_time}"
+
+def plan_batches(records, token_budget, max_items, output_tokens_per_item):
+    """
+    按 token 预算将新闻贪心打包为多个请求
+    每个请求的 提示词 + 输入 + 预估输出 不超过 token_budget，且条数不超过 max_items
+    """
+    budget = token_budget - estimate_tokens(BATCH_SYSTEM_PROMPT)
+    batches, current, used = [], [], 0
+    for record in records:
+        cost = estimate_tokens(format_news_input(record)) + output_tokens_per_item
+        if current and (used + cost > budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(record)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
 def extract_json(text):
     """从 LLM 输出中提取 JSON 部分"""
     try:
@@ -79,17 +115,121 @@ def extract_json(text):
         print(f"JSON Extraction Error: {e}\nRaw text: {text}")
         return None
 
-def process_single_news(llm_client: BaseLLMClient, row):
-    """处理单条新闻"""
-    # 构造输入字符串
-    user_input = f"content_hash：{row['content_hash']}，title：{row['title']}，content：{row['content']}，publish_date：{row['publish_date']}，publish_time：{row['publish_time']}"
-    
-    raw_response = llm_client.chat(SYSTEM_PROMPT, user_input)
+def extract_json_array(text):
+    """从 LLM 输出中提取 JSON 数组部分"""
+    try:
+        match = re.search(r'(\[.*\])', text, re.DOTALL)
+        data = json.loads(match.group(1) if match else text)
+        # 只有一条时部分模型会直接返回对象
+        return [data] if isinstance(data, dict) else data
+    except Exception as e:
+        print(f"JSON Array Extraction Error: {e}\nRaw text: {text}")
+        return None
+
+def parse_single_response(row, raw_response):
+    """解析单条新闻的 LLM 输出"""
     if not raw_response:
         return None
     
     structured_data = extract_json(raw_response)
     if structured_data:
         # 确保包含 content_hash，有些 LLM 可能会漏掉或格式化错误
-        structured_data['content_hash'] = row['content_hash']
-    return structured_data
\ No newline at end of file
+        structured_data['content_hash'] = row.content_hash
+    return structured_data
+
+def _require_result(row, raw_response):
+    """解析单条新闻的 LLM 输出，失败时抛出带原因的 ExtractionError"""
+    if not raw_response:
+        # 网络、限流等暂时性失败由客户端抛出 TransientLLMError，走到这里的是内容相关的失败
+        raise ExtractionError("LLM 未返回内容或拒绝了该请求")
+    result = parse_single_response(row, raw_response)
+    if not isinstance(result, dict):
+        raise ExtractionError(f"无法从 LLM 输出中解析 JSON: {raw_response[:100]}")
+    return result
+
+def parse_batch_response(rows, raw_response):
+    """
+    解析批量请求的 LLM 输出，按 content_hash 映射回各条新闻
+    返回: (成功解析的结构化结果列表, 缺失或格式错误、需要重新处理的新闻列表)
+    """
+    items = extract_json_array(raw_response) if raw_response else None
+    if not isinstance(items, list):
+        return [], list(rows)
+
+    expected = {row.content_hash for row in rows}
+    parsed = {}
+    for item in items:
+        if isinstance(item, dict) and item.get('content_hash') in expected:
+            parsed.setdefault(item['content_hash'], item)
+
+    results = [parsed[row.content_hash] for row in rows if row.content_hash in parsed]
+    failed = [row for row in rows if row.content_hash not in parsed]
+    return results, failed
+
+def _news_cache_key(llm_client, content_hash):
+    # 单条与批量模式共用同一缓存键，提示词版本以 SYSTEM_PROMPT 为准
+    return LLMResponseCache.make_key("news", SYSTEM_PROMPT, getattr(llm_client, 'model', ''), content_hash)
+
+def lookup_cached_news(llm_client, rows):
+    """查询响应缓存，返回 (命中的结构化结果列表, 未命中的新闻列表)"""
+    cache = get_llm_cache()
+    if cache is None:
+        return [], list(rows)
+
+    keys = {row.content_hash: _news_cache_key(llm_client, row.content_hash) for row in rows}
+    found = cache.get_many(keys.values())
+    hits, misses = [], []
+    for row in rows:
+        cached = found.get(keys[row.content_hash])
+        result = parse_single_response(row, cached) if cached else None
+        if result:
+            hits.append(result)
+        else:
+            misses.append(row)
+    return hits, misses
+
+def store_news_results(llm_client, results):
+    """将解析成功的结构化结果写入响应缓存"""
+    cache = get_llm_cache()
+    if cache is None:
+        return
+    for result in results:
+        cache.set(_news_cache_key(llm_client, result['content_hash']), json.dumps(result, ensure_ascii=False))
+
+async def alookup_cached_news(llm_client, rows):
+    """lookup_cached_news 的异步版本，SQLite 读写在线程中执行，不阻塞事件循环"""
+    if get_llm_cache() is None:
+        return [], list(rows)
+    return await asyncio.to_thread(lookup_cached_news, llm_client, rows)
+
+async def astore_news_results(llm_client, results):
+    if get_llm_cache() is None or not results:
+        return
+    await asyncio.to_thread(store_news_results, llm_client, results)
+
+async def aprocess_single_news(llm_client: BaseAsyncLLMClient, row):
+    """处理单条新闻，row 为 db_reader.NewsRecord；失败时抛出 ExtractionError"""
+    hits, _ = await alookup_cached_news(llm_client, [row])
+    if hits:
+        return hits[0]
+
+    raw_response = await llm_client.chat(SYSTEM_PROMPT, format_news_input(row))
+    result = _require_result(row, raw_response)
+    await astore_news_results(llm_client, [result])
+    return result
+
+async def aprocess_news_batch(llm_client: BaseAsyncLLMClient, rows):
+    """在一次请求中处理多条新闻，返回值同 parse_batch_response；只剩一条未命中缓存时按单条处理"""
+    hits, rows = await alookup_cached_news(llm_client, rows)
+    if not rows:
+        return hits, []
+    if len(rows) == 1:
+        try:
+            return hits + [await aprocess_single_news(llm_client, rows[0])], []
+        except ExtractionError:
+            return hits, list(rows)
+
+    raw_response = await llm_client.chat(BATCH_SYSTEM_PROMPT, "\n".join(format_news_input(row) for row in rows))
+    results, failed = parse_batch_response(rows, raw_response)
+    await astore_news_results(llm_client, results)
+    return hits + results, failed
@@ -0,0 +1,191 @@
+import argparse
+import os
+import sys
+import time
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_layer import config
+from llm_layer.db_reader import read_training_samples
+from llm_layer.near_dup import news_text
+
+# 本地分类器预测的字段，其余结构化字段仍需 LLM 抽取
+LABEL_FIELDS = ['asset_class', 'sector', 'event_type', 'trend_signal']
+
+# 参与特征提取的正文最大长度，标题已包含大部分分类信息
+MAX_TEXT_LENGTH = 300
+
+def classifier_text(title, content):
+    return news_text(title, content)[:MAX_TEXT_LENGTH]
+
+class LocalClassifier:
+    """
+    基于字符 n-gram TF-IDF + 逻辑回归的本地分类器，纯 CPU 推理
+    各字段共用同一个向量化器，每个字段一个线性模型，置信度取预测类别的概率
+    """
+    def __init__(self, vectorizer, models, thresholds, trained_at=None, samples=0):
+        self.vectorizer = vectorizer
+        self.models = models
+        self.thresholds = thresholds
+        self.trained_at = trained_at
+        self.samples = samples
+
+    @classmethod
+    def load(cls, path, thresholds):
+        import joblib
+        bundle = joblib.load(path)
+        return cls(bundle['vectorizer'], bundle['models'], thresholds, bundle.get('trained_at'), bundle.get('samples', 0))
+
+    def threshold(self, field):
+        return self.thresholds.get(field, config.LOCAL_CLASSIFIER_THRESHOLD)
+
+    def predict(self, records):
+        """
+        预测一批新闻，records 为 db_reader.NewsRecord
+        返回 {content_hash: (标签字典, 是否所有字段都达到置信度阈值)}
+        """
+        if not records:
+            return {}
+        features = self.vectorizer.transform([classifier_text(r.title, r.content) for r in records])
+        labels = [{} for _ in records]
+        confident = [True] * len(records)
+        for field in LABEL_FIELDS:
+            model = self.models.get(field)
+            if model is None:
+                # 训练数据中该字段类别不足，无法本地判断
+                confident = [False] * len(records)
+                continue
+            proba = model.predict_proba(features)
+            best = proba.argmax(axis=1)
+            for i, idx in enumerate(best):
+                labels[i][field] = str(model.classes_[idx])
+                if proba[i, idx] < self.threshold(field):
+                    confident[i] = False
+        return {r.content_hash: (labels[i], confident[i]) for i, r in enumerate(records)}
+
+    def to_result(self, content_hash, labels):
+        """将预测标签转换为可直接写回的结构化结果"""
+        return {**labels, 'content_hash': content_hash, 'label_source': 'local'}
+
+class ShadowStats:
+    """影子模式下统计本地分类器与 LLM 结果的一致率"""
+    def __init__(self):
+        self.compared = 0
+        self.confident = 0
+        self.agree = {field: 0 for field in LABEL_FIELDS}
+        self.confident_agree = 0
+
+    def record(self, labels, is_confident, llm_result):
+        from llm_layer.db_writer import coerce_structured_record
+        expected = coerce_structured_record(llm_result)
+        matches = {field: str(labels.get(field)) == str(expected.get(field)) for field in LABEL_FIELDS}
+        self.compared += 1
+        for field, ok in matches.items():
+            self.agree[field] += ok
+        if is_confident:
+            self.confident += 1
+            self.confident_agree += all(matches.values())
+
+    def as_dict(self):
+        if not self.compared:
+            return {"compared": 0}
+        return {
+            "compared": self.compared,
+            "agreement": {field: round(n / self.compared, 3) for field, n in self.agree.items()},
+            # 高置信度部分即启用 active 模式后将不再调用 LLM 的新闻
+            "confident_share": round(self.confident / self.compared, 3),
+            "confident_agreement": round(self.confident_agree / self.confident, 3) if self.confident else None,
+        }
+
+def parse_thresholds(spec):
+    """解析形如 "asset_class=0.9,sector=0.8" 的按字段阈值配置"""
+    thresholds = {}
+    for item in spec.split(','):
+        if '=' in item:
+            field, value = item.split('=', 1)
+            thresholds[field.strip()] = float(value)
+    return thresholds
+
+def load_local_classifier():
+    """按配置加载本地分类器，未启用、模型不存在或缺少 scikit-learn 时返回 None"""
+    if config.LOCAL_CLASSIFIER_MODE not in ('shadow', 'active'):
+        return None
+    if not os.path.exists(config.LOCAL_CLASSIFIER_PATH):
+        print(f"本地分类器模型 {config.LOCAL_CLASSIFIER_PATH} 不存在，请先运行 python -m llm_layer.local_classifier train")
+        return None
+    try:
+        classifier = LocalClassifier.load(config.LOCAL_CLASSIFIER_PATH, parse_thresholds(config.LOCAL_CLASSIFIER_THRESHOLDS))
+    except ImportError:
+        print("未安装 scikit-learn，本地分类器不可用。")
+        return None
+    print(f"本地分类器已加载 ({config.LOCAL_CLASSIFIER_MODE} 模式，训练样本 {classifier.samples} 条，训练时间 {classifier.trained_at})")
+    return classifier
+
+def train(limit, test_size):
+    """使用 LLM 已标注的历史新闻训练本地分类器并保存"""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+
+    rows = read_training_samples(LABEL_FIELDS, limit)
+    if len(rows) < 100:
+        print(f"训练样本不足 ({len(rows)} 条)，至少需要 100 条 LLM 标注的新闻。")
+        return
+    print(f"读取训练样本 {len(rows)} 条")
+
+    texts = [classifier_text(row.title, row.content) for row in rows]
+    train_idx, test_idx = train_test_split(list(range(len(rows))), test_size=test_size, random_state=42)
+
+    started = time.time()
+    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(1, 3), min_df=2, max_features=200000, sublinear_tf=True)
+    x_train = vectorizer.fit_transform([texts[i] for i in train_idx])
+    x_test = vectorizer.transform([texts[i] for i in test_idx])
+
+    thresholds = parse_thresholds(config.LOCAL_CLASSIFIER_THRESHOLDS)
+    models = {}
+    for field in LABEL_FIELDS:
+        labels = [str(getattr(row, field)) for row in rows]
+        y_train = [labels[i] for i in train_idx]
+        if len(set(y_train)) < 2:
+            print(f"字段 {field} 的类别不足两类，跳过。")
+            continue
+        model = LogisticRegression(max_iter=1000, C=4.0)
+        model.fit(x_train, y_train)
+        models[field] = model
+
+        # 在留出集上评估整体准确率，以及高于阈值部分的覆盖率与准确率
+        y_test = [labels[i] for i in test_idx]
+        proba = model.predict_proba(x_test)
+        predicted = model.classes_[proba.argmax(axis=1)]
+        confident = proba.max(axis=1) >= thresholds.get(field, config.LOCAL_CLASSIFIER_THRESHOLD)
+        correct = predicted == y_test
+        coverage = confident.mean()
+        confident_acc = correct[confident].mean() if confident.any() else float('nan')
+        print(f"{field}: 类别 {len(model.classes_)} 个，准确率 {correct.mean():.3f}，"
+              f"高置信度覆盖率 {coverage:.3f}，高置信度准确率 {confident_acc:.3f}")
+
+    os.makedirs(os.path.dirname(config.LOCAL_CLASSIFIER_PATH) or '.', exist_ok=True)
+    joblib.dump({
+        'vectorizer': vectorizer,
+        'models': models,
+        'trained_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'samples': len(rows),
+    }, config.LOCAL_CLASSIFIER_PATH)
+    print(f"训练完成，耗时 {time.time() - started:.1f} 秒，模型已保存到 {config.LOCAL_CLASSIFIER_PATH}")
+
+def main():
+    parser = argparse.ArgumentParser(description="本地新闻分类器")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="使用 LLM 历史标注训练模型")
+    train_parser.add_argument("--limit", type=int, default=config.LOCAL_CLASSIFIER_TRAIN_LIMIT, help="最多使用的样本数（取最近的）")
+    train_parser.add_argument("--test-size", type=float, default=0.1, help="留出评估集比例")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        train(args.limit, args.test_size)
+
+if __name__ == "__main__":
+    main()
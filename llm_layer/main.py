@@ -1,67 +1,68 @@
-import time
+import asyncio
 import os
 import sys
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
 
 # 添加根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from llm_layer import config
-from llm_layer.db_writer import init_table_b, get_last_processed_hash, save_structured_data
-from llm_layer.db_reader import read_unprocessed_news
-from llm_layer.llm_processor import process_single_news
-from llm_layer.models.llm_client import get_llm_client
+from llm_layer.db_writer import init_table_b
+from llm_layer.db_reader import iter_unprocessed_news, read_newest_unprocessed
+from llm_layer.near_dup import build_near_dup_index
+from llm_layer.local_classifier import load_local_classifier
+from llm_layer.outbox import get_latest_seq, wait_for_new_news
+from llm_layer.lease import get_worker_id, iter_claimed_news, claim_newest_news, renew_leases, release_leases
+from llm_layer.pipeline import LLMPipeline
+from llm_layer.models.llm_client import get_async_llm_client
+from common.db_pool import format_pool_stats
+from common.llm_cache import format_cache_stats
 
-def batch_process(client, news_df):
-    """并发处理一批新闻"""
-    results = []
-    with ThreadPoolExecutor(max_workers=config.CONCURRENCY) as executor:
-        # 将这一批次的任务交给线程池
-        futures = [executor.submit(process_single_news, client, row) for _, row in news_df.iterrows()]
-        for future in futures:
-            res = future.result()
-            if res:
-                results.append(res)
-    return results
+async def run_cycle(client, near_dup_index=None, local_classifier=None):
+    """按 id 分页流式读取（多实例时逐页认领）待处理的新闻，交给异步管道并发处理并持续写回，返回本轮统计"""
+    records = iter_claimed_news() if config.LEASE_ENABLED else iter_unprocessed_news()
+    fresh_source = None
+    if config.FRESH_LANE_ENABLED:
+        # 处理积压期间持续拉取最新新闻，为其预留部分并发
+        fresh_source = claim_newest_news if config.LEASE_ENABLED else (
+            lambda after_id: read_newest_unprocessed(config.FRESH_LANE_SIZE, after_id))
+    pipeline = LLMPipeline(client, config.CONCURRENCY, near_dup_index, local_classifier)
+    try:
+        return await pipeline.run(records, fresh_source, renew_leases if config.LEASE_ENABLED else None)
+    finally:
+        if config.LEASE_ENABLED:
+            await asyncio.to_thread(release_leases)
 
-def run():
+async def run_async():
     print("=== LLM 处理层 (LLM Layer) 启动 ===")
+    if config.LEASE_ENABLED:
+        print(f"实例标识: {get_worker_id()}")
     
     # 1. 初始化 B 表
     init_table_b()
     
-    # 2. 加载 LLM 客户端 (如果是本地模型，在此处加载一次)
-    client = None
+    # 2. 加载 LLM 客户端 (异步客户端在整个进程生命周期内复用连接)
+    client = get_async_llm_client(config)
+    near_dup_index = None
+    local_classifier = await asyncio.to_thread(load_local_classifier)
     
     while True:
+        # 记录本轮开始前的通知序号，处理期间到达的新通知会让下一轮立即开始
+        notify_seq = 0
+        if config.NOTIFY_ENABLED:
+            try:
+                notify_seq = await asyncio.to_thread(get_latest_seq)
+            except Exception as e:
+                print(f"读取新闻通知失败: {e}")
+
         try:
-            # 3. 获取上次处理到的进度
-            last_hash = get_last_processed_hash()
-            
-            # 4. 读取待处理的新闻
-            unprocessed_df = read_unprocessed_news(last_hash)
-            
-            if not unprocessed_df.empty:
-                print(f"发现 {len(unprocessed_df)} 条新数据待处理...")
-                
-                # 只有发现新数据时才按需加载客户端（如果是本地模型建议在循环外加载）
-                if client is None:
-                    client = get_llm_client(config)
-                
-                # 5. 分片处理 (按 BATCH_SIZE)
-                total_processed = 0
-                for i in range(0, len(unprocessed_df), config.BATCH_SIZE):
-                    batch_df = unprocessed_df.iloc[i : i + config.BATCH_SIZE]
-                    print(f"正在处理批次 {i // config.BATCH_SIZE + 1}, 包含 {len(batch_df)} 条数据...")
-                    
-                    structured_results = batch_process(client, batch_df)
-                    
-                    # 6. 保存结果
-                    save_structured_data(structured_results)
-                    total_processed += len(structured_results)
-                
-                print(f"本轮处理结束，成功结构化 {total_processed} 条新闻。")
+            if config.NEAR_DUP_ENABLED and near_dup_index is None:
+                near_dup_index = await asyncio.to_thread(build_near_dup_index)
+
+            # 3. 读取待处理的新闻，4. 交给异步管道并发处理并持续写回
+            stats = await run_cycle(client, near_dup_index, local_classifier)
+
+            if stats["read"]:
+                print(f"本轮处理结束: {stats}")
             else:
                 print("暂无新数据。")
                 
@@ -70,8 +71,21 @@ def run():
             import traceback
             traceback.print_exc()
 
-        print(f"等待 {config.PROCESS_INTERVAL} 秒后进行下一轮比对...\n")
-        time.sleep(config.PROCESS_INTERVAL)
+        print(f"连接池统计: {format_pool_stats()}")
+        print(f"LLM 响应缓存: {format_cache_stats()}")
+        if near_dup_index is not None:
+            print(f"近似去重统计: {near_dup_index.stats()}")
+        if config.NOTIFY_ENABLED:
+            print(f"等待新新闻通知 (最长 {config.PROCESS_INTERVAL} 秒)...\n")
+            _, notified = await asyncio.to_thread(wait_for_new_news, notify_seq, config.PROCESS_INTERVAL, config.NOTIFY_POLL_INTERVAL)
+            if notified:
+                print("收到新新闻通知，开始处理。")
+        else:
+            print(f"等待 {config.PROCESS_INTERVAL} 秒后进行下一轮比对...\n")
+            await asyncio.sleep(config.PROCESS_INTERVAL)
+
+def run():
+    asyncio.run(run_async())
 
 if __name__ == "__main__":
     run()
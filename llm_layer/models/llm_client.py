@@ -1,38 +1,187 @@
 import os
 import time
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from .rate_limiter import (RateLimiter, AIMDController, estimate_tokens, parse_retry_after,
+                           classify_error, backoff_delay)
+
+class TransientLLMError(Exception):
+    """
+    请求失败且原因与新闻内容无关（网络、超时、限流、鉴权或服务端错误，重试已耗尽），
+    不应计入该新闻的失败次数，稍后整体重试即可
+    """
+
+# 与请求内容相关的错误（参数错误、内容过长、内容无法处理），同样的新闻再次请求仍会失败
+PAYLOAD_ERROR_STATUSES = (400, 413, 422)
+
+def _give_up(error):
+    """重试耗尽或不可重试时：内容相关的错误返回 None（计为该新闻的一次失败），其余抛出 TransientLLMError"""
+    print(f"Online LLM Error: {error}")
+    if getattr(error, 'status_code', None) in PAYLOAD_ERROR_STATUSES:
+        return None
+    raise TransientLLMError(f"{type(error).__name__}: {error}") from error
 
 class BaseLLMClient(ABC):
     @abstractmethod
     def chat(self, system_prompt, user_input):
         pass
 
+class BaseAsyncLLMClient(ABC):
+    @abstractmethod
+    async def chat(self, system_prompt, user_input):
+        pass
+
+class RetryPolicy:
+    """重试参数：最大重试次数与指数退避的基准/上限延迟"""
+    def __init__(self, max_retries=4, base_delay=1.0, max_delay=30.0, output_tokens=500):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.output_tokens = output_tokens  # 限流时为每次请求预估的输出 token 数
+
+    def next_delay(self, error, attempt):
+        """返回下次重试前的等待秒数，不应重试时返回 None"""
+        retryable, _ = classify_error(error)
+        if not retryable or attempt >= self.max_retries:
+            return None
+        retry_after = parse_retry_after(error)
+        if retry_after is not None:
+            # 服务端明确给出等待时间时以其为准，并加少量抖动避免同时重试
+            return retry_after + backoff_delay(0, self.base_delay, self.max_delay)
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+def _response_content(response):
+    """取出回答内容，响应结构异常（如 choices 为空）时返回 None；在重试范围之外调用，格式问题不会触发重试"""
+    try:
+        return response.choices[0].message.content
+    except (AttributeError, IndexError, TypeError) as e:
+        print(f"Online LLM 响应格式异常: {e}")
+        return None
+
+def _messages(system_prompt, user_input):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input},
+    ]
+
 class OnlineLLMClient(BaseLLMClient):
-    def __init__(self, api_key, base_url, model):
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+    def __init__(self, api_key, base_url, model, limiter=None, retry=None, timeout=60):
+        # 重试由 RetryPolicy 统一处理，关闭 SDK 自带的重试以免次数叠加
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
         self.model = model
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy(max_retries=0)
 
     def chat(self, system_prompt, user_input):
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input},
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Online LLM Error: {e}")
-            return None
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(user_input) + self.retry.output_tokens
+        attempt = 0
+        while True:
+            if self.limiter:
+                wait = self.limiter.reserve(tokens)
+                if wait > 0:
+                    time.sleep(wait)
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=_messages(system_prompt, user_input),
+                    stream=False
+                )
+            except Exception as e:
+                delay = self.retry.next_delay(e, attempt)
+                if delay is None:
+                    return _give_up(e)
+                attempt += 1
+                print(f"Online LLM Error (第 {attempt} 次重试, {delay:.1f} 秒后): {e}")
+                time.sleep(delay)
+                continue
+            return _response_content(response)
+
+class AsyncOnlineLLMClient(BaseAsyncLLMClient):
+    def __init__(self, api_key, base_url, model, limiter=None, retry=None, timeout=60, controller=None):
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.model = model
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy(max_retries=0)
+        # AIMD 并发控制器，由处理管道据此限制同时在途的请求数
+        self.controller = controller
+
+    async def chat(self, system_prompt, user_input):
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(user_input) + self.retry.output_tokens
+        attempt = 0
+        while True:
+            if self.limiter:
+                wait = self.limiter.reserve(tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            started = time.monotonic()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=_messages(system_prompt, user_input),
+                    stream=False
+                )
+            except Exception as e:
+                if self.controller and classify_error(e)[1]:
+                    self.controller.on_overload()
+                delay = self.retry.next_delay(e, attempt)
+                if delay is None:
+                    return _give_up(e)
+                attempt += 1
+                print(f"Online LLM Error (第 {attempt} 次重试, {delay:.1f} 秒后): {e}")
+                await asyncio.sleep(delay)
+                continue
+            if self.controller:
+                self.controller.on_success(time.monotonic() - started)
+            return _response_content(response)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter(config):
+    """进程内共享的限流器，同一进程中的同步与异步客户端共用配额"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(rpm=getattr(config, 'LLM_RPM_LIMIT', 0), tpm=getattr(config, 'LLM_TPM_LIMIT', 0))
+        return _limiter
+
+def get_retry_policy(config):
+    return RetryPolicy(
+        max_retries=getattr(config, 'LLM_MAX_RETRIES', 4),
+        base_delay=getattr(config, 'LLM_RETRY_BASE_DELAY', 1.0),
+        max_delay=getattr(config, 'LLM_RETRY_MAX_DELAY', 30.0),
+        output_tokens=getattr(config, 'LLM_OUTPUT_TOKENS_PER_ITEM', 500)
+    )
 
 def get_llm_client(config):
     # 统一采用SDK即openai通讯协议的方式加载模型
     return OnlineLLMClient(
         api_key=config.ONLINE_API_KEY,
         base_url=config.ONLINE_BASE_URL,
-        model=config.ONLINE_MODEL
+        model=config.ONLINE_MODEL,
+        limiter=get_rate_limiter(config),
+        retry=get_retry_policy(config),
+        timeout=getattr(config, 'LLM_REQUEST_TIMEOUT', 60)
     )
 
+def get_async_llm_client(config):
+    # 异步客户端，供 asyncio 处理管道使用
+    controller = None
+    if getattr(config, 'AIMD_ENABLED', False):
+        controller = AIMDController(
+            initial=config.CONCURRENCY,
+            minimum=config.LLM_MIN_CONCURRENCY,
+            maximum=config.LLM_MAX_CONCURRENCY,
+            latency_target=config.AIMD_LATENCY_TARGET
+        )
+    return AsyncOnlineLLMClient(
+        api_key=config.ONLINE_API_KEY,
+        base_url=config.ONLINE_BASE_URL,
+        model=config.ONLINE_MODEL,
+        limiter=get_rate_limiter(config),
+        retry=get_retry_policy(config),
+        timeout=getattr(config, 'LLM_REQUEST_TIMEOUT', 60),
+        controller=controller
+    )
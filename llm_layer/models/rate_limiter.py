@@ -0,0 +1,126 @@
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+import openai
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按 1 个 token，其余字符按 4 个字符 1 个 token"""
+    text = str(text)
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+class TokenBucket:
+    """
+    线程安全的令牌桶，按每分钟配额匀速补充，最多积累 burst_seconds 秒的配额
+    reserve 先预扣令牌再返回需要等待的秒数，同步与异步调用方各自睡眠即可
+    """
+    def __init__(self, per_minute, burst_seconds=10):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class RateLimiter:
+    """请求数/分钟 与 token 数/分钟 双重限流，配额为 0 表示不限制"""
+    def __init__(self, rpm=0, tpm=0):
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+
+    def reserve(self, tokens):
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+class AIMDController:
+    """
+    加性增、乘性减的并发控制器
+    - 请求成功且延迟低于目标时，每轮（约 limit 个成功请求）并发上限 +1
+    - 遇到限流 (429)、超时或服务端错误时上限减半，冷却期内只减一次，避免同一波错误连续减半
+    """
+    def __init__(self, initial, minimum, maximum, latency_target, decrease_cooldown=2.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.decrease_cooldown = decrease_cooldown
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.throttles = 0
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def on_success(self, latency):
+        with self._lock:
+            self.successes += 1
+            if latency <= self.latency_target:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_overload(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(float(self.minimum), self.limit / 2)
+                self._last_decrease = now
+
+    def stats(self):
+        return {"limit": self.current, "successes": self.successes, "throttles": self.throttles}
+
+def parse_retry_after(error):
+    """从 API 异常的响应头中解析 Retry-After（秒），没有则返回 None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except Exception:
+            return None
+
+def classify_error(error):
+    """返回 (是否可重试, 是否为过载信号)"""
+    status = getattr(error, 'status_code', None)
+    if status == 429:
+        return True, True
+    if status is not None:
+        # 408 超时、409 冲突与 5xx 服务端错误可以重试，其余 4xx（鉴权、参数错误）重试无意义
+        return status in (408, 409) or status >= 500, status >= 500
+    # 连接错误与超时（APITimeoutError 是 APIConnectionError 的子类）说明服务端过载或网络异常
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return True, True
+    # 其余异常（如响应解析、参数或程序错误）重试无意义，也不代表服务端过载
+    return False, False
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """带完全抖动的指数退避"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
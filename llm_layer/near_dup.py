@@ -0,0 +1,168 @@
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+import numpy as np
+from . import config
+from .db_reader import read_recent_canonical_news, read_structured_fields
+
+# 去除空白与标点，只保留文字本身参与相似度计算
+_NOISE_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+# 小于 2^32 的最大素数，(a * x + b) 全部小于该值时乘加结果不会超出 uint64
+_PRIME = (1 << 32) - 5
+
+def normalize_text(text):
+    return _NOISE_PATTERN.sub('', str(text or '')).lower()
+
+def shingles(text, ngram=3):
+    """字符 n-gram 集合"""
+    text = normalize_text(text)
+    if len(text) <= ngram:
+        return {text}
+    return {text[i : i + ngram] for i in range(len(text) - ngram + 1)}
+
+class MinHasher:
+    """MinHash 签名生成器，签名相同位置的比例即为 Jaccard 相似度的估计"""
+    def __init__(self, num_perm=128, ngram=3, seed=42):
+        self.num_perm = num_perm
+        self.ngram = ngram
+        rng = np.random.default_rng(seed)
+        # 随机线性置换 h(x) = (a * x + b) mod p
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        values = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in shingles(text, self.ngram)],
+            dtype=np.uint64
+        ) % np.uint64(_PRIME)
+        return ((self._a * values[None, :] + self._b) % np.uint64(_PRIME)).min(axis=1)
+
+def estimate_jaccard(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+class NearDuplicateIndex:
+    """
+    最近一段时间内已处理新闻的 MinHash-LSH 内存索引。
+    签名切分为若干段分桶，只有至少一段完全相同的新闻才会进入相似度比对。
+    """
+    def __init__(self, threshold=0.8, window_seconds=86400, max_items=50000,
+                 num_perm=128, bands=32, ngram=3, min_length=20):
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_length = min_length
+        self.hasher = MinHasher(num_perm=num_perm, ngram=ngram)
+        self._entries = deque()  # (加入时间, content_hash)
+        self._signatures = {}
+        self._buckets = {}
+        # 处理管道会在工作线程中查询、在事件循环中写入
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        return [(i, signature[i * self.rows : (i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    def _evict(self, now):
+        while self._entries and (len(self._entries) > self.max_items or now - self._entries[0][0] > self.window_seconds):
+            _, content_hash = self._entries.popleft()
+            signature = self._signatures.pop(content_hash, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    bucket.discard(content_hash)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def signature(self, text):
+        """文本过短时返回 None，不参与近似去重"""
+        if len(normalize_text(text)) < self.min_length:
+            return None
+        return self.hasher.signature(text)
+
+    def add(self, content_hash, signature, added_at=None):
+        if signature is None:
+            return
+        with self._lock:
+            if content_hash in self._signatures:
+                return
+            self._entries.append((added_at if added_at is not None else time.time(), content_hash))
+            self._signatures[content_hash] = signature
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(content_hash)
+            self._evict(time.time())
+
+    def find(self, signature):
+        """返回与签名最相似且不低于阈值的 content_hash，没有则返回 None"""
+        if signature is None:
+            return None
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+
+            best_hash, best_score = None, self.threshold
+            for content_hash in candidates:
+                score = estimate_jaccard(signature, self._signatures[content_hash])
+                if score >= best_score:
+                    best_hash, best_score = content_hash, score
+            if best_hash is not None:
+                self.duplicates += 1
+            return best_hash
+
+    def stats(self):
+        return {"size": len(self), "lookups": self.lookups, "duplicates": self.duplicates}
+
+def news_text(title, content):
+    """参与近似去重的新闻文本（标题 + 正文）"""
+    return f"{title or ''}{content or ''}"
+
+def build_near_dup_index():
+    """创建近似去重索引，并用近期已处理的新闻预热"""
+    index = NearDuplicateIndex(
+        threshold=config.NEAR_DUP_THRESHOLD,
+        window_seconds=config.NEAR_DUP_WINDOW_HOURS * 3600,
+        max_items=config.NEAR_DUP_MAX_ITEMS
+    )
+    recent_news = read_recent_canonical_news(config.NEAR_DUP_WINDOW_HOURS, config.NEAR_DUP_MAX_ITEMS)
+    # 按从旧到新的顺序加入，保证淘汰顺序正确；加入时间取处理时间，使其按原本的处理时间过期
+    for content_hash, title, content, processed_at in reversed(recent_news):
+        index.add(content_hash, index.signature(news_text(title, content)), added_at=processed_at.timestamp())
+    print(f"近似去重索引已预热 {len(index)} 条近期新闻")
+    return index
+
+def split_near_duplicates(index, records):
+    """
+    将一批新闻拆分为近似重复与待处理两部分
+    返回: (直接复用原始新闻结构化字段的结果, 需要调用 LLM 的新闻, 每条新闻的签名)
+    """
+    signatures = {}
+    matches = {}
+    for record in records:
+        signature = index.signature(news_text(record.title, record.content))
+        signatures[record.content_hash] = signature
+        canonical_hash = index.find(signature)
+        if canonical_hash:
+            matches[record.content_hash] = canonical_hash
+
+    canonical_fields = read_structured_fields(set(matches.values()))
+    dup_results = []
+    for content_hash, canonical_hash in matches.items():
+        fields = canonical_fields.get(canonical_hash)
+        if fields is None:
+            continue
+        dup_results.append({**fields, 'content_hash': content_hash, 'duplicate_of': canonical_hash, 'label_source': 'near_dup'})
+
+    reused_hashes = {res['content_hash'] for res in dup_results}
+    return dup_results, [r for r in records if r.content_hash not in reused_hashes], signatures
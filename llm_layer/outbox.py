@@ -0,0 +1,33 @@
+import time
+from sqlalchemy import text
+from common.db_pool import get_engine
+from .config import get_db_url, OUTBOX_TABLE_NAME
+
+def get_latest_seq():
+    """返回通知表当前最大序号（主键查询，开销极低）"""
+    engine = get_engine(get_db_url())
+    with engine.connect() as conn:
+        result = conn.execute(text(f"SELECT COALESCE(MAX(seq), 0) FROM {OUTBOX_TABLE_NAME}")).fetchone()
+    return int(result[0])
+
+def wait_for_new_news(after_seq, timeout, poll_interval):
+    """
+    阻塞等待通知表出现大于 after_seq 的新序号
+    返回 (最新序号, 是否收到新通知)；通知表不可用时退化为睡眠 timeout 秒
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            latest_seq = get_latest_seq()
+        except Exception as e:
+            print(f"读取新闻通知失败，退化为定时轮询: {e}")
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            return after_seq, False
+
+        if latest_seq > after_seq:
+            return latest_seq, True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return latest_seq, False
+        time.sleep(min(poll_interval, remaining))
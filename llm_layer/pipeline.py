@@ -0,0 +1,331 @@
+import asyncio
+import time
+from itertools import islice
+from . import config
+from .db_writer import save_structured_data, record_failures
+from .llm_processor import aprocess_single_news, aprocess_news_batch, plan_batches, ExtractionError
+from .models.llm_client import TransientLLMError
+from .near_dup import split_near_duplicates
+from .local_classifier import ShadowStats
+from .scheduler import LaneScheduler
+
+# 通知写入协程退出的哨兵
+_STOP = object()
+
+def next_batch(records, size):
+    """从记录流中取出下一批，流结束时返回空列表"""
+    return list(islice(records, size))
+
+class ConcurrencyGate:
+    """
+    限制同时在途的 LLM 请求数
+    上限取自客户端的 AIMD 控制器（随延迟与限流情况动态调整），未启用时固定为 limit
+    """
+    def __init__(self, limit, controller=None):
+        self.limit = limit
+        self.controller = controller
+        self.inflight = 0
+        self._cond = asyncio.Condition()
+
+    def current_limit(self):
+        return self.controller.current if self.controller else self.limit
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.inflight < self.current_limit())
+            self.inflight += 1
+
+    async def release(self):
+        async with self._cond:
+            self.inflight -= 1
+            # 上限可能在请求完成时被调高，唤醒所有等待者重新检查
+            self._cond.notify_all()
+
+class LLMPipeline:
+    """
+    asyncio 结构化处理管道
+    - 生产者按 BATCH_SIZE 流式读取未处理新闻，做近似去重与本地分类器预标注后拆分为工作单元，投入 backlog 通道；
+      提供 fresh_source 时另有生产者定期拉取最新新闻投入 fresh 通道，由 LaneScheduler 为其预留部分并发
+    - 工作协程从调度器取任务调用异步 LLM 客户端，某个请求变慢不会阻塞其他请求；
+      同时在途的请求数由 ConcurrencyGate 控制，启用 AIMD 时在 [LLM_MIN_CONCURRENCY, LLM_MAX_CONCURRENCY] 间自适应
+    - 写入协程收集结果，攒满 WRITE_BATCH_SIZE 条或空闲 WRITE_FLUSH_SECONDS 秒即写回数据库，并一并记录处理失败的新闻
+    - 按租约认领时（提供 renew_leases），每 LEASE_SECONDS/3 秒为已读入的新闻续租，
+      并按当前吞吐估算队列排空时间，超过半个租约时长时暂停认领新的积压
+    """
+    def __init__(self, client, concurrency, near_dup_index=None, local_classifier=None):
+        self.client = client
+        self.controller = getattr(client, 'controller', None)
+        # 启用 AIMD 时按最大并发数启动工作协程，实际在途请求数由控制器决定
+        self.concurrency = max(concurrency, config.LLM_MAX_CONCURRENCY) if self.controller else concurrency
+        self.near_dup_index = near_dup_index
+        self.local_classifier = local_classifier
+        # 以下两个字典只保存在途新闻的数据，结果产出或处理失败时移除
+        self.predictions = {}
+        self.shadow = ShadowStats() if local_classifier is not None else None
+        self.signatures = {}
+        self.failures = []
+        # 已投入调度、结果或失败尚未写回的新闻，避免 fresh 与 backlog 两个通道重复处理同一条；
+        # 写回后即移除（此后两个通道的查询都会按 processed_at 等条件过滤掉它），内存占用只与在途数量有关
+        self.enqueued = set()
+        # LLM 服务暂时不可用时暂停派发的截止时间 (time.monotonic)
+        self.paused_until = 0.0
+        # 单个工作单元处理耗时的指数移动平均（秒），用于估算队列排空时间
+        self.unit_seconds = None
+        self.lease_seconds = None
+        self.stats = {"read": 0, "near_dup": 0, "local": 0, "units": 0, "failed": 0, "deferred": 0,
+                      "dead_lettered": 0, "written": 0}
+
+    async def run(self, records, fresh_source=None, renew_leases=None):
+        """
+        处理记录流直至耗尽，返回本轮统计
+        fresh_source(after_id) 返回 id 大于 after_id 的最新待处理新闻，为 None 时不启用 fresh 通道
+        renew_leases(content_hashes) 为已读入的新闻续租，为 None 时不续租也不限制认领速度
+        """
+        self.result_queue = asyncio.Queue()
+        # 每个通道限制已读取但尚未处理完的工作单元数，避免积压过大时一次性读入内存
+        fresh_share = config.FRESH_LANE_SHARE if fresh_source else 0
+        self.gate = ConcurrencyGate(self.concurrency, self.controller)
+        self.scheduler = LaneScheduler(self.gate.current_limit, fresh_share,
+                                       max(self.concurrency * 2, config.SCHEDULER_READ_AHEAD), config.FRESH_LANE_SIZE)
+
+        started = time.monotonic()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        writer = asyncio.create_task(self._writer())
+        helpers = [asyncio.create_task(self._report_metrics())]
+        if fresh_source:
+            helpers.append(asyncio.create_task(self._produce_fresh(fresh_source)))
+        # 续租需持续到队列处理完毕，不随读取结束而停止
+        renewer = None
+        if renew_leases:
+            self.lease_seconds = config.LEASE_SECONDS
+            renewer = asyncio.create_task(self._renew_leases(renew_leases))
+        try:
+            await self._produce(iter(records))
+            # 积压读取完毕后停止拉取最新新闻，处理完已入队的工作单元即结束本轮
+            for helper in helpers:
+                helper.cancel()
+            await asyncio.gather(*helpers, return_exceptions=True)
+            await self.scheduler.join()
+        finally:
+            if renewer is not None:
+                helpers.append(renewer)
+            for task in workers + helpers:
+                task.cancel()
+            await asyncio.gather(*workers, *helpers, return_exceptions=True)
+            await self.result_queue.put(_STOP)
+            await writer
+
+        self.stats["elapsed"] = round(time.monotonic() - started, 2)
+        self.stats["lanes"] = self.scheduler.metrics()
+        if self.controller:
+            self.stats["concurrency"] = self.controller.stats()
+        if self.shadow is not None and config.LOCAL_CLASSIFIER_MODE == 'shadow':
+            self.stats["shadow"] = self.shadow.as_dict()
+        return self.stats
+
+    async def _produce(self, records):
+        while True:
+            # 认领发生在读取时：队列预计无法在半个租约时长内排空时先不认领，避免租约在排队期间过期
+            while self.lease_seconds and self._drain_seconds() > self.lease_seconds / 2:
+                await asyncio.sleep(1)
+            batch = await asyncio.to_thread(next_batch, records, config.BATCH_SIZE)
+            if not batch:
+                return
+            await self._enqueue(self.scheduler.backlog, batch)
+
+    async def _produce_fresh(self, fresh_source):
+        """定期拉取比已见过的更新的待处理新闻，投入 fresh 通道"""
+        after_id = 0
+        while True:
+            try:
+                batch = await asyncio.to_thread(fresh_source, after_id)
+            except Exception as e:
+                print(f"拉取最新新闻失败: {e}")
+                batch = []
+            if batch:
+                after_id = max(after_id, max(record.id for record in batch))
+                await self._enqueue(self.scheduler.fresh, batch)
+            await asyncio.sleep(config.FRESH_POLL_INTERVAL)
+
+    async def _enqueue(self, lane, batch):
+        """近似去重、本地预标注后拆分为工作单元，投入指定通道"""
+        batch = [record for record in batch if record.content_hash not in self.enqueued]
+        if not batch:
+            return
+        self.enqueued.update(record.content_hash for record in batch)
+        self.stats["read"] += len(batch)
+
+        if self.near_dup_index is not None:
+            dup_results, batch, signatures = await asyncio.to_thread(split_near_duplicates, self.near_dup_index, batch)
+            # 近似重复的新闻直接复用结果，只需保留仍要处理的新闻的签名
+            self.signatures.update((record.content_hash, signatures[record.content_hash]) for record in batch)
+            self.stats["near_dup"] += len(dup_results)
+            for res in dup_results:
+                self.result_queue.put_nowait(res)
+
+        if self.local_classifier is not None and batch:
+            batch = await self._classify_locally(batch)
+
+        if config.LLM_BATCH_MODE:
+            units = plan_batches(batch, config.LLM_BATCH_TOKEN_BUDGET, config.LLM_BATCH_MAX_ITEMS,
+                                 config.LLM_OUTPUT_TOKENS_PER_ITEM)
+        else:
+            units = [[record] for record in batch]
+
+        for unit in units:
+            await lane.slots.acquire()
+            await self.scheduler.put(lane, unit, True)
+
+    def _drain_seconds(self):
+        """按平均单元耗时与当前并发上限估算已排队工作单元的排空时间，尚无耗时数据时返回 0"""
+        if self.unit_seconds is None:
+            return 0.0
+        queued = len(self.scheduler.fresh) + len(self.scheduler.backlog)
+        return queued * self.unit_seconds / max(1, self.gate.current_limit())
+
+    async def _renew_leases(self, renew_leases):
+        """定期为排队与在途的新闻续租，已写回或已记录失败的新闻不再续租"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(renew_leases, list(self.enqueued))
+            except Exception as e:
+                print(f"续租失败: {e}")
+
+    async def _report_metrics(self):
+        """长时间消化积压时定期打印各通道的队列深度与等待时间"""
+        while True:
+            await asyncio.sleep(config.SCHEDULER_METRICS_INTERVAL)
+            print(f"调度队列: {self.scheduler.metrics()}，已读取 {self.stats['read']} 条，已写回 {self.stats['written']} 条")
+
+    async def _worker(self):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            # 先取得并发名额再取任务，保证派发时按最新的通道状态选择
+            await self.gate.acquire()
+            try:
+                lane, unit, holds_slot = await self.scheduler.get()
+            except BaseException:
+                await self.gate.release()
+                raise
+            started = time.monotonic()
+            try:
+                self.stats["units"] += 1
+                if len(unit) == 1:
+                    results = [await aprocess_single_news(self.client, unit[0])]
+                else:
+                    results, failed = await aprocess_news_batch(self.client, unit)
+                    # 批量结果中缺失或格式错误的新闻重新入队逐条处理，单条失败则记录失败原因并退避重试
+                    for record in failed:
+                        await self.scheduler.put(lane, [record], False)
+
+                for res in results:
+                    self._compare_shadow(res)
+                    self._emit(res)
+            except TransientLLMError as e:
+                self._defer(unit, e)
+            except ExtractionError as e:
+                self._fail(unit, str(e))
+            except Exception as e:
+                print(f"处理新闻出错: {e}")
+                self._fail(unit, f"{type(e).__name__}: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                self.unit_seconds = elapsed if self.unit_seconds is None else 0.8 * self.unit_seconds + 0.2 * elapsed
+                if holds_slot:
+                    lane.slots.release()
+                await self.scheduler.task_done(lane)
+                await self.gate.release()
+
+    async def _classify_locally(self, batch):
+        """本地分类器预标注：active 模式下高置信度新闻直接产出结果，其余交给 LLM"""
+        predictions = await asyncio.to_thread(self.local_classifier.predict, batch)
+        if config.LOCAL_CLASSIFIER_MODE != 'active':
+            self.predictions.update(predictions)
+            return batch
+
+        remaining = []
+        for record in batch:
+            labels, confident = predictions[record.content_hash]
+            if confident:
+                self.stats["local"] += 1
+                # 本地结果没有情绪分、影响力等字段，不作为近似去重的原始新闻，避免重复新闻复制这些空值
+                self._emit(self.local_classifier.to_result(record.content_hash, labels), canonical=False)
+            else:
+                remaining.append(record)
+        return remaining
+
+    def _compare_shadow(self, result):
+        prediction = self.predictions.pop(result['content_hash'], None)
+        if prediction is not None:
+            self.shadow.record(prediction[0], prediction[1], result)
+
+    def _defer(self, unit, error):
+        """暂时性失败：不计入失败次数（新闻保持待处理，下一轮重新读取），并暂停派发一段时间"""
+        self.stats["deferred"] += len(unit)
+        self.enqueued.difference_update(record.content_hash for record in unit)
+        self._forget(unit)
+        if self.paused_until <= time.monotonic():
+            print(f"LLM 服务暂时不可用，暂停派发 {config.LLM_OUTAGE_PAUSE_SECONDS} 秒: {error}")
+        self.paused_until = max(self.paused_until, time.monotonic() + config.LLM_OUTAGE_PAUSE_SECONDS)
+
+    def _forget(self, unit):
+        """丢弃未产出结果的新闻的签名与影子模式预测"""
+        for record in unit:
+            self.signatures.pop(record.content_hash, None)
+            self.predictions.pop(record.content_hash, None)
+
+    def _fail(self, unit, reason):
+        self._forget(unit)
+        self.stats["failed"] += len(unit)
+        self.failures.extend((record.content_hash, reason) for record in unit)
+
+    def _emit(self, result, canonical=True):
+        signature = self.signatures.pop(result['content_hash'], None)
+        if canonical and self.near_dup_index is not None:
+            self.near_dup_index.add(result['content_hash'], signature)
+        self.result_queue.put_nowait(result)
+
+    async def _writer(self):
+        pending = []
+        while True:
+            try:
+                item = await asyncio.wait_for(self.result_queue.get(), timeout=config.WRITE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _STOP:
+                break
+            if item is not None:
+                pending.append(item)
+            if pending and (item is None or len(pending) >= config.WRITE_BATCH_SIZE):
+                await self._flush(pending)
+                pending = []
+            elif item is None:
+                await self._flush_failures()
+
+        if pending:
+            await self._flush(pending)
+        await self._flush_failures()
+
+    async def _flush(self, results):
+        try:
+            counts = await asyncio.to_thread(save_structured_data, results)
+            self.stats["written"] += counts["written"]
+        except Exception as e:
+            print(f"写回结构化数据失败: {e}")
+        self.enqueued.difference_update(result['content_hash'] for result in results)
+        await self._flush_failures()
+
+    async def _flush_failures(self):
+        if not self.failures:
+            return
+        failures, self.failures = self.failures, []
+        try:
+            self.stats["dead_lettered"] += await asyncio.to_thread(record_failures, failures)
+        except Exception as e:
+            print(f"记录处理失败信息出错: {e}")
+        self.enqueued.difference_update(content_hash for content_hash, _ in failures)
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime
+from . import config
+
+def priority_boost(record):
+    """按标题与正文命中的高影响力关键词数计算优先级加成"""
+    text = f"{record.title or ''}{record.content or ''}"
+    return sum(1 for keyword in config.PRIORITY_KEYWORDS if keyword in text)
+
+class Lane:
+    """
+    调度队列中的一条通道
+    通道内按 (关键词加成, 新闻 id) 排序：加成高的先处理；同等加成下 LIFO 通道先处理最新的，FIFO 通道先处理最早的
+    """
+    def __init__(self, name, lifo, read_ahead):
+        self.name = name
+        self.lifo = lifo
+        # 限制本通道已读取但尚未处理完的工作单元数
+        self.slots = asyncio.Semaphore(read_ahead)
+        self._heap = []
+        self._counter = itertools.count()
+        self.inflight = 0
+        self.dispatched = 0
+        self.boosted = 0
+        self.waited = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, unit, holds_slot):
+        boost = max(priority_boost(record) for record in unit)
+        order = -max(r.id for r in unit) if self.lifo else min(r.id for r in unit)
+        heapq.heappush(self._heap, (-boost, order, next(self._counter), unit, holds_slot))
+
+    def pop(self):
+        neg_boost, _, _, unit, holds_slot = heapq.heappop(self._heap)
+        self.inflight += 1
+        self.dispatched += 1
+        self.boosted += neg_boost < 0
+        # 从入库到开始处理的等待时间，即该通道的新鲜度延迟
+        wait = unit_age(unit)
+        if wait is not None:
+            self.waited += 1
+            self.max_wait = max(self.max_wait, wait)
+            self.total_wait += wait
+        return unit, holds_slot
+
+    def oldest_age(self):
+        ages = [unit_age(item[3]) for item in self._heap]
+        ages = [age for age in ages if age is not None]
+        return round(max(ages), 1) if ages else None
+
+    def metrics(self):
+        return {
+            "depth": len(self._heap),
+            "inflight": self.inflight,
+            "oldest_age": self.oldest_age(),
+            "dispatched": self.dispatched,
+            "boosted": self.boosted,
+            "max_wait": round(self.max_wait, 1),
+            "avg_wait": round(self.total_wait / self.waited, 1) if self.waited else None,
+        }
+
+def unit_age(unit):
+    """工作单元中最早入库新闻距今的秒数，缺少入库时间时返回 None"""
+    times = [r.create_time for r in unit if isinstance(r.create_time, datetime)]
+    if not times:
+        return None
+    return (datetime.now() - min(times)).total_seconds()
+
+class LaneScheduler:
+    """
+    双通道调度器
+    - fresh 通道 (LIFO)：持续拉取的最新新闻，保证突发积压时新消息也能及时处理
+    - backlog 通道 (FIFO)：按 id 升序消化积压
+    fresh 通道在途数未达预留数时优先派发 fresh 通道，其余并发用于 backlog 通道；任一通道为空时另一通道可使用全部并发
+    预留数按当前并发上限 limit_fn()（启用 AIMD 时随控制器变化）的 fresh_share 计算，且至少为 backlog 通道留出一个名额
+    """
+    def __init__(self, limit_fn, fresh_share, backlog_read_ahead, fresh_read_ahead):
+        self.fresh = Lane("fresh", lifo=True, read_ahead=fresh_read_ahead)
+        self.backlog = Lane("backlog", lifo=False, read_ahead=backlog_read_ahead)
+        self.limit_fn = limit_fn
+        self.fresh_share = fresh_share
+        self._cond = asyncio.Condition()
+        self._unfinished = 0
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+
+    def reserved(self):
+        if self.fresh_share <= 0:
+            return 0
+        limit = self.limit_fn()
+        return min(max(1, round(limit * self.fresh_share)), limit - 1)
+
+    def _choose(self):
+        if len(self.fresh) and (self.fresh.inflight < self.reserved() or not len(self.backlog)):
+            return self.fresh
+        if len(self.backlog):
+            return self.backlog
+        return None
+
+    async def put(self, lane, unit, holds_slot):
+        async with self._cond:
+            lane.push(unit, holds_slot)
+            self._unfinished += 1
+            self._all_done.clear()
+            self._cond.notify()
+
+    async def get(self):
+        """取出下一个工作单元，返回 (通道, 工作单元, 是否占用读取名额)"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._choose() is not None)
+            lane = self._choose()
+            unit, holds_slot = lane.pop()
+            return lane, unit, holds_slot
+
+    async def task_done(self, lane):
+        async with self._cond:
+            lane.inflight -= 1
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._all_done.set()
+            # fresh 通道在途数变化会影响派发选择，唤醒所有等待者重新检查
+            self._cond.notify_all()
+
+    async def join(self):
+        await self._all_done.wait()
+
+    def metrics(self):
+        return {"fresh": self.fresh.metrics(), "backlog": self.backlog.metrics(), "fresh_reserved": self.reserved()}
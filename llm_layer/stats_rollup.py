@@ -0,0 +1,170 @@
+"""
+小时级情绪与影响力汇总表 news_stats_hourly 的增量维护与重建。
+汇总粒度为 小时 × 资产大类 × 行业板块 × 事件类型，仪表板和问答中的均值、计数类查询只需扫描汇总行。
+重建方式: python -m llm_layer.stats_rollup rebuild
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, bindparam
+from common.db_pool import get_engine
+from llm_layer import config
+
+# 维度列，缺失的维度以空字符串计入，保证唯一键可以命中
+DIMENSIONS = ['bucket_hour', 'asset_class', 'sector', 'event_type']
+
+# 可累加的指标列
+MEASURES = ['news_count', 'sentiment_count', 'sentiment_sum', 'sentiment_sumsq', 'impact_count', 'impact_sum',
+            'impact_sentiment_sum', 'impact_sentiment_weight', 'trend_up', 'trend_down', 'trend_flat']
+
+def news_hour(publish_date, publish_time, create_time):
+    """新闻归属的小时：优先使用发布时间，缺失时使用入库时间，与仪表板的时间筛选口径一致"""
+    moment = None
+    if publish_date is not None and publish_time is not None:
+        if isinstance(publish_date, str):
+            publish_date = date.fromisoformat(publish_date[:10])
+        # MySQL 的 TIME 列读出为 timedelta，SQLite 读出为字符串
+        if isinstance(publish_time, timedelta):
+            moment = datetime.combine(publish_date, datetime.min.time()) + publish_time
+        elif isinstance(publish_time, str):
+            moment = datetime.combine(publish_date, datetime.strptime(publish_time[:8], "%H:%M:%S").time())
+        else:
+            moment = datetime.combine(publish_date, publish_time)
+    elif create_time is not None:
+        moment = datetime.fromisoformat(create_time) if isinstance(create_time, str) else create_time
+    if moment is None:
+        return None
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def aggregate(rows, buckets=None):
+    """
+    将新闻行累加到汇总桶中，rows 需包含 publish_date, publish_time, create_time 以及结构化字段
+    返回 {(小时, 资产大类, 行业板块, 事件类型): {指标: 值}}
+    """
+    buckets = {} if buckets is None else buckets
+    for row in rows:
+        hour = news_hour(row['publish_date'], row['publish_time'], row['create_time'])
+        if hour is None:
+            continue
+        key = (hour, row['asset_class'] or '', row['sector'] or '', row['event_type'] or '')
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = dict.fromkeys(MEASURES, 0)
+
+        bucket['news_count'] += 1
+        sentiment, impact, trend = row['sentiment_score'], row['impact_weight'], row['trend_signal']
+        if sentiment is not None:
+            bucket['sentiment_count'] += 1
+            bucket['sentiment_sum'] += sentiment
+            bucket['sentiment_sumsq'] += sentiment * sentiment
+        if impact is not None:
+            bucket['impact_count'] += 1
+            bucket['impact_sum'] += impact
+            if sentiment is not None:
+                bucket['impact_sentiment_sum'] += impact * sentiment
+                bucket['impact_sentiment_weight'] += impact
+        if trend is not None:
+            if trend > 0:
+                bucket['trend_up'] += 1
+            elif trend < 0:
+                bucket['trend_down'] += 1
+            else:
+                bucket['trend_flat'] += 1
+    return buckets
+
+def upsert_stats(conn, buckets):
+    """在调用方的事务内将汇总桶累加到 news_stats_hourly"""
+    if not buckets:
+        return
+    table = config.STATS_TABLE_NAME
+    columns = DIMENSIONS + MEASURES + ['updated_at']
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + col for col in columns)})"
+    if conn.dialect.name == 'mysql':
+        assignments = ", ".join(f"{col} = {col} + VALUES({col})" for col in MEASURES)
+        statement = f"{insert} ON DUPLICATE KEY UPDATE {assignments}, updated_at = VALUES(updated_at)"
+    else:
+        assignments = ", ".join(f"{col} = {table}.{col} + excluded.{col}" for col in MEASURES)
+        statement = (f"{insert} ON CONFLICT ({', '.join(DIMENSIONS)}) "
+                     f"DO UPDATE SET {assignments}, updated_at = excluded.updated_at")
+
+    updated_at = datetime.now()
+    # 固定顺序写入，降低并发事务之间的死锁概率
+    conn.execute(text(statement), [
+        dict(zip(DIMENSIONS, key), **measures, updated_at=updated_at)
+        for key, measures in sorted(buckets.items())
+    ])
+
+def lock_unprocessed(conn, hashes):
+    """
+    在写回事务内读取并锁定即将被写回的新闻（尚未处理的行），返回其时间字段
+    MySQL 下使用 FOR UPDATE，保证随后带 processed_at IS NULL 条件的 UPDATE 恰好写入这些行，汇总不会重复累加
+    """
+    lock = " FOR UPDATE" if conn.dialect.name == 'mysql' else ""
+    rows = conn.execute(
+        text(f"""
+            SELECT content_hash, publish_date, publish_time, create_time FROM {config.TABLE_NAME}
+            WHERE content_hash IN :hashes AND processed_at IS NULL{lock}
+        """).bindparams(bindparam('hashes', expanding=True)),
+        {"hashes": list(hashes)}
+    ).fetchall()
+    return {row.content_hash: row for row in rows}
+
+def apply_written(conn, locked, records):
+    """写回完成后，将本次写入的新闻累加到汇总表；records 为规整后的结构化结果"""
+    rows = []
+    for record in records:
+        news = locked.get(record['content_hash'])
+        if news is None:
+            continue
+        rows.append({**record, 'publish_date': news.publish_date, 'publish_time': news.publish_time,
+                     'create_time': news.create_time})
+    upsert_stats(conn, aggregate(rows))
+
+def rebuild_stats(chunk_size=5000):
+    """
+    按 id 分页扫描全部已处理新闻，重新计算整张汇总表并在一个事务内替换
+    重建期间写回的新闻可能被漏计或重复计入，建议在 LLM 层暂停时执行
+    """
+    engine = get_engine(config.get_db_url())
+    started = time.time()
+    buckets = {}
+    last_id, scanned = 0, 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT id, publish_date, publish_time, create_time, asset_class, sector, event_type,
+                       sentiment_score, impact_weight, trend_signal
+                FROM {config.TABLE_NAME}
+                WHERE id > :last_id AND processed_at IS NOT NULL
+                ORDER BY id LIMIT :limit
+            """), {"last_id": last_id, "limit": chunk_size}).mappings().fetchall()
+        if not rows:
+            break
+        aggregate(rows, buckets)
+        last_id = rows[-1]['id']
+        scanned += len(rows)
+        print(f"已扫描 {scanned} 条已处理新闻，汇总桶 {len(buckets)} 个")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {config.STATS_TABLE_NAME}"))
+        upsert_stats(conn, buckets)
+    print(f"汇总表 {config.STATS_TABLE_NAME} 重建完成：{scanned} 条新闻，{len(buckets)} 个汇总桶，耗时 {time.time() - started:.1f} 秒")
+
+def main():
+    parser = argparse.ArgumentParser(description="维护小时级情绪与影响力汇总表")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="由 all_news 全量重建汇总表")
+    rebuild_parser.add_argument("--chunk-size", type=int, default=5000, help="每次读取的新闻条数")
+
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        rebuild_stats(args.chunk_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+历史分类总结回填：按时间范围和窗口大小切分窗口，只为 news_summary 中缺失的 (资产大类, 窗口) 生成总结。
+每个窗口的总结在一个事务内写入，中断后重新运行同一命令即可从缺失处继续。
+运行方式: python -m llm_layer.summary_backfill --start 2026-10-01 --end 2026-10-15 --window-hours 24
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from sqlalchemy import text
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.db_pool import get_engine
+from common.llm_cache import format_cache_stats
+from llm_layer import config
+from llm_layer.models.llm_client import get_llm_client
+from llm_layer.summary_main import parse_datetime, summarize_window
+from llm_layer.summary_rollup import as_datetime
+
+def enumerate_windows(start_time, end_time, window_hours):
+    """将 [start_time, end_time) 按窗口大小切分，最后一个不足整窗的窗口截断到 end_time"""
+    size = timedelta(hours=window_hours)
+    windows = []
+    window_start = start_time
+    while window_start < end_time:
+        windows.append((window_start, min(window_start + size, end_time)))
+        window_start += size
+    return windows
+
+def find_missing(windows, asset_classes):
+    """返回 [(窗口开始, 窗口结束, 缺失总结的资产大类列表)]，只包含至少缺失一个大类的窗口"""
+    engine = get_engine(config.get_db_url())
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT asset_class, window_start, window_end FROM news_summary
+            WHERE window_start >= :start AND window_start < :end
+        """), {"start": windows[0][0], "end": windows[-1][1]}).fetchall()
+    existing = {(row.asset_class, as_datetime(row.window_start), as_datetime(row.window_end)) for row in rows}
+
+    missing = []
+    for window_start, window_end in windows:
+        assets = [asset for asset in asset_classes if (asset, window_start, window_end) not in existing]
+        if assets:
+            missing.append((window_start, window_end, assets))
+    return missing
+
+def run_backfill(start_time, end_time, window_hours, asset_classes, parallel, force, dry_run):
+    windows = enumerate_windows(start_time, end_time, window_hours)
+    if not windows:
+        print("时间范围为空，无需回填。")
+        return
+
+    if force:
+        todo = [(window_start, window_end, list(asset_classes)) for window_start, window_end in windows]
+    else:
+        todo = find_missing(windows, asset_classes)
+    pairs = sum(len(assets) for _, _, assets in todo)
+    print(f"回填范围 {start_time} 至 {end_time}，窗口 {window_hours} 小时，共 {len(windows)} 个窗口；"
+          f"需要处理 {len(todo)} 个窗口、{pairs} 个 (资产大类, 窗口) 组合")
+    if dry_run or not todo:
+        for window_start, window_end, assets in todo:
+            print(f"  {window_start} ~ {window_end}: {', '.join(assets)}")
+        return
+
+    client = get_llm_client(config)
+    lock = threading.Lock()
+    progress = {"done": 0, "saved": 0, "failed": 0}
+    started = time.time()
+
+    def process(window_start, window_end, assets):
+        rows, failed = summarize_window(client, window_start, window_end, asset_classes=assets, replace=force, verbose=False)
+        with lock:
+            progress["done"] += 1
+            progress["saved"] += len(rows)
+            # 生成失败的大类未入库，重新运行时仍会被识别为缺失
+            progress["failed"] += bool(failed)
+            elapsed = time.time() - started
+            eta = elapsed / progress["done"] * (len(todo) - progress["done"])
+            # 窗口内没有新闻的大类不会生成总结
+            failed_note = f"，失败: {', '.join(failed)}" if failed else ""
+            print(f"[{progress['done']}/{len(todo)}] {window_start} ~ {window_end}: 保存 {len(rows)}/{len(assets)} 条总结{failed_note}，"
+                  f"已用 {elapsed:.0f} 秒，预计剩余 {eta:.0f} 秒")
+
+    # 每个窗口内部按 SUMMARY_CONCURRENCY 并发调用 LLM，同时在途的 LLM 请求最多为 parallel × SUMMARY_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {executor.submit(process, *item): item for item in todo}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                window_start, window_end, _ = futures[future]
+                with lock:
+                    progress["failed"] += 1
+                print(f"窗口 {window_start} ~ {window_end} 回填失败: {e}")
+
+    print(f"回填完成：处理 {len(todo)} 个窗口，保存 {progress['saved']} 条总结，失败 {progress['failed']} 个窗口，"
+          f"耗时 {time.time() - started:.1f} 秒")
+    if progress["failed"]:
+        print("重新运行同一命令即可只补齐失败的窗口。")
+    print(f"LLM 响应缓存: {format_cache_stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="回填历史分类总结")
+    parser.add_argument("--start", required=True, help="开始时间，YYYY-MM-DD 或 \"YYYY-MM-DD HH:MM:SS\"")
+    parser.add_argument("--end", required=True, help="结束时间（不含），格式同 --start")
+    parser.add_argument("--window-hours", type=int, default=config.SUMMARY_DEFAULT_WINDOW_HOURS, help="每个总结窗口的小时数")
+    parser.add_argument("--asset-class", action="append", choices=config.ASSET_CLASSES,
+                        help="只回填指定资产大类，可重复指定；默认全部")
+    parser.add_argument("--parallel", type=int, default=2, help="同时处理的窗口数")
+    parser.add_argument("--force", action="store_true", help="重新生成并替换已有总结（如更新提示词后）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要回填的窗口，不调用 LLM")
+    args = parser.parse_args()
+
+    run_backfill(parse_datetime(args.start), parse_datetime(args.end), args.window_hours,
+                 args.asset_class or config.ASSET_CLASSES, args.parallel, args.force, args.dry_run)
+
+if __name__ == "__main__":
+    main()
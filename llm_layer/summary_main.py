@@ -3,75 +3,145 @@ import os
 import sys
 from datetime import datetime, timedelta
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 # 添加根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from common.db_pool import get_engine
+from common.llm_cache import format_cache_stats
 from llm_layer import config
 from llm_layer.models.llm_client import get_llm_client
-from llm_layer.summary_processor import generate_asset_summary
+from llm_layer.summary_processor import generate_asset_summary, run_concurrently
+from llm_layer.summary_rollup import floor_to_bucket, summarize_by_rollup
+from llm_layer.summary_selector import select_news
+
+def parse_datetime(value):
+    """解析 "YYYY-MM-DD HH:MM:SS" 或 "YYYY-MM-DD" 格式的时间"""
+    value = value.strip()
+    fmt = "%Y-%m-%d %H:%M:%S" if " " in value else "%Y-%m-%d"
+    return datetime.strptime(value, fmt)
 
 def get_time_window():
     """计算总结的时间窗口"""
     if config.SUMMARY_CUSTOM_WINDOW:
         start_str, end_str = config.SUMMARY_CUSTOM_WINDOW
-        return datetime.strptime(start_str, "%Y-%m-%d %H:%M:%S"), datetime.strptime(end_str, "%Y-%m-%d %H:%M:%S")
+        return parse_datetime(start_str), parse_datetime(end_str)
     
     end_time = datetime.now()
     start_time = end_time - timedelta(hours=config.SUMMARY_DEFAULT_WINDOW_HOURS)
     return start_time, end_time
 
-def save_summary(asset_class, summary_text, window_start, window_end, news_count):
-    """保存总结到 news_summary 表"""
-    engine = create_engine(config.get_db_url())
+def fetch_window_news(engine, start_time, end_time):
+    """
+    一次查询读取时间窗口 [start_time, end_time) 内的全部新闻，并在内存中按资产大类分组
+    窗口不含结束时刻，恰好落在相邻窗口边界上的新闻只归入后一个窗口
+    """
+    query = text(f"""
+        SELECT asset_class, content_hash, title, content, create_time,
+               subject, impact_weight, sentiment_score, duplicate_of
+        FROM {config.TABLE_NAME}
+        WHERE create_time >= :start
+        AND create_time < :end
+        AND asset_class IS NOT NULL
+        ORDER BY id
+    """)
     with engine.connect() as conn:
-        stmt = text("""
-            INSERT INTO news_summary (asset_class, summary_text, window_start, window_end, news_count, created_at)
-            VALUES (:asset_class, :summary_text, :window_start, :window_end, :news_count, :created_at)
-        """)
-        conn.execute(stmt, {
+        news_df = pd.read_sql(query, conn, params={"start": start_time, "end": end_time})
+    # SQLite 的文本查询返回字符串，统一转换为时间类型
+    news_df['create_time'] = pd.to_datetime(news_df['create_time'])
+
+    groups = {asset: [] for asset in config.ASSET_CLASSES}
+    for row in news_df.to_dict('records'):
+        if row['asset_class'] in groups:
+            groups[row['asset_class']].append({
+                "content_hash": row['content_hash'],
+                "title": row['title'],
+                "content": row['content'],
+                "create_time": row['create_time'].to_pydatetime(),
+                "subject": row['subject'],
+                "impact_weight": row['impact_weight'],
+                "sentiment_score": row['sentiment_score'],
+                "duplicate_of": row['duplicate_of'],
+            })
+    return groups
+
+def save_summaries(summaries, window_start, window_end, replace=False):
+    """
+    在一个事务内将一个窗口的全部总结写入 news_summary 表，summaries 为 [(资产大类, 总结正文, 参与筛选的新闻数, 写入提示词的新闻数)]
+    replace 为 True 时先删除这些资产大类在同一窗口的旧总结（回填重新生成时使用）
+    """
+    if not summaries:
+        return
+    engine = get_engine(config.get_db_url())
+    created_at = datetime.now()
+    with engine.begin() as conn:
+        if replace:
+            conn.execute(text("""
+                DELETE FROM news_summary
+                WHERE asset_class = :asset_class AND window_start = :window_start AND window_end = :window_end
+            """), [{"asset_class": row[0], "window_start": window_start, "window_end": window_end} for row in summaries])
+        conn.execute(text("""
+            INSERT INTO news_summary (asset_class, summary_text, window_start, window_end, news_count, news_included, created_at)
+            VALUES (:asset_class, :summary_text, :window_start, :window_end, :news_count, :news_included, :created_at)
+        """), [{
             "asset_class": asset_class,
             "summary_text": summary_text,
             "window_start": window_start,
             "window_end": window_end,
             "news_count": news_count,
-            "created_at": datetime.now()
-        })
-        conn.commit()
+            "news_included": news_included,
+            "created_at": created_at
+        } for asset_class, summary_text, news_count, news_included in summaries])
+
+def summarize_window(client, start_time, end_time, asset_classes=None, replace=False, verbose=True):
+    """
+    为一个时间窗口生成并保存分类总结：一次读取窗口内新闻，各资产大类并发生成总结，最后在一个事务内入库
+    asset_classes 为空时处理全部资产大类
+    返回 (保存的 [(资产大类, 总结正文, 参与筛选的新闻数, 写入提示词的新闻数)], 有新闻但生成失败、未保存的资产大类列表)
+    """
+    engine = get_engine(config.get_db_url())
+    groups = fetch_window_news(engine, start_time, end_time)
+
+    pending = {}
+    for asset in asset_classes or config.ASSET_CLASSES:
+        if groups.get(asset):
+            pending[asset] = groups[asset]
+        elif verbose:
+            print(f"[ {asset} ] 暂无新闻数据，跳过内容生成。")
+
+    if config.SUMMARY_ROLLUP_ENABLED:
+        summaries, included = summarize_by_rollup(client, pending, start_time, end_time)
+    else:
+        selected = {asset: select_news(news_list, reference_time=end_time) for asset, news_list in pending.items()}
+        included = {asset: len(news_list) for asset, news_list in selected.items()}
+        tasks = {asset: (generate_asset_summary, (client, asset, news_list)) for asset, news_list in selected.items()}
+        summaries = run_concurrently(tasks, config.SUMMARY_CONCURRENCY)
+
+    # 按资产大类的固定顺序入库；生成失败的不入库，窗口保持缺失，下轮或回填时重试
+    rows = [(asset, summaries[asset], len(pending[asset]), included[asset])
+            for asset in config.ASSET_CLASSES if summaries.get(asset)]
+    failed = [asset for asset in pending if not summaries.get(asset)]
+    if verbose:
+        for asset, _, news_count, news_included in rows:
+            print(f"[ {asset} ] 总结生成完成 (共 {news_count} 条新闻，选入 {news_included} 条)。")
+        for asset in failed:
+            print(f"[ {asset} ] 总结生成失败，本轮不保存。")
+    save_summaries(rows, start_time, end_time, replace=replace)
+    return rows, failed
 
 def run_summary_task(client):
-    """执行完整的总结任务"""
+    """执行一轮定时总结任务"""
     start_time, end_time = get_time_window()
+    if config.SUMMARY_ROLLUP_ENABLED:
+        # 窗口起点对齐到分段边界，使首个分段与之前轮次缓存的分段一致
+        start_time = floor_to_bucket(start_time)
     print(f"[{datetime.now()}] 开始生成分类总结记录，窗口: {start_time} 至 {end_time}")
-    
-    engine = create_engine(config.get_db_url())
-    
-    for asset in config.ASSET_CLASSES:
-        print(f"正在处理 [ {asset} ] 类别...")
-        
-        # 查询属于该类别且在时间窗口内的新闻
-        query = text(f"""
-            SELECT title, content FROM {config.TABLE_NAME}
-            WHERE asset_class = :asset 
-            AND create_time >= :start 
-            AND create_time <= :end
-        """)
-        
-        with engine.connect() as conn:
-            news_df = pd.read_sql(query, conn, params={"asset": asset, "start": start_time, "end": end_time})
-        
-        if news_df.empty:
-            print(f"  - 暂无新闻数据，跳过内容生成。")
-            continue
-            
-        # 调用 LLM 生成总结
-        news_list = news_df.to_dict('records')
-        summary = generate_asset_summary(client, asset, news_list)
-        
-        # 入库
-        save_summary(asset, summary, start_time, end_time, len(news_list))
-        print(f"  - 总结生成并保存成功 (基于 {len(news_list)} 条新闻)。")
+    started = time.time()
+
+    rows, failed = summarize_window(client, start_time, end_time)
+    print(f"本轮共保存 {len(rows)} 条分类总结，失败 {len(failed)} 条，耗时 {time.time() - started:.1f} 秒")
+    print(f"LLM 响应缓存: {format_cache_stats()}")
 
 def main():
     print("=== 资产分类总结模块 (Summary Layer) 启动 ===")
@@ -1,5 +1,9 @@
 import json
-from .models.llm_client import BaseLLMClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from common.llm_cache import get_llm_cache, LLMResponseCache, text_digest
+from .models.llm_client import BaseLLMClient, TransientLLMError
+
+SUMMARY_SYSTEM_PROMPT = "你是一个金融分析助手。"
 
 SUMMARY_PROMPT_TEMPLATE = """
 # 角色
@@ -23,26 +27,121 @@ SUMMARY_PROMPT_TEMPLATE = """
 {news_content}
 """
 
+SUMMARY_PARTIAL_PROMPT_TEMPLATE = """
+# 角色
+你是一个资深的宏观经济与金融策略分析师。
+
+# 任务
+请提炼 {bucket_start} 至 {bucket_end} 这一时段内与“{asset_class}”相关的新闻要点，作为后续汇总的素材。
+
+# 约束项
+- 只列出影响最显著的 1-3 个事件，每个事件注明对该资产类别的影响方向（利多、利空、中性）。
+- 保留关键数字（涨跌幅、利率、数据值等），不要虚构不存在的事实。
+- 总字数控制在 100 字以内。
+
+# 该时段的新闻标题与摘要如下：
+{news_content}
+"""
+
+SUMMARY_ROLLUP_PROMPT_TEMPLATE = """
+# 角色
+你是一个资深的宏观经济与金融策略分析师。
+
+# 任务
+下面是按时间顺序排列的“{asset_class}”相关新闻分段要点，请据此撰写一份覆盖整个时间段的精炼市场综述分析。
+
+# 包含内容
+1. **核心趋势总结**：一句话概括这段时间内该资产类别的整体表现或核心驱动力。
+2. **关键驱动事件**：列举 2-3 个影响该资产类别最显著的新闻事件，并说明逻辑。
+3. **市场情绪评价**：综合判断目前该类别的市场情绪（看多、看空、观望），较新的时段权重更高。
+
+# 约束项
+- 必须基于提供的分段要点进行总结，不要虚构不存在的事实。
+- 语言风格要求专业、客观、言简意赅。
+- 总字数控制在 200-300 字以内。
+
+# 分段要点如下：
+{partial_content}
+"""
+
 def generate_asset_summary(llm_client: BaseLLMClient, asset_class, news_list):
     """
-    为特定资产大类生成总结
-    news_list: 包含 title 和 content 的字典列表
+    为特定资产大类生成总结，失败时返回 None（不入库，该窗口保持缺失以便下轮或回填重试）
+    news_list: 包含 title 和 content 的字典列表，调用方应先经 summary_selector.select_news 控制在 token 预算内
     """
     if not news_list:
         return "该时间段内暂无相关新闻记录。"
 
-    # 构造新闻文本块
-    formatted_news = ""
-    for i, news in enumerate(news_list):
-        formatted_news += f"{i+1}. 标题：{news['title']}\n   内容：{news['content'][:150]}...\n\n"
-
     # 构造 Prompt
     prompt = SUMMARY_PROMPT_TEMPLATE.format(
         asset_class=asset_class,
-        news_content=formatted_news
+        news_content=format_news_list(news_list)
     )
 
-    # 调用 LLM
-    response = llm_client.chat("你是一个金融分析助手。", prompt)
-    
-    return response if response else "生成总结失败。"
+    return _cached_chat(llm_client, prompt)
+
+def _cached_chat(llm_client, prompt):
+    """调用 LLM 生成总结，相同的提示词直接复用已生成的结果；失败时返回 None"""
+    cache = get_llm_cache()
+    cache_key = LLMResponseCache.make_key("summary", SUMMARY_SYSTEM_PROMPT, getattr(llm_client, 'model', ''), text_digest(prompt))
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        return cached
+
+    try:
+        response = llm_client.chat(SUMMARY_SYSTEM_PROMPT, prompt)
+    except TransientLLMError:
+        return None
+    if response and cache:
+        cache.set(cache_key, response)
+    return response
+
+def format_news_item(index, news):
+    return f"{index}. 标题：{news['title']}\n   内容：{(news['content'] or '')[:150]}...\n\n"
+
+def format_news_list(news_list):
+    return "".join(format_news_item(i + 1, news) for i, news in enumerate(news_list))
+
+def generate_partial_summary(llm_client: BaseLLMClient, asset_class, bucket_start, bucket_end, news_list):
+    """为单个时间分段生成分段总结，失败时返回 None（不缓存，下轮重试）"""
+    prompt = SUMMARY_PARTIAL_PROMPT_TEMPLATE.format(
+        asset_class=asset_class,
+        bucket_start=bucket_start.strftime("%Y-%m-%d %H:%M"),
+        bucket_end=bucket_end.strftime("%Y-%m-%d %H:%M"),
+        news_content=format_news_list(news_list)
+    )
+    return _cached_chat(llm_client, prompt)
+
+def generate_rollup_summary(llm_client: BaseLLMClient, asset_class, partials):
+    """
+    由按时间顺序排列的分段总结汇总出窗口总结，失败时返回 None（不入库，下轮或回填重试）
+    partials: (分段开始时间, 分段结束时间, 分段总结, 新闻数) 列表
+    """
+    if not partials:
+        return "该时间段内暂无相关新闻记录。"
+
+    formatted = ""
+    for bucket_start, bucket_end, summary_text, news_count in partials:
+        formatted += (f"【{bucket_start.strftime('%Y-%m-%d %H:%M')} - {bucket_end.strftime('%H:%M')}，"
+                      f"{news_count} 条新闻】\n{summary_text}\n\n")
+
+    prompt = SUMMARY_ROLLUP_PROMPT_TEMPLATE.format(asset_class=asset_class, partial_content=formatted)
+    return _cached_chat(llm_client, prompt)
+
+def run_concurrently(tasks, concurrency):
+    """
+    以有限并发执行一组总结任务，tasks 为 {任务键: (函数, 参数元组)}，返回 {任务键: 结果}
+    同步客户端基于 httpx，可在多个线程间共享；限流器与缓存均为线程安全。单个任务出错只打印并跳过
+    """
+    results = {}
+    if not tasks:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(tasks)))) as executor:
+        futures = {executor.submit(fn, *args): key for key, (fn, args) in tasks.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                print(f"总结任务 {key} 出错: {e}")
+    return results
@@ -0,0 +1,126 @@
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from common.db_pool import get_engine
+from . import config
+from .summary_processor import (SUMMARY_PARTIAL_PROMPT_TEMPLATE, generate_partial_summary, generate_rollup_summary,
+                                run_concurrently)
+from .summary_selector import select_news
+
+# 分段边界的对齐基准，保证不同轮次、不同日期切出的分段一致
+_BUCKET_EPOCH = datetime(2000, 1, 1)
+
+def bucket_size():
+    return timedelta(minutes=config.SUMMARY_BUCKET_MINUTES)
+
+def floor_to_bucket(moment):
+    """将时间向前对齐到所在分段的开始时间"""
+    size = bucket_size()
+    return _BUCKET_EPOCH + ((moment - _BUCKET_EPOCH) // size) * size
+
+def as_datetime(value):
+    # SQLite 的文本查询返回字符串，MySQL 返回 datetime
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def fingerprint(news_list):
+    """分段内新闻集合的指纹：新闻新增、删除、改变分类或修改分段提示词都会导致指纹变化"""
+    digest = hashlib.sha256(SUMMARY_PARTIAL_PROMPT_TEMPLATE.encode('utf-8'))
+    for content_hash in sorted(news['content_hash'] or '' for news in news_list):
+        digest.update(content_hash.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def load_partials(engine, window_start, window_end):
+    """读取窗口内已缓存的分段总结，返回 {(资产大类, 分段开始时间): (指纹, 分段总结, 写入提示词的新闻数)}"""
+    query = text(f"""
+        SELECT asset_class, bucket_start, fingerprint, summary_text, news_included FROM {config.SUMMARY_PARTIAL_TABLE}
+        WHERE bucket_start >= :start AND bucket_start < :end
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"start": window_start, "end": window_end}).fetchall()
+    return {(row.asset_class, as_datetime(row.bucket_start)): (row.fingerprint, row.summary_text, row.news_included or 0)
+            for row in rows}
+
+def save_partials(engine, rows):
+    """在一个事务内替换变化分段的缓存，rows 为 news_summary_partial 的行字典列表"""
+    if not rows:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            DELETE FROM {config.SUMMARY_PARTIAL_TABLE}
+            WHERE asset_class = :asset_class AND bucket_start = :bucket_start
+        """), [{"asset_class": r["asset_class"], "bucket_start": r["bucket_start"]} for r in rows])
+        conn.execute(text(f"""
+            INSERT INTO {config.SUMMARY_PARTIAL_TABLE}
+                (asset_class, bucket_start, bucket_end, fingerprint, news_count, news_included, summary_text, created_at)
+            VALUES (:asset_class, :bucket_start, :bucket_end, :fingerprint, :news_count, :news_included, :summary_text, :created_at)
+        """), rows)
+
+def summarize_by_rollup(client, groups, window_start, window_end):
+    """
+    分段汇总生成窗口总结
+    1. map：窗口内新闻按资产大类和时间分段切分，指纹与缓存一致的分段直接复用，其余分段经 token 预算筛选后并发生成分段总结并缓存
+    2. reduce：每个资产大类由按时间排列的分段总结汇总出窗口总结
+    groups 为 {资产大类: 新闻列表}，新闻字段同 summary_main.fetch_window_news
+    返回 ({资产大类: 窗口总结，汇总失败时为 None}, {资产大类: 写入各分段提示词的新闻总数})
+    有分段总结生成失败的资产大类本轮不生成窗口总结（否则保存的新闻数会包含未写入总结的分段），留待下一轮或回填重试
+    """
+    size = bucket_size()
+    buckets = {}
+    for asset, news_list in groups.items():
+        for news in news_list:
+            buckets.setdefault((asset, floor_to_bucket(news['create_time'])), []).append(news)
+
+    engine = get_engine(config.get_db_url())
+    cached = load_partials(engine, window_start, window_end)
+
+    partials = {}
+    included = {}
+    fingerprints = {}
+    tasks = {}
+    for key, news_list in buckets.items():
+        # 指纹覆盖分段内的全部新闻，而不只是入选的新闻，迟到的新闻总能使分段失效
+        fingerprints[key] = fingerprint(news_list)
+        hit = cached.get(key)
+        if hit and hit[0] == fingerprints[key]:
+            partials[key], included[key] = hit[1], hit[2]
+        else:
+            asset, bucket_start = key
+            selected = select_news(news_list, reference_time=bucket_start + size)
+            included[key] = len(selected)
+            tasks[key] = (generate_partial_summary, (client, asset, bucket_start, bucket_start + size, selected))
+    print(f"分段总结: 共 {len(buckets)} 个分段，复用缓存 {len(partials)} 个，需要生成 {len(tasks)} 个")
+
+    created_at = datetime.now()
+    new_rows = []
+    for key, summary_text in run_concurrently(tasks, config.SUMMARY_CONCURRENCY).items():
+        # 生成失败的分段不写缓存，下一轮重试
+        if not summary_text:
+            continue
+        partials[key] = summary_text
+        asset, bucket_start = key
+        new_rows.append({
+            "asset_class": asset,
+            "bucket_start": bucket_start,
+            "bucket_end": bucket_start + size,
+            "fingerprint": fingerprints[key],
+            "news_count": len(buckets[key]),
+            "news_included": included[key],
+            "summary_text": summary_text,
+            "created_at": created_at,
+        })
+    save_partials(engine, new_rows)
+
+    reduce_tasks = {}
+    included_by_asset = {}
+    for asset in groups:
+        keys = sorted(key for key in buckets if key[0] == asset)
+        missing = [key for key in keys if key not in partials]
+        if missing:
+            print(f"[ {asset} ] {len(missing)}/{len(keys)} 个分段总结生成失败，本轮跳过该资产大类的窗口总结。")
+            continue
+        if keys:
+            items = [(key[1], key[1] + size, partials[key], len(buckets[key])) for key in keys]
+            reduce_tasks[asset] = (generate_rollup_summary, (client, asset, items))
+            included_by_asset[asset] = sum(included[key] for key in keys)
+    return run_concurrently(reduce_tasks, config.SUMMARY_CONCURRENCY), included_by_asset
@@ -0,0 +1,78 @@
+import heapq
+from collections import Counter
+from datetime import datetime
+from . import config
+from .models.rate_limiter import estimate_tokens
+from .near_dup import NearDuplicateIndex, news_text
+from .summary_processor import format_news_item
+
+# 基础得分中各因素的权重
+IMPACT_WEIGHT = 0.5
+SENTIMENT_WEIGHT = 0.3
+RECENCY_WEIGHT = 0.2
+
+# 本地分类器标注 (label_source='local') 的新闻没有影响权重与情绪分，影响权重按中性值计
+NEUTRAL_IMPACT = 3
+
+def _missing(value):
+    # pandas 读出的空值为 NaN/None
+    return value is None or value != value
+
+def news_score(news, reference_time):
+    """
+    新闻的基础得分，取值 0-1
+    影响权重 (1-5) 与情绪强度 |sentiment_score| 越高、距参考时间越近，得分越高；缺失的影响权重按中性值、情绪强度按 0 计
+    """
+    weight, score = news.get('impact_weight'), news.get('sentiment_score')
+    impact = (NEUTRAL_IMPACT if _missing(weight) else min(5, max(1, weight))) / 5
+    sentiment = 0.0 if _missing(score) else min(1.0, abs(score))
+    age_hours = max(0.0, (reference_time - news['create_time']).total_seconds() / 3600)
+    recency = 0.5 ** (age_hours / config.SUMMARY_RECENCY_HALF_LIFE_HOURS)
+    return IMPACT_WEIGHT * impact + SENTIMENT_WEIGHT * sentiment + RECENCY_WEIGHT * recency
+
+def select_news(news_list, token_budget=None, reference_time=None):
+    """
+    在 token 预算内挑选最值得写入总结提示词的新闻
+    - 已标记为近似重复 (duplicate_of) 的新闻直接跳过，候选之间的近似重复只保留得分最高的一条
+    - 按基础得分贪心选取，同一主体 (subject) 每多入选一条，其余同主体新闻得分乘以 SUMMARY_SUBJECT_DECAY，避免单一主体挤占篇幅
+    - 单条新闻按提示词中的实际格式估算 token，超出剩余预算的跳过
+    返回按入库时间排序的入选新闻列表
+    """
+    token_budget = token_budget or config.SUMMARY_TOKEN_BUDGET
+    reference_time = reference_time or datetime.now()
+
+    heap = []
+    for i, news in enumerate(news_list):
+        if not _missing(news.get('duplicate_of')):
+            continue
+        heapq.heappush(heap, (-news_score(news, reference_time), 0, i))
+
+    dedup = NearDuplicateIndex(threshold=config.NEAR_DUP_THRESHOLD, window_seconds=float('inf'),
+                               max_items=len(news_list) + 1)
+    subject_counts = Counter()
+    selected = []
+    remaining = token_budget
+    while heap and remaining > 0:
+        neg_score, penalized, i = heapq.heappop(heap)
+        news = news_list[i]
+        subject = None if _missing(news.get('subject')) else news['subject']
+        # 惰性更新：同主体已入选条数变化后重新计算得分再放回堆中
+        if subject and penalized != subject_counts[subject]:
+            score = news_score(news, reference_time) * config.SUMMARY_SUBJECT_DECAY ** subject_counts[subject]
+            heapq.heappush(heap, (-score, subject_counts[subject], i))
+            continue
+
+        tokens = estimate_tokens(format_news_item(len(selected) + 1, news))
+        if tokens > remaining:
+            continue
+        signature = dedup.signature(news_text(news['title'], news['content']))
+        if dedup.find(signature):
+            continue
+        dedup.add(news['content_hash'] or str(i), signature)
+
+        selected.append(news)
+        remaining -= tokens
+        if subject:
+            subject_counts[subject] += 1
+
+    return sorted(selected, key=lambda news: news['create_time'])
@@ -0,0 +1,132 @@
+"""
+多实例租约认领测试：在本地 SQLite 上用桩 LLM 启动多个处理实例，验证每条新闻恰好被处理一次，
+崩溃实例认领的新闻在租约到期后被其他实例接手，且排队时间超过租约时长的新闻因续租不会被其他实例重复认领。
+运行方式: python -m llm_layer.test_lease
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# 添加根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "lease_test.sqlite3")
+os.environ["DB_URL"] = f"sqlite:///{DB_PATH}?timeout=30"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+LEASE_SECONDS = 2
+os.environ["LEASE_SECONDS"] = str(LEASE_SECONDS)
+
+from sqlalchemy import text
+from common.db_pool import get_engine
+from llm_layer.config import get_db_url, TABLE_NAME
+from llm_layer.lease import claim_news, claim_newest_news, iter_claimed_news, renew_leases
+from llm_layer.pipeline import LLMPipeline
+
+NEWS_COUNT = 300
+WORKER_COUNT = 4
+
+calls = Counter()
+calls_lock = threading.Lock()
+
+class StubLLMClient:
+    """桩 LLM：记录每条新闻被调用的次数，随机延迟后返回固定结构化结果；延迟使预读的队列排空时间超过租约时长"""
+    model = "stub"
+
+    async def chat(self, system_prompt, user_input):
+        content_hash = re.search(r"content_hash：(\w+)", user_input).group(1)
+        with calls_lock:
+            calls[content_hash] += 1
+        await asyncio.sleep(random.uniform(0.05, 0.15))
+        return '{"asset_class": "股票", "sector": "金融", "sentiment_score": 0.1, "impact_weight": 2, "trend_signal": 0}'
+
+def setup_db():
+    engine = get_engine(get_db_url())
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE_NAME} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash VARCHAR(64) UNIQUE,
+                title VARCHAR(255), content TEXT, publish_date DATE, publish_time TIME, create_time DATETIME,
+                source VARCHAR(100), region VARCHAR(50), subject VARCHAR(100), asset_class VARCHAR(50),
+                sector VARCHAR(100), sentiment_score FLOAT, impact_weight INT, trend_signal INT,
+                event_type VARCHAR(100), driver_factor TEXT, key_metrics TEXT, processed_at DATETIME,
+                duplicate_of VARCHAR(64), label_source VARCHAR(20), attempt_count INT, last_error VARCHAR(255),
+                next_attempt_at DATETIME, dead_lettered_at DATETIME, lease_owner VARCHAR(100), lease_expires_at DATETIME
+            )
+        """))
+        conn.execute(
+            text(f"INSERT INTO {TABLE_NAME} (content_hash, title, content) VALUES (:h, :t, :c)"),
+            [{"h": f"hash{i:05d}", "t": f"测试新闻 {i}", "c": f"第 {i} 条测试新闻正文"} for i in range(NEWS_COUNT)]
+        )
+
+def count_unprocessed():
+    with get_engine(get_db_url()).connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE processed_at IS NULL")).scalar()
+
+def run_worker(worker_id, processed_by):
+    async def loop():
+        client = StubLLMClient()
+        while True:
+            pipeline = LLMPipeline(client, 4)
+            # 同时启用 fresh 通道，验证两个通道并行认领时也不会重复处理
+            stats = await pipeline.run(iter_claimed_news(worker_id, page_size=10, lease_seconds=LEASE_SECONDS),
+                                       lambda after_id: claim_newest_news(after_id, worker_id, 5, LEASE_SECONDS),
+                                       lambda hashes: renew_leases(hashes, worker_id, LEASE_SECONDS))
+            processed_by[worker_id] += stats["written"]
+            if stats["read"] == 0:
+                if count_unprocessed() == 0:
+                    return
+                # 剩余新闻被其他实例认领中（或等待崩溃实例的租约到期）
+                await asyncio.sleep(0.5)
+    asyncio.run(loop())
+
+def main():
+    setup_db()
+
+    # 模拟一个认领后崩溃的实例：认领 20 条但不处理，也不释放租约
+    crashed, _ = claim_news("crashed-worker", 20, LEASE_SECONDS)
+    crashed_hashes = {r.content_hash for r in crashed}
+    print(f"崩溃实例认领了 {len(crashed)} 条新闻，租约 {LEASE_SECONDS} 秒")
+
+    processed_by = Counter()
+    started = time.time()
+    threads = [threading.Thread(target=run_worker, args=(f"worker-{i}", processed_by)) for i in range(WORKER_COUNT)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"{WORKER_COUNT} 个实例处理完成，耗时 {time.time() - started:.1f} 秒，各实例写回条数: {dict(processed_by)}")
+
+    with get_engine(get_db_url()).connect() as conn:
+        rows = conn.execute(text(f"SELECT content_hash, processed_at, lease_owner FROM {TABLE_NAME}")).fetchall()
+
+    errors = []
+    if any(row.processed_at is None for row in rows):
+        errors.append(f"仍有 {sum(row.processed_at is None for row in rows)} 条新闻未处理")
+    if any(row.lease_owner is not None for row in rows):
+        errors.append("已处理新闻的租约未清除")
+    duplicated = {h: n for h, n in calls.items() if n != 1}
+    if duplicated:
+        errors.append(f"{len(duplicated)} 条新闻被重复调用 LLM: {list(duplicated.items())[:5]}")
+    missing = [row.content_hash for row in rows if calls[row.content_hash] == 0]
+    if missing:
+        errors.append(f"{len(missing)} 条新闻未调用 LLM")
+    if not crashed_hashes.issubset(calls):
+        errors.append("崩溃实例认领的新闻未被其他实例接手")
+    if sum(processed_by.values()) != NEWS_COUNT:
+        errors.append(f"写回总数 {sum(processed_by.values())} 与新闻数 {NEWS_COUNT} 不一致")
+
+    if errors:
+        print("测试失败:")
+        for error in errors:
+            print(f"  - {error}")
+        sys.exit(1)
+    print(f"测试通过: {NEWS_COUNT} 条新闻均恰好处理一次，崩溃实例的 {len(crashed_hashes)} 条新闻在租约到期后被接手。")
+
+if __name__ == "__main__":
+    main()